@@ -1,5 +1,6 @@
 # admin_window.py
 
+from PyQt5.QtCore import QDate
 from PyQt5.QtWidgets import (
     QDialog,
     QVBoxLayout,
@@ -11,14 +12,22 @@ from PyQt5.QtWidgets import (
     QComboBox,
     QTableWidget,
     QTableWidgetItem,
+    QMessageBox,
+    QDateEdit,
+    QSpinBox,
 )
 
+from data import DEFAULT_DURATION_MIN
+from hall_index import HALL_INDEX
+from scheduling import parse_time
 from storage import (
     get_all_movie_titles,
     add_movie,
-    add_show,
     get_movies_with_show_counts,
     get_movie_id_for_title,
+    cancel_show,
+    find_screening,
+    screening_start,
 )
 
 
@@ -27,7 +36,10 @@ class AdminWindow(QDialog):
     Прост Admin прозорец:
     - Добавяне на нов филм
     - Добавяне на прожекция (movie + hall + time)
+    - Отказ на цяла прожекция (movie + hall + date + time) с манифест за връщане
     - Таблица с филми и брой прожекции
+    - Преглед/търсене на резервации
+    - Програма по правила за повторение (schedule builder)
     """
 
     def __init__(self, parent=None):
@@ -46,11 +58,17 @@ class AdminWindow(QDialog):
 
         self.movie_title_edit = QLineEdit()
         self.movie_title_edit.setPlaceholderText("Movie title (e.g. True Romance)")
+        self.movie_duration_spin = QSpinBox()
+        self.movie_duration_spin.setRange(30, 400)
+        self.movie_duration_spin.setValue(DEFAULT_DURATION_MIN)
+        self.movie_duration_spin.setSuffix(" min")
         self.movie_add_btn = QPushButton("Add movie")
         self.movie_add_btn.clicked.connect(self._handle_add_movie)
 
         mg_layout.addWidget(QLabel("Title"))
         mg_layout.addWidget(self.movie_title_edit)
+        mg_layout.addWidget(QLabel("Duration"))
+        mg_layout.addWidget(self.movie_duration_spin)
         mg_layout.addWidget(self.movie_add_btn)
         movie_group.setLayout(mg_layout)
 
@@ -77,6 +95,16 @@ class AdminWindow(QDialog):
         sg_layout.addWidget(QLabel("Time"))
         sg_layout.addWidget(self.time_edit)
         sg_layout.addWidget(self.show_add_btn)
+
+        self.cancel_date_edit = QDateEdit(QDate.currentDate())
+        self.cancel_date_edit.setCalendarPopup(True)
+        self.cancel_date_edit.setDisplayFormat("yyyy-MM-dd")
+        sg_layout.addWidget(QLabel("Date (for cancel)"))
+        sg_layout.addWidget(self.cancel_date_edit)
+
+        self.show_cancel_btn = QPushButton("Cancel whole show")
+        self.show_cancel_btn.clicked.connect(self._handle_cancel_show)
+        sg_layout.addWidget(self.show_cancel_btn)
         show_group.setLayout(sg_layout)
 
         top_row.addWidget(movie_group)
@@ -96,12 +124,22 @@ class AdminWindow(QDialog):
 
         main_layout.addWidget(table_group)
 
+        self.bookings_btn = QPushButton("Browse bookings…")
+        self.bookings_btn.clicked.connect(self._open_bookings_browser)
+        main_layout.addWidget(self.bookings_btn)
+
+        self.schedule_btn = QPushButton("Schedule builder…")
+        self.schedule_btn.clicked.connect(self._open_schedule_builder)
+        main_layout.addWidget(self.schedule_btn)
+
         # status label
         self.status_label = QLabel("")
         main_layout.addWidget(self.status_label)
 
         self.setLayout(main_layout)
 
+        # Програмата може да е променена от друг терминал
+        HALL_INDEX.rebuild()
         self._reload_table()
 
     def _reload_movie_combo(self) -> None:
@@ -123,7 +161,8 @@ class AdminWindow(QDialog):
             self.status_label.setText("Enter movie title.")
             return
 
-        movie_id = add_movie(title)
+        movie_id = add_movie(title, self.movie_duration_spin.value())
+        HALL_INDEX.invalidate()  # нова продължителност
         self.status_label.setText(f"Movie added: {title} (id: {movie_id})")
 
         self.movie_title_edit.clear()
@@ -142,14 +181,88 @@ class AdminWindow(QDialog):
             self.status_label.setText("Hall and time are required.")
             return
 
+        try:
+            time = parse_time(time)
+        except ValueError:
+            QMessageBox.warning(self, "Add showtime", f"Invalid time: {time!r}. Use HH:MM (00:00-23:59).")
+            return
+
         movie_id = get_movie_id_for_title(title)
         if not movie_id:
             self.status_label.setText("Movie not found in DB.")
             return
 
-        add_show(movie_id, hall, time)
+        try:
+            conflict = HALL_INDEX.add_show(movie_id, hall, time)
+        except ValueError as e:
+            self.status_label.setText(f"Showtime not added: {e}")
+            return
+        if conflict is not None:
+            self.status_label.setText(f"{hall} is busy: overlaps {conflict.describe()}.")
+            return
         self.status_label.setText(f"Showtime added: {title} · {hall} · {time}")
 
         self.hall_edit.clear()
         self.time_edit.clear()
         self._reload_table()
+
+    def _handle_cancel_show(self) -> None:
+        title = self.show_movie_combo.currentText().strip()
+        hall = self.hall_edit.text().strip()
+        time = self.time_edit.text().strip()
+
+        if not title or not hall or not time:
+            self.status_label.setText("Movie, hall and time are required.")
+            return
+        try:
+            time = parse_time(time)
+        except ValueError:
+            QMessageBox.warning(self, "Cancel show", f"Invalid time: {time!r}. Use HH:MM (00:00-23:59).")
+            return
+
+        movie_id = get_movie_id_for_title(title)
+        if not movie_id:
+            self.status_label.setText("Movie not found in DB.")
+            return
+
+        starts_at = screening_start(self.cancel_date_edit.date().toString("yyyy-MM-dd"), time)
+        screening_id = find_screening(movie_id, hall, starts_at)
+        if screening_id is None:
+            self.status_label.setText(f"No bookings for {title} · {hall} · {starts_at}.")
+            return
+
+        answer = QMessageBox.question(
+            self,
+            "Cancel show",
+            f"Cancel ALL bookings for {title} · {hall} · {starts_at}?",
+        )
+        if answer != QMessageBox.Yes:
+            return
+
+        manifest = cancel_show(screening_id)
+        refund_total = sum(line[4] for line in manifest)
+        summary = f"Canceled {len(manifest)} booking(s), refunds: {refund_total:.2f} лв."
+        self.status_label.setText(f"{title} · {hall} · {starts_at}: {summary}")
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Refund manifest")
+        box.setText(summary)
+        box.setDetailedText(
+            "\n".join(
+                f"{code}\t{client}\t{seats}\t{ticket_type or ''}\t{total:.2f}"
+                for code, client, seats, ticket_type, total in manifest
+            )
+        )
+        box.exec_()
+
+    def _open_bookings_browser(self) -> None:
+        from bookings_browser import BookingsBrowserDialog
+
+        dlg = BookingsBrowserDialog(self)
+        dlg.exec_()
+
+    def _open_schedule_builder(self) -> None:
+        from schedule_builder import ScheduleBuilderDialog
+
+        dlg = ScheduleBuilderDialog(self)
+        dlg.exec_()
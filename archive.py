@@ -0,0 +1,186 @@
+# archive.py
+
+"""
+Архивиране на минали прожекции.
+
+Завършените месеци (screenings + техните bookings, taken_seats и журнал
+на местата) се преместват в archive/cinema-YYYY-MM.db и се трият от
+основната база, на порции от ARCHIVE_BATCH прожекции в отделни
+транзакции. След всяка порция се освобождават страници с PRAGMA
+incremental_vacuum, така че cinema.db остава малка, без дълъг пълен VACUUM.
+
+Агрегатите за продажби (sales_*) остават в основната база. Отчетите
+прикачват архивите с `attach_archives`, когато периодът ги покрива.
+
+Ръчно: `python archive.py [YYYY-MM-DD]` - архивира прожекциите преди
+датата (по подразбиране: всичко преди началото на предишния месец).
+"""
+
+import sqlite3
+import sys
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import storage
+
+ARCHIVE_DIR = Path(__file__).resolve().parent / "archive"
+ARCHIVE_BATCH = 500
+VACUUM_PAGES = 2000
+KEEP_MONTHS = 1  # колко минали месеца остават в основната база
+
+ARCHIVED_TABLES = ("screenings", "bookings", "taken_seats", "seat_events", "seat_snapshots")
+
+
+def archive_path(month: str) -> Path:
+    """month е "YYYY-MM"."""
+    return ARCHIVE_DIR / f"cinema-{month}.db"
+
+
+def list_archives() -> List[Tuple[str, Path]]:
+    """[(YYYY-MM, път)] за всички архиви, по месец."""
+    if not ARCHIVE_DIR.exists():
+        return []
+    out = []
+    for path in sorted(ARCHIVE_DIR.glob("cinema-????-??.db")):
+        out.append((path.stem[len("cinema-"):], path))
+    return out
+
+
+def default_cutoff(today: Optional[date] = None) -> str:
+    """Първи ден на месеца, KEEP_MONTHS месеца преди текущия."""
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - KEEP_MONTHS
+    return date(month_index // 12, month_index % 12 + 1, 1).isoformat()
+
+
+def _next_month(month: str) -> str:
+    year, mon = map(int, month.split("-"))
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+# ----------------- ARCHIVE SCHEMA -----------------
+
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _prepare_archive(conn: sqlite3.Connection) -> None:
+    """
+    Създава таблиците в прикачения архив (schema "arch") по образа на
+    основните и добавя колони, появили се в основната база след това.
+    """
+    for table in ARCHIVED_TABLES:
+        main_cols = _columns(conn, "main", table)
+        arch_cols = _columns(conn, "arch", table)
+        if not arch_cols:
+            conn.execute(f"CREATE TABLE arch.{table} AS SELECT * FROM main.{table} WHERE 0")
+            continue
+        for col in main_cols:
+            if col not in arch_cols:
+                conn.execute(f"ALTER TABLE arch.{table} ADD COLUMN {col}")
+    conn.execute("CREATE INDEX IF NOT EXISTS arch.idx_screenings_start ON screenings (starts_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS arch.idx_bookings_screening ON bookings (screening_id)")
+
+
+def _move_batch(conn: sqlite3.Connection, screening_ids: List[int]) -> None:
+    ids = ",".join(str(int(i)) for i in screening_ids)
+    for table in ARCHIVED_TABLES:
+        key = "id" if table == "screenings" else "screening_id"
+        cols = ", ".join(_columns(conn, "main", table))
+        conn.execute(
+            f"INSERT INTO arch.{table} ({cols}) SELECT {cols} FROM main.{table} WHERE {key} IN ({ids})"
+        )
+        conn.execute(f"DELETE FROM main.{table} WHERE {key} IN ({ids})")
+
+
+# ----------------- JOB -----------------
+
+
+def archive_before(cutoff: str, batch_size: int = ARCHIVE_BATCH) -> int:
+    """
+    Мести прожекциите с начало преди `cutoff` ("YYYY-MM-DD") в месечни
+    архиви. Връща броя преместени прожекции.
+    """
+    ARCHIVE_DIR.mkdir(exist_ok=True)
+    conn = storage.get_connection()
+    conn.isolation_level = None  # транзакциите се управляват ръчно
+    moved = 0
+
+    months = [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT substr(starts_at, 1, 7) FROM screenings WHERE starts_at < ? ORDER BY 1",
+            (cutoff,),
+        )
+    ]
+    for month in months:
+        conn.execute("ATTACH DATABASE ? AS arch", (str(archive_path(month)),))
+        try:
+            _prepare_archive(conn)
+            upper = min(cutoff, _next_month(month))
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    ids = [
+                        row[0]
+                        for row in conn.execute(
+                            """
+                            SELECT id FROM main.screenings
+                            WHERE starts_at >= ? AND starts_at < ?
+                            ORDER BY id
+                            LIMIT ?
+                            """,
+                            (month, upper, batch_size),
+                        )
+                    ]
+                    if ids:
+                        _move_batch(conn, ids)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                moved += len(ids)
+                # incremental_vacuum освобождава по страница на стъпка -> fetchall
+                conn.execute(f"PRAGMA main.incremental_vacuum({VACUUM_PAGES})").fetchall()
+                if len(ids) < batch_size:
+                    break
+        finally:
+            conn.execute("DETACH DATABASE arch")
+
+    conn.close()
+    return moved
+
+
+@contextmanager
+def attach_archives(
+    conn: sqlite3.Connection,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Iterator[List[str]]:
+    """
+    Прикачва архивите за месеците в периода и връща имената им
+    като schema-и ("arch_2024_01", ...). Откача ги при изход.
+    """
+    lo = date_from.isoformat()[:7] if date_from else "0000-00"
+    hi = date_to.isoformat()[:7] if date_to else "9999-99"
+    schemas = []
+    try:
+        for month, path in list_archives():
+            if lo <= month <= hi:
+                schema = "arch_" + month.replace("-", "_")
+                conn.execute("ATTACH DATABASE ? AS " + schema, (str(path),))
+                schemas.append(schema)
+        yield schemas
+    finally:
+        for schema in schemas:
+            conn.execute("DETACH DATABASE " + schema)
+
+
+if __name__ == "__main__":
+    storage.init_db()
+    cutoff_arg = sys.argv[1] if len(sys.argv) > 1 else default_cutoff()
+    count = archive_before(cutoff_arg)
+    print(f"Archived {count} screening(s) before {cutoff_arg} into {ARCHIVE_DIR}")
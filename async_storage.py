@@ -0,0 +1,194 @@
+# async_storage.py
+
+"""
+Asyncio вариант на storage API-то.
+
+- Записи: през write_queue.WriteQueue - операциите от storage.WRITE_OPS
+  (book, cancel_booking, ...) на много едновременни корутини се записват
+  с общи commit-и от една нишка. Много корутини -> малко fsync-а.
+- Четения: пул от нишки, за да не блокират event loop-а. Еднакви
+  едновременни заявки (същата функция и аргументи) споделят едно четене,
+  а get_taken_seats за различни прожекции в един и същи тик на event
+  loop-а стават една заявка (storage.get_taken_seats_many).
+
+cinema.db е в rollback journal режим, не WAL: базата е обща за касите
+(и може да е на мрежов диск, където WAL не работи). Затова читателите
+вървят паралелно помежду си, но не и с commit-а на запис - докато
+партидата се записва, четенията чакат (busy timeout на връзката) и
+обратно. Пулът е малък (READER_THREADS) точно затова: повече нишки не
+дават повече пропускателна способност, а групирането на четенията
+по-горе намалява броя им.
+
+Резултатите се връщат на loop-а на извикващия, така че един AsyncStorage
+може да се ползва от няколко loop-а (споделянето на четения е в рамките
+на един loop).
+
+    db = AsyncStorage()
+    ok, reason = await db.book(...)
+    seats = await db.get_taken_seats(screening_id)
+    await db.close()
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import storage
+from write_queue import WRITE_BATCH, WRITE_WINDOW_MS, WriteQueue
+
+READER_THREADS = 4
+
+
+def _freeze(value):
+    """Хешируем еквивалент на аргумент (списъци -> tuple, множества -> frozenset)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return dict, tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _resolve(future: asyncio.Future, ok: bool, value) -> None:
+    if future.done():
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+class AsyncStorage:
+    def __init__(
+        self,
+        batch: int = WRITE_BATCH,
+        window_ms: float = WRITE_WINDOW_MS,
+        readers: int = READER_THREADS,
+    ) -> None:
+        self.writes = WriteQueue(batch, window_ms)
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix="cinema-reader")
+        # (loop, fn, args, kwargs) -> future на четене, което вече тече
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        # loop -> {screening_id: future}; изпълняват се заедно в края на тика
+        self._seat_requests: Dict[asyncio.AbstractEventLoop, Dict[int, asyncio.Future]] = {}
+        self._closed = False
+
+    @property
+    def commits(self) -> int:
+        return self.writes.commits
+
+    @property
+    def ops_committed(self) -> int:
+        return self.writes.ops_committed
+
+    async def close(self) -> None:
+        """Изчаква чакащите записи и спира нишките."""
+        if self._closed:
+            return
+        self._closed = True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.writes.close)
+        self._readers.shutdown(wait=False)
+
+    # ---------- writes ----------
+
+    async def write(self, op: str, *args, **kwargs):
+        """Сурова storage.WRITE_OPS операция; резултатът е като на _op(cur, ...)."""
+        if self._closed:
+            raise RuntimeError("AsyncStorage is closed")
+        return await asyncio.wrap_future(self.writes.submit(op, *args, **kwargs))
+
+    async def book(
+        self,
+        movie_id: str,
+        movie_title: str,
+        hall: str,
+        starts_at: str,
+        show_time: str,
+        client_name: str,
+        seats: Iterable[str],
+        booking_code: str,
+        ticket_type: str,
+        price_per_seat: float,
+        total_price: float,
+        request_key: Optional[str] = None,
+    ) -> Tuple[bool, str]:
+        """Като storage.book: (успех, "ok" / "duplicate" / "seats_taken")."""
+        ok, reason, _, _ = await self.write(
+            "book", movie_id, movie_title, hall, starts_at, show_time, client_name,
+            list(seats), booking_code, ticket_type, price_per_seat, total_price, request_key,
+        )
+        return ok, reason
+
+    async def cancel(self, booking_code: str) -> Tuple[bool, str]:
+        """Като storage.cancel_booking."""
+        ok, reason, _, _ = await self.write("cancel_booking", booking_code)
+        return ok, reason
+
+    async def ensure_screening(self, movie_id: str, hall: str, starts_at: str) -> int:
+        return await self.write("ensure_screening", movie_id, hall, starts_at)
+
+    # ---------- reads ----------
+
+    async def read(self, fn: str, *args, **kwargs):
+        """storage функция по име в пула за четене; еднаквите заявки споделят резултата (не го променяйте)."""
+        loop = asyncio.get_running_loop()
+        try:
+            key = (loop, fn, _freeze(args), _freeze(kwargs))
+            future = self._inflight.get(key)
+        except TypeError:
+            # нехешируем аргумент (и след _freeze) - четене без споделяне
+            key, future = None, None
+        if future is None:
+            future = asyncio.ensure_future(
+                loop.run_in_executor(self._readers, partial(storage.REMOTE[fn], *args, **kwargs))
+            )
+            if key is not None:
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: отказът на една корутина не отказва четенето за другите
+        return await asyncio.shield(future)
+
+    async def get_taken_seats(self, screening_id: int) -> Set[str]:
+        loop = asyncio.get_running_loop()
+        requests = self._seat_requests.get(loop)
+        if requests is None:
+            requests = self._seat_requests[loop] = {}
+            loop.call_soon(self._flush_seat_requests, loop)
+        future = requests.get(screening_id)
+        if future is None:
+            future = requests[screening_id] = loop.create_future()
+        return set(await asyncio.shield(future))
+
+    def _flush_seat_requests(self, loop: asyncio.AbstractEventLoop) -> None:
+        requests = self._seat_requests.pop(loop)
+        task = loop.run_in_executor(self._readers, storage.get_taken_seats_many, list(requests))
+
+        def done(result: asyncio.Future) -> None:
+            error = result.exception()
+            for screening_id, future in requests.items():
+                if error is not None:
+                    _resolve(future, False, error)
+                else:
+                    _resolve(future, True, result.result().get(screening_id, set()))
+
+        task.add_done_callback(done)
+
+    async def find_screening(self, movie_id: str, hall: str, starts_at: str) -> Optional[int]:
+        return await self.read("find_screening", movie_id, hall, starts_at)
+
+    # ---------- catalog ----------
+
+    async def get_all_movie_titles(self) -> List[str]:
+        return await self.read("get_all_movie_titles")
+
+    async def get_movie_id_for_title(self, title: str) -> str:
+        return await self.read("get_movie_id_for_title", title)
+
+    async def get_halls_for_movie(self, title: str, day: str) -> List[str]:
+        return await self.read("get_halls_for_movie", title, day)
+
+    async def get_show_times(self, title: str, hall: str, day: str) -> List[str]:
+        return await self.read("get_show_times", title, hall, day)
@@ -0,0 +1,205 @@
+# backup.py
+
+"""
+Онлайн backup на cinema.db.
+
+Копието се прави със SQLite online backup API на малки стъпки
+(BACKUP_PAGES страници), с пауза между тях: всяка стъпка държи
+read lock за милисекунди, така че продажбите не чакат. Ако друг
+терминал пише по време на копирането, SQLite рестартира копието сам;
+след BACKUP_MAX_RESTARTS рестарта копието се изоставя (BackupRestarted)
+и се прави в следващия планиран интервал.
+
+Готовото копие минава integrity_check и чак тогава получава
+окончателното си име; пазят се последните KEEP_BACKUPS копия.
+
+Планираният backup (таймерът в MainWindow на всеки терминал) първо
+поема реда в backup_runs: базата е обща, така че на интервал го прави
+само един терминал, независимо колко процеса я ползват.
+
+Ръчно: `python backup.py` (нов backup) или
+`python backup.py verify ПЪТ` (проверка на съществуващ).
+"""
+
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import storage
+
+BACKUP_DIR = Path(__file__).resolve().parent / "backups"
+BACKUP_PAGES = 64          # страници на стъпка (~256 KiB при 4 KiB страница)
+BACKUP_SLEEP_S = 0.05      # пауза между стъпките
+BACKUP_MAX_RESTARTS = 20   # после се чака следващият интервал
+KEEP_BACKUPS = 14
+BACKUP_INTERVAL_MIN = 60   # за планирания backup от приложението
+
+_backup_lock = threading.Lock()  # в процеса; между терминалите - backup_runs
+
+
+class BackupRestarted(RuntimeError):
+    """Копието се рестартира твърде много пъти заради записи от други терминали."""
+
+
+def _step_progress(max_restarts: int, pause: float):
+    """
+    progress callback за Connection.backup, викан след всяка стъпка:
+    - паузата е тук: `sleep` на Connection.backup се прилага само след
+      SQLITE_BUSY, не между успешните стъпки;
+    - оставащите страници растат само при рестарт; след max_restarts
+      грешката от callback-а прекъсва backup-а.
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        last = state["remaining"]
+        state["remaining"] = remaining
+        if last is not None and remaining > last:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise BackupRestarted(f"Backup restarted {state['restarts']} times, giving up until the next slot")
+        if remaining and pause:
+            time.sleep(pause)  # без lock - записите от касите минават тук
+
+    return progress
+
+
+def verify_backup(path: Path) -> bool:
+    """True, ако копието минава PRAGMA integrity_check."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return rows == [("ok",)]
+
+
+def list_backups(dest_dir: Path = BACKUP_DIR) -> List[Path]:
+    return sorted(Path(dest_dir).glob("cinema-*.db"))
+
+
+def rotate_backups(dest_dir: Path = BACKUP_DIR, keep: int = KEEP_BACKUPS) -> None:
+    for old in list_backups(dest_dir)[:-keep]:
+        old.unlink(missing_ok=True)
+
+
+def claim_scheduled_backup(interval_min: int = BACKUP_INTERVAL_MIN) -> Optional[int]:
+    """
+    Поема планирания backup за този интервал. Връща id на реда в
+    backup_runs или None, ако друг терминал вече го е поел.
+    Поетият, но незавършен backup (паднал терминал) се поема отново
+    след следващия интервал.
+    """
+    now = int(time.time())
+    conn = storage.get_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last = conn.execute("SELECT MAX(started_at) FROM backup_runs").fetchone()[0]
+            # половин минута толеранс: таймерите на терминалите не са синхронни
+            if last is not None and now - last < interval_min * 60 - 30:
+                conn.execute("ROLLBACK")
+                return None
+            run_id = conn.execute(
+                "INSERT INTO backup_runs (started_at, host) VALUES (?, ?)",
+                (now, socket.gethostname()),
+            ).lastrowid
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return run_id
+
+
+def _finish_run(run_id: int, path: Path) -> None:
+    conn = storage.get_connection()
+    try:
+        conn.execute(
+            "UPDATE backup_runs SET finished_at = ?, path = ? WHERE id = ?",
+            (int(time.time()), str(path), run_id),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def backup_database(
+    dest_dir: Path = BACKUP_DIR,
+    pages: int = BACKUP_PAGES,
+    sleep: float = BACKUP_SLEEP_S,
+    keep: int = KEEP_BACKUPS,
+    max_restarts: int = BACKUP_MAX_RESTARTS,
+) -> Path:
+    """
+    Прави проверено копие на базата и връща пътя му.
+    Хвърля BackupRestarted при твърде много рестарти и RuntimeError,
+    ако копието не мине integrity_check.
+    """
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    final_path = dest_dir / f"cinema-{time.strftime('%Y%m%d-%H%M%S')}.db"
+    partial_path = final_path.with_suffix(".partial")
+
+    with _backup_lock:
+        src = storage.get_connection()
+        dst = sqlite3.connect(partial_path)
+        try:
+            try:
+                src.backup(dst, pages=pages, progress=_step_progress(max_restarts, sleep), sleep=sleep)
+            finally:
+                dst.close()
+                src.close()
+        except BackupRestarted:
+            partial_path.unlink(missing_ok=True)
+            raise
+
+        if not verify_backup(partial_path):
+            partial_path.unlink(missing_ok=True)
+            raise RuntimeError(f"Backup failed integrity check: {final_path.name}")
+
+        partial_path.replace(final_path)
+        rotate_backups(dest_dir, keep)
+    return final_path
+
+
+def start_background_backup(on_error=None) -> Optional[threading.Thread]:
+    """
+    Пуска планиран backup в отделна нишка (за таймера в MainWindow).
+    Връща None, ако вече тече друг в процеса. Нишката не прави нищо,
+    ако друг терминал е поел backup-а за интервала (claim_scheduled_backup).
+    on_error(e) се вика от нишката на backup-а.
+    """
+    if _backup_lock.locked():
+        return None
+
+    def run() -> None:
+        try:
+            run_id = claim_scheduled_backup()
+            if run_id is not None:
+                _finish_run(run_id, backup_database())
+        except Exception as e:
+            if on_error is not None:
+                on_error(e)
+            else:
+                print(f"Backup failed: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=run, name="cinema-backup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "verify":
+        ok = verify_backup(Path(sys.argv[2]))
+        print("ok" if ok else "FAILED")
+        sys.exit(0 if ok else 1)
+
+    path = backup_database()
+    print(f"Backup written to {path}")
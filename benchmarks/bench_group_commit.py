@@ -0,0 +1,112 @@
+# benchmarks/bench_group_commit.py
+
+"""
+Мери пик на продажбите: N нишки (каси) правят по M storage.book едновременно.
+
+- per-booking: всеки book със свой commit (както досега);
+- group commit: същото през write_queue.WriteQueue (storage.use_write_queue).
+
+Част от продажбите са за едни и същи места, така че се проверява и че
+резултатите са верни: броят "ok" = броят различни места, а в базата има
+точно толкова резервации и заети места.
+
+Пуска се с `python benchmarks/bench_group_commit.py [нишки] [продажби на нишка]`.
+"""
+
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import storage  # noqa: E402
+from write_queue import WriteQueue  # noqa: E402
+
+SEATS = [f"{row}{n}" for row in "ABCDEFGHIJ" for n in range(1, 13)]
+
+
+def _run(threads: int, per_thread: int, prefix: str, starts_at: str) -> tuple:
+    results = Counter()
+    lock = threading.Lock()
+
+    def worker(t: int) -> None:
+        local = Counter()
+        for i in range(per_thread):
+            # всяко място се продава от две каси
+            seat = SEATS[(t // 2 * per_thread + i) % len(SEATS)]
+            ok, reason = storage.book(
+                movie_id="bench",
+                movie_title="Bench",
+                hall="Hall 1",
+                starts_at=starts_at,
+                show_time=starts_at[11:],
+                client_name=f"client {t}",
+                seats=[seat],
+                booking_code=f"{prefix}{t:02d}{i:05d}",
+                ticket_type="Standard",
+                price_per_seat=10.0,
+                total_price=10.0,
+            )
+            local[reason] += 1
+        with lock:
+            results.update(local)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - started, results
+
+
+def _check(starts_at: str, results: Counter, threads: int, per_thread: int) -> str:
+    screening_id = storage.find_screening("bench", "Hall 1", starts_at)
+    taken = storage.get_taken_seats(screening_id)
+    conn = storage.get_connection()
+    booked = conn.execute(
+        "SELECT COUNT(*) FROM bookings WHERE screening_id = ?", (screening_id,)
+    ).fetchone()[0]
+    conn.close()
+    expected = len({SEATS[(t // 2 * per_thread + i) % len(SEATS)] for t in range(threads) for i in range(per_thread)})
+    ok = results["ok"] == booked == len(taken) == expected
+    return "results OK" if ok else f"MISMATCH ok={results['ok']} rows={booked} seats={len(taken)} expected={expected}"
+
+
+def main() -> None:
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    total = threads * per_thread
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = Path(tmp) / "bench_group_commit.db"
+        storage.init_db()
+
+        elapsed, results = _run(threads, per_thread, "P", "2030-01-01 18:00")
+        print(
+            f"per-booking commit: {total / elapsed:8.0f} bookings/s  "
+            f"({elapsed * 1000:.0f} ms, {results['ok']} ok / {results['seats_taken']} taken, "
+            f"{_check('2030-01-01 18:00', results, threads, per_thread)})"
+        )
+
+        writes = WriteQueue()
+        storage.use_write_queue(writes)
+        try:
+            elapsed, results = _run(threads, per_thread, "G", "2030-01-01 21:00")
+        finally:
+            storage.use_write_queue(None)
+            writes.close()
+        print(
+            f"group commit:       {total / elapsed:8.0f} bookings/s  "
+            f"({elapsed * 1000:.0f} ms, {results['ok']} ok / {results['seats_taken']} taken, "
+            f"{_check('2030-01-01 21:00', results, threads, per_thread)})"
+        )
+        print(f"  {writes.commits} commits for {writes.ops_committed} operations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_startup.py
+
+"""
+Мери времето за студен старт.
+
+- импорт на ui_main_window в чист процес (това плаща всеки старт);
+- init_db върху нова база и върху вече актуална база (бързият път);
+- ако има PyQt5: MainWindow() + show() до първото изрисуване
+  (offscreen платформа, временна база).
+
+Пуска се с `python benchmarks/bench_startup.py [повторения]`.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import storage  # noqa: E402
+
+
+def _median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+def bench_import(repeats: int) -> None:
+    code = (
+        "import time; t = time.perf_counter(); import ui_main_window; "
+        "print(time.perf_counter() - t)"
+    )
+    samples = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode != 0:
+            print("import ui_main_window: skipped (" + out.stderr.strip().splitlines()[-1] + ")")
+            return
+        samples.append(float(out.stdout.strip()))
+    print(f"import ui_main_window:        {_median_ms(samples):8.2f} ms")
+
+    for module in ("ticket_pdf", "admin_window"):
+        out = subprocess.run(
+            [sys.executable, "-c", f"import ui_main_window, sys; print('{module}' in sys.modules)"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        print(f"  {module} loaded eagerly:  {out.stdout.strip()}")
+
+
+def bench_init_db(repeats: int) -> None:
+    cold, warm = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(repeats):
+            storage.DB_PATH = Path(tmp) / f"bench_{i}.db"
+            t = time.perf_counter()
+            storage.init_db()
+            cold.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            storage.init_db()
+            warm.append(time.perf_counter() - t)
+    print(f"init_db (new database):       {_median_ms(cold):8.2f} ms")
+    print(f"init_db (current schema):     {_median_ms(warm):8.2f} ms")
+
+
+def bench_first_paint(repeats: int) -> None:
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        from ui_main_window import MainWindow
+    except ImportError as e:
+        print(f"MainWindow first paint:       skipped ({e})")
+        return
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = Path(tmp) / "bench_ui.db"
+        storage.init_db()
+        for _ in range(repeats):
+            t = time.perf_counter()
+            window = MainWindow()
+            window.show()
+            app.processEvents()
+            samples.append(time.perf_counter() - t)
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+    print(f"MainWindow first paint:       {_median_ms(samples):8.2f} ms")
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bench_import(repeats)
+    bench_init_db(repeats)
+    bench_first_paint(repeats)
+
+
+if __name__ == "__main__":
+    main()
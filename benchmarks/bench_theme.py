@@ -0,0 +1,103 @@
+# benchmarks/bench_theme.py
+
+"""
+Мери смяната на тема в MainWindow.
+
+- строене на stylesheet-ите (веднъж при старт) и взимане от кеша;
+- _apply_theme в цикъл light -> dark -> night (offscreen платформа,
+  временна база): време на смяна и колко места са престилизирани
+  (очаква се 0 - местата следват темата през глобалния stylesheet);
+- смяна на състоянието на всички места (dynamic property + polish).
+
+Пуска се с `python benchmarks/bench_theme.py [повторения]`.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import storage  # noqa: E402
+
+
+def _median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+def bench_stylesheets(repeats: int) -> None:
+    try:
+        import themes
+    except ImportError as e:
+        print(f"stylesheet build:             skipped ({e})")
+        return
+
+    build, cached = [], []
+    for _ in range(repeats):
+        themes._stylesheets.clear()
+        t = time.perf_counter()
+        themes.precompile_stylesheets()
+        build.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        for name in themes.THEMES:
+            themes.stylesheet_for(name)
+        cached.append(time.perf_counter() - t)
+    print(f"stylesheet build (all):       {_median_ms(build):8.3f} ms")
+    print(f"stylesheet lookup (all):      {_median_ms(cached):8.3f} ms")
+
+
+def bench_theme_switch(repeats: int) -> None:
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        from ui_main_window import MainWindow
+        from diagnostics import COUNTERS
+    except ImportError as e:
+        print(f"theme switch:                 skipped ({e})")
+        return
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = Path(tmp) / "bench_theme.db"
+        storage.init_db()
+        window = MainWindow()
+        window.show()
+        app.processEvents()  # изгражда местата
+
+        samples = []
+        restyles_before = COUNTERS.seat_restyles
+        for _ in range(repeats):
+            for name in ("light", "dark", "night"):
+                t = time.perf_counter()
+                window._apply_theme(name)
+                app.processEvents()
+                samples.append(time.perf_counter() - t)
+        restyles = COUNTERS.seat_restyles - restyles_before
+        print(f"theme switch:                 {_median_ms(samples):8.2f} ms")
+        print(f"  seat restyles on switch:    {restyles}")
+
+        seat_samples = []
+        for i in range(repeats):
+            t = time.perf_counter()
+            for btn in window.seat_buttons.values():
+                window._style_seat_button(btn, selected=(i % 2 == 0))
+            app.processEvents()
+            seat_samples.append(time.perf_counter() - t)
+        print(f"restyle all seats:            {_median_ms(seat_samples):8.2f} ms")
+
+        window.close()
+
+
+def main() -> None:
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bench_stylesheets(repeats)
+    bench_theme_switch(repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# booking_server.py
+
+"""
+Локален сървър за резервации: един процес държи cinema.db, а касите
+работят през него (`storage.use_server("host:port")` или
+`python main.py --server=host:port`).
+
+Протокол: TCP, по един JSON ред на заявка/отговор:
+    {"id": 1, "fn": "book", "args": [...], "kwargs": {...}}
+    {"id": 1, "result": ...}  или  {"id": 1, "error": "ValueError", "message": "..."}
+`fn` е функция от storage с @_remote. Отговорите на една връзка могат
+да идват разбъркани - свързват се по id. Множества се пращат като
+{"$set": [...]}.
+
+Вътре:
+- базата е през async_storage.AsyncStorage: записите (book,
+  cancel_booking, ...) се събират в общи commit-и от една нишка,
+  четенията вървят в пул от нишки;
+- заетите места по прожекция се пазят в паметта (до
+  MAX_CACHED_SCREENINGS прожекции, LRU): get_taken_seats не стига до
+  базата, а book за вече заето място се отказва веднага. cancel_show и
+  replay_bookings изчистват само засегнатите прожекции.
+
+Пускане: `python booking_server.py [host:port]` (по подразбиране
+127.0.0.1:8765). Порт 0 = свободен порт (за тестове).
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+import storage
+from async_storage import AsyncStorage
+from write_queue import WRITE_BATCH, WRITE_WINDOW_MS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+FLAG = "--server"
+ENV_VAR = "CINEMA_SERVER"
+
+CLIENT_TIMEOUT_S = 10.0
+
+# Прожекции със заети места в паметта (най-отдавна ползваните излизат)
+MAX_CACHED_SCREENINGS = 1024
+
+# Записи, които не са в storage.WRITE_OPS: изпълняват се сами, извън партидите
+SOLO_WRITES = ("init_db", "add_screenings", "cancel_show", "add_movie", "add_show", "replay_bookings")
+
+# Грешки, които клиентът вдига със същия тип
+_ERROR_TYPES = {
+    "OperationalError": sqlite3.OperationalError,
+    "IntegrityError": sqlite3.IntegrityError,
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "TypeError": TypeError,
+}
+
+
+class RemoteError(RuntimeError):
+    """Грешка на сървъра без съответствие при клиента."""
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_HOST, int(port)
+
+
+def server_address_from_args(argv: Sequence[str]) -> Optional[str]:
+    """"host:port" от --server=... или CINEMA_SERVER; None - директен режим."""
+    for arg in argv[1:]:
+        if arg == FLAG:
+            return f"{DEFAULT_HOST}:{DEFAULT_PORT}"
+        if arg.startswith(FLAG + "="):
+            return arg.split("=", 1)[1]
+    return os.environ.get(ENV_VAR, "").strip() or None
+
+
+def _encode(obj) -> bytes:
+    def default(o):
+        if isinstance(o, (set, frozenset)):
+            return {"$set": sorted(o)}
+        raise TypeError(f"Cannot send {type(o).__name__}")
+
+    return json.dumps(obj, default=default, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _decode(line: bytes):
+    def hook(d):
+        return set(d["$set"]) if len(d) == 1 and "$set" in d else d
+
+    return json.loads(line, object_hook=hook)
+
+
+# ---------------- SERVER ----------------
+
+
+class BookingServer:
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        batch: int = WRITE_BATCH,
+        window_ms: float = WRITE_WINDOW_MS,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.batch = batch
+        self.window_ms = window_ms
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.db: Optional[AsyncStorage] = None
+
+        # Заети места: screening_id -> места; версията расте при всеки запис,
+        # за да не запишем остаряло четене от базата върху по-нов запис.
+        self._seats: "OrderedDict[int, Set[str]]" = OrderedDict()
+        self._seat_version: Dict[int, int] = {}
+        self._seat_epoch = 0  # расте, когато прожекция излезе от паметта
+        self._screening_ids: "OrderedDict[Tuple[str, str, str], int]" = OrderedDict()
+        # места в book-ове, които чакат commit
+        self._pending: Dict[Tuple[str, str, str], Set[str]] = {}
+
+    async def start(self) -> Tuple[str, int]:
+        """Пуска сървъра; връща истинския (host, port)."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, storage.REMOTE["init_db"])  # файлът, не клиентски режим
+        self.db = AsyncStorage(self.batch, self.window_ms)
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.db is not None:
+            await self.db.close()
+
+    # ---------- connections ----------
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._answer(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def _answer(self, line: bytes, writer: asyncio.StreamWriter, lock: asyncio.Lock) -> None:
+        request_id = None
+        try:
+            request = _decode(line)
+            request_id = request.get("id")
+            result = await self.dispatch(request["fn"], request.get("args", []), request.get("kwargs", {}))
+            response = {"id": request_id, "result": result}
+        except Exception as e:
+            response = {"id": request_id, "error": type(e).__name__, "message": str(e)}
+        async with lock:
+            writer.write(_encode(response))
+            await writer.drain()
+
+    async def dispatch(self, fn: str, args: list, kwargs: dict):
+        """Изпълнява storage функция по име (ползва се и без мрежа, в тестове)."""
+        if fn == "ping":
+            return "pong"
+        if fn == "get_taken_seats":
+            return await self._taken_seats(*args, **kwargs)
+        if fn == "book":
+            return await self._book(*args, **kwargs)
+        if fn in storage.WRITE_OPS:
+            return await self._submit(fn, args, kwargs)
+        if fn in SOLO_WRITES:
+            return await self._solo_write(fn, args, kwargs)
+        if fn in storage.REMOTE:
+            return await self.db.read(fn, *args, **kwargs)
+        raise KeyError(f"Unknown function: {fn}")
+
+    # ---------- seats in memory ----------
+
+    async def _taken_seats(self, screening_id: int) -> Set[str]:
+        seats = self._seats.get(screening_id)
+        if seats is not None:
+            self._seats.move_to_end(screening_id)
+            return seats
+        version = (self._seat_epoch, self._seat_version.get(screening_id, 0))
+        loaded = await self.db.get_taken_seats(screening_id)
+        seats = self._seats.get(screening_id)
+        if seats is None:
+            seats = loaded
+            if (self._seat_epoch, self._seat_version.get(screening_id, 0)) == version:
+                self._seats[screening_id] = seats
+                if len(self._seats) > MAX_CACHED_SCREENINGS:
+                    evicted, _ = self._seats.popitem(last=False)
+                    # версията излиза с прожекцията; епохата пази четенията в ход
+                    self._seat_version.pop(evicted, None)
+                    self._seat_epoch += 1
+        return seats
+
+    def _remember_screening(self, show: Tuple[str, str, str], screening_id: int) -> None:
+        self._screening_ids[show] = screening_id
+        self._screening_ids.move_to_end(show)
+        if len(self._screening_ids) > MAX_CACHED_SCREENINGS:
+            self._screening_ids.popitem(last=False)
+
+    def _seats_changed(self, screening_id: int, added=(), removed=()) -> None:
+        self._seat_version[screening_id] = self._seat_version.get(screening_id, 0) + 1
+        seats = self._seats.get(screening_id)
+        if seats is not None:
+            seats.update(added)
+            seats.difference_update(removed)
+
+    async def _book(self, *args, **kwargs):
+        bound = _bind_book_args(args, kwargs)
+        show = (bound["movie_id"], bound["hall"], bound["starts_at"])
+        seats = {s.strip() for s in bound["seats"]}
+        # Повторение с request_key намира местата заети от самото себе си -
+        # дали е дубликат решава базата, без бърз отказ.
+        retryable = bound.get("request_key") is not None
+
+        # Бърз отказ без базата: място, което чака commit в друг book,
+        # или вече заето. Резервираме преди първия await.
+        pending = self._pending.setdefault(show, set())
+        clash = bool(seats & pending)
+        if clash and not retryable:
+            return [False, "seats_taken"]
+        reserved = set() if clash else seats
+        pending |= reserved
+        try:
+            screening_id = self._screening_ids.get(show)
+            if not retryable and screening_id is not None and seats & await self._taken_seats(screening_id):
+                return [False, "seats_taken"]
+            ok, reason, screening_id, _ = await self._submit("book", (), bound)
+        finally:
+            pending -= reserved
+            if not pending:
+                self._pending.pop(show, None)
+        self._remember_screening(show, screening_id)
+        if ok:
+            self._seats_changed(screening_id, added=seats)
+        return [ok, reason]
+
+    # ---------- writes ----------
+
+    async def _submit(self, fn: str, args, kwargs):
+        result = await self.db.write(fn, *args, **kwargs)
+
+        # Паметта следва записите, които минават покрай book
+        if fn == "cancel_booking":
+            ok, reason, screening_id, seats = result
+            if ok:
+                self._seats_changed(screening_id, removed=seats)
+            return [ok, reason]
+        if fn == "mark_seats_taken":
+            params = dict(zip(("screening_id", "seats"), args), **kwargs)
+            self._seats_changed(params["screening_id"], added={s.strip() for s in params["seats"]})
+        return result
+
+    async def _solo_write(self, fn: str, args, kwargs):
+        loop = asyncio.get_running_loop()
+
+        def run():
+            result = storage.REMOTE[fn](*args, **kwargs)
+            return result, _affected_screenings(fn, args, kwargs)
+
+        result, affected = await loop.run_in_executor(None, run)
+        for screening_id in affected:
+            # засяга много места - прожекцията се презарежда при нужда
+            self._seat_version[screening_id] = self._seat_version.get(screening_id, 0) + 1
+            self._seats.pop(screening_id, None)
+        return result
+
+
+def _affected_screenings(fn: str, args: Sequence, kwargs: dict) -> Set[int]:
+    """Прожекциите, чиито места променя solo запис (вика се след записа)."""
+    if fn == "cancel_show":
+        return {kwargs["screening_id"] if "screening_id" in kwargs else args[0]}
+    if fn == "replay_bookings":
+        rows = kwargs["rows"] if "rows" in kwargs else args[0]
+        shows = {(row[1], row[3], row[4]) for row in rows}
+        # без @_remote обвивката: сървърът винаги чете файла, дори в
+        # процес, в който storage е в клиентски режим (тестове)
+        ids = (storage.REMOTE["find_screening"](*show) for show in shows)
+        return {screening_id for screening_id in ids if screening_id is not None}
+    return set()
+
+
+_BOOK_PARAMS = (
+    "movie_id", "movie_title", "hall", "starts_at", "show_time", "client_name",
+    "seats", "booking_code", "ticket_type", "price_per_seat", "total_price", "request_key",
+)
+
+
+def _bind_book_args(args: Sequence, kwargs: dict) -> dict:
+    bound = dict(zip(_BOOK_PARAMS, args))
+    bound.update(kwargs)
+    missing = [p for p in _BOOK_PARAMS[:-1] if p not in bound]
+    if missing:
+        raise TypeError(f"book() missing {', '.join(missing)}")
+    return bound
+
+
+# ---------------- CLIENT ----------------
+
+
+class BookingClient:
+    """Блокиращ клиент за storage в клиентски режим (една връзка, по една заявка)."""
+
+    def __init__(self, host: str, port: int, timeout: float = CLIENT_TIMEOUT_S) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_address(cls, address: str) -> "BookingClient":
+        return cls(*parse_address(address))
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._file = None
+
+    def call(self, fn: str, args: Sequence = (), kwargs: Optional[dict] = None):
+        with self._lock:
+            self._next_id += 1
+            request = {"id": self._next_id, "fn": fn, "args": list(args), "kwargs": kwargs or {}}
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._sock.sendall(_encode(request))
+                line = self._file.readline()
+                if not line:
+                    raise ConnectionError("Booking server closed the connection")
+            except OSError as e:
+                # Следващото извикване отваря нова връзка
+                self.close()
+                raise ConnectionError(f"Booking server {self.host}:{self.port} unreachable: {e}") from e
+
+        response = _decode(line)
+        if "error" in response:
+            raise _ERROR_TYPES.get(response["error"], RemoteError)(response.get("message", ""))
+        return response["result"]
+
+    def ping(self) -> bool:
+        return self.call("ping") == "pong"
+
+
+# ---------------- MAIN ----------------
+
+
+async def _serve(host: str, port: int) -> None:
+    server = BookingServer(host, port)
+    host, port = await server.start()
+    print(f"Booking server on {host}:{port} (db {storage.DB_PATH})")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    address = sys.argv[1] if len(sys.argv) > 1 else f"{DEFAULT_HOST}:{DEFAULT_PORT}"
+    try:
+        asyncio.run(_serve(*parse_address(address)))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,183 @@
+# bookings_browser.py
+
+from datetime import date
+from typing import List, Optional
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLineEdit,
+    QComboBox,
+    QLabel,
+    QTableView,
+    QHeaderView,
+)
+
+from storage import fetch_bookings_page, get_all_movie_titles, get_movie_id_for_title
+
+PAGE_SIZE = 200
+
+
+class BookingsTableModel(QAbstractTableModel):
+    """
+    Модел за резервациите със "мързеливо" зареждане:
+    QTableView вика fetchMore() при скролване и моделът дочита
+    следващата страница по keyset (id < последния зареден).
+    """
+
+    HEADERS = ["Code", "Created", "Client", "Movie", "Hall", "Time", "Seats", "Total", "Status"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[tuple] = []
+        self._filters = {}
+        self._has_more = True
+
+    # ---------- filters ----------
+
+    def set_filters(self, **filters) -> None:
+        self.beginResetModel()
+        self._filters = filters
+        self._rows = []
+        self._has_more = True
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    # ---------- lazy loading ----------
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent: QModelIndex) -> None:
+        if parent.isValid() or not self._has_more:
+            return
+        before_id = self._rows[-1][0] if self._rows else None
+        page = fetch_bookings_page(before_id=before_id, limit=PAGE_SIZE, **self._filters)
+        self._has_more = len(page) == PAGE_SIZE
+        if not page:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    # ---------- model API ----------
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        (_, code, created_at, client, movie, hall, show_time,
+         seats, total_price, is_canceled) = self._rows[index.row()]
+        values = (
+            code,
+            created_at,
+            client,
+            movie,
+            hall,
+            show_time,
+            seats,
+            f"{total_price:.2f}" if total_price is not None else "—",
+            "Canceled" if is_canceled else "Active",
+        )
+        return values[index.column()]
+
+
+class BookingsBrowserDialog(QDialog):
+    """Търсене и преглед на резервации (Admin)."""
+
+    FILTER_DELAY_MS = 250
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Admin · Bookings")
+        self.resize(900, 520)
+
+        layout = QVBoxLayout()
+
+        filter_row = QHBoxLayout()
+        self.code_edit = QLineEdit()
+        self.code_edit.setPlaceholderText("Code starts with…")
+        self.client_edit = QLineEdit()
+        self.client_edit.setPlaceholderText("Client starts with…")
+        self.movie_combo = QComboBox()
+        self.movie_combo.addItem("All movies")
+        self.movie_combo.addItems(get_all_movie_titles())
+        self.date_edit = QLineEdit()
+        self.date_edit.setPlaceholderText("Date (YYYY-MM-DD)")
+
+        filter_row.addWidget(self.code_edit)
+        filter_row.addWidget(self.client_edit)
+        filter_row.addWidget(self.movie_combo)
+        filter_row.addWidget(self.date_edit)
+        layout.addLayout(filter_row)
+
+        self.model = BookingsTableModel(self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.verticalHeader().setVisible(False)
+        # Фиксирана височина на редовете -> view-ът не мери невидимите редове
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(24)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.view.setSelectionBehavior(QTableView.SelectRows)
+        layout.addWidget(self.view)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+        # Филтрите се прилагат след кратка пауза в писането
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self._apply_filters)
+
+        self.code_edit.textChanged.connect(self.filter_timer.start)
+        self.client_edit.textChanged.connect(self.filter_timer.start)
+        self.date_edit.textChanged.connect(self.filter_timer.start)
+        self.movie_combo.currentIndexChanged.connect(self._apply_filters)
+
+        self._apply_filters()
+
+    def _selected_movie_id(self) -> str:
+        if self.movie_combo.currentIndex() <= 0:
+            return ""
+        return get_movie_id_for_title(self.movie_combo.currentText())
+
+    def _parse_day(self) -> Optional[str]:
+        text = self.date_edit.text().strip()
+        if not text:
+            return ""
+        try:
+            return date.fromisoformat(text).isoformat()
+        except ValueError:
+            return None
+
+    def _apply_filters(self) -> None:
+        day = self._parse_day()
+        if day is None:
+            self.status_label.setText("Date must be YYYY-MM-DD.")
+            return
+        self.model.set_filters(
+            code_prefix=self.code_edit.text().strip(),
+            client_prefix=self.client_edit.text().strip(),
+            movie_id=self._selected_movie_id(),
+            day=day,
+        )
+        more = "+" if self.model.canFetchMore(QModelIndex()) else ""
+        self.status_label.setText(f"{self.model.rowCount()}{more} bookings")
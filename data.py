@@ -2,37 +2,42 @@
 
 from typing import Dict, List
 
-# Movies, halls, and showtimes.
+# Movies, halls, and showtimes (без застъпване в залата, вж. TURNAROUND_MIN).
 MOVIES: Dict[str, Dict] = {
     "True Romance": {
         "id": "true_romance",
+        "duration_min": 120,
         "halls": {
-            "Hall 1": ["12:00", "16:30", "21:00"],
-            "Hall 2": ["14:15", "19:45"],
+            "Hall 1": ["12:30", "17:30", "21:00"],
+            "Hall 2": ["13:15", "19:45"],
         },
     },
     "Indiana Jones and the Last Crusade": {
         "id": "indiana_jones_3",
+        "duration_min": 127,
         "halls": {
-            "Hall 1": ["11:00", "15:00"],
-            "Hall 3": ["18:30", "21:30"],
+            "Hall 1": ["10:00", "15:00"],
+            "Hall 3": ["19:00", "21:30"],
         },
     },
     "The Godfather": {
         "id": "godfather",
+        "duration_min": 175,
         "halls": {
-            "Hall 2": ["13:00", "17:30"],
+            "Hall 2": ["10:00", "15:30"],
             "VIP Hall": ["20:30"],
         },
     },
     "Pulp Fiction": {
         "id": "pulp_fiction",
+        "duration_min": 154,
         "halls": {
-            "Hall 3": ["12:30", "17:00", "22:15"],
+            "Hall 3": ["10:00", "13:00", "16:00"],
         },
     },
     "Lost Highway": {
         "id": "lost_highway",
+        "duration_min": 134,
         "halls": {
             "Hall 4": ["19:00", "23:30"],
         },
@@ -42,6 +47,24 @@ MOVIES: Dict[str, Dict] = {
 ROWS: List[str] = list("ABCDEFGH")  # A–H
 NUM_COLUMNS: int = 12               # 1–12
 
+DEFAULT_DURATION_MIN: int = 120     # за филми без зададена продължителност
+TURNAROUND_MIN: int = 15            # почистване на залата между две прожекции
+
+# Начални цени по тип билет (стават базови правила в price_rules)
+DEFAULT_TICKET_PRICES: Dict[str, float] = {
+    "Standard": 12.0,
+    "Student": 9.0,
+    "Child": 8.0,
+    "VIP": 18.0,
+}
+
+# Клас на мястото по ред (за правила за цена по клас)
+SEAT_CLASSES: Dict[str, str] = {
+    "A": "front", "B": "front",
+    "C": "standard", "D": "standard", "E": "standard", "F": "standard",
+    "G": "premium", "H": "premium",
+}
+
 
 def get_movie_titles() -> List[str]:
     return list(MOVIES.keys())
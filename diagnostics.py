@@ -0,0 +1,153 @@
+# diagnostics.py
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+
+# Колко последни заявки пазим за "най-бавни".
+RECENT_QUERIES = 200
+RECENT_SAMPLES = 50
+# Заявки/сек се броят в кофи по секунда (независимо от RECENT_QUERIES).
+QPS_BUCKETS = 60
+
+
+class PerfCounters:
+    """
+    Живи броячи за диагностичния прозорец:
+    - SQL заявки (брой/сек, най-бавни последни)
+    - cache hit/miss по име на кеш
+    - брой престилизирания на места
+    - време за генериране на PDF
+    - закъснение на event loop-а
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._queries: Deque[Tuple[float, float, str]] = deque(maxlen=RECENT_QUERIES)
+            self._query_buckets: Deque[List[int]] = deque(maxlen=QPS_BUCKETS)  # [секунда, брой]
+            self.total_queries = 0
+            self._caches: Dict[str, List[int]] = {}
+            self.seat_restyles = 0
+            self._pdf_renders: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+            self._loop_lag: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+    # ---------- recording ----------
+
+    def record_query(self, sql: str, duration: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._queries.append((now, duration, sql))
+            self.total_queries += 1
+            second = int(now)
+            if self._query_buckets and self._query_buckets[-1][0] == second:
+                self._query_buckets[-1][1] += 1
+            else:
+                self._query_buckets.append([second, 1])
+
+    def record_cache(self, name: str, hit: bool) -> None:
+        with self._lock:
+            stats = self._caches.setdefault(name, [0, 0])
+            stats[0 if hit else 1] += 1
+
+    def add_seat_restyles(self, count: int = 1) -> None:
+        with self._lock:
+            self.seat_restyles += count
+
+    def record_pdf_render(self, duration: float) -> None:
+        with self._lock:
+            self._pdf_renders.append(duration)
+
+    def record_loop_lag(self, lag: float) -> None:
+        with self._lock:
+            self._loop_lag.append(max(lag, 0.0))
+
+    # ---------- reading ----------
+
+    def queries_per_second(self, window: int = 5) -> float:
+        """Средно за последните `window` пълни секунди (текущата не е приключила)."""
+        current = int(time.monotonic())
+        with self._lock:
+            recent = sum(n for second, n in self._query_buckets if current - window <= second < current)
+        return recent / window
+
+    def slowest_queries(self, limit: int = 5) -> List[Tuple[float, str]]:
+        """(секунди, sql) за най-бавните от последните заявки."""
+        with self._lock:
+            rows = [(duration, " ".join(sql.split())) for _, duration, sql in self._queries]
+        rows.sort(key=lambda r: r[0], reverse=True)
+        return rows[:limit]
+
+    def cache_hit_rates(self) -> List[Tuple[str, int, int, float]]:
+        """(име, hits, misses, процент попадения) за всеки кеш."""
+        with self._lock:
+            items = sorted((name, h, m) for name, (h, m) in self._caches.items())
+        return [(name, h, m, h / (h + m) if h + m else 0.0) for name, h, m in items]
+
+    def pdf_render_times(self) -> Tuple[float, float]:
+        """(последно, средно) време за PDF в секунди."""
+        with self._lock:
+            samples = list(self._pdf_renders)
+        if not samples:
+            return 0.0, 0.0
+        return samples[-1], sum(samples) / len(samples)
+
+    def loop_lag(self) -> Tuple[float, float]:
+        """(последно, максимално) закъснение на event loop-а в секунди."""
+        with self._lock:
+            samples = list(self._loop_lag)
+        if not samples:
+            return 0.0, 0.0
+        return samples[-1], max(samples)
+
+
+COUNTERS = PerfCounters()
+
+
+# ----------------- SQLITE INSTRUMENTATION -----------------
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor, който отчита времето на всяка заявка в COUNTERS."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            COUNTERS.record_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            COUNTERS.record_query(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            COUNTERS.record_query(sql_script, time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Връзка, чиито cursor-и са TimedCursor (ползва се като factory)."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
@@ -0,0 +1,234 @@
+# hall_index.py
+
+"""
+Индекс на заетостта на залите за проверка за застъпване.
+
+За всяка зала се пазят три подредени списъка от интервали (в минути):
+- dated     - датираните прожекции (screenings), абсолютно време
+- daily     - ежедневните шаблони (shows), минути от денонощието
+- dated_tod - датираните прожекции, проектирани върху денонощието,
+              за проверка на нов шаблон срещу вече насрочените дни
+
+Проверката е bisect по началата + кратък обход назад, докато предходните
+интервали могат да стигнат до новия (ограничен от най-дългия интервал
+в списъка) - O(log n) при реална програма, дори ако в старите данни вече
+има застъпвания.
+
+Индексът се строи от базата при първа нужда и се обновява при всеки
+запис през `add_show` / `add_screenings` тук. Записи от други терминали
+се виждат след `rebuild()` (Admin го прави при всяко отваряне); затова
+storage прави същата проверка и в транзакцията на самия запис.
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import storage
+from data import DEFAULT_DURATION_MIN, TURNAROUND_MIN
+
+DAY_MIN = 24 * 60
+
+
+@dataclass(frozen=True)
+class Conflict:
+    """Прожекцията, с която се застъпва новата."""
+
+    movie_id: str
+    when: str  # starts_at или "HH:MM" (ежедневна)
+
+    def describe(self) -> str:
+        return f"{self.movie_id} at {self.when}"
+
+
+class IntervalIndex:
+    """Интервали [start, end), подредени по start."""
+
+    def __init__(self) -> None:
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.labels: List[Hashable] = []
+        self.max_len = 0
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: int, end: int, label: Hashable) -> None:
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.labels.insert(i, label)
+        self.max_len = max(self.max_len, end - start)
+
+    def contains(self, start: int, end: int) -> bool:
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ends[i] == end:
+                return True
+            i += 1
+        return False
+
+    def find_overlap(self, start: int, end: int, gap: int = 0) -> Optional[Hashable]:
+        """Етикет на интервал, по-близо от `gap` до [start, end), или None."""
+        starts, ends = self.starts, self.ends
+        i = bisect_left(starts, start)
+        if i < len(starts) and starts[i] < end + gap:
+            return self.labels[i]
+        # Назад: само интервалите, започнали до max_len + gap преди start
+        lowest = start - self.max_len - gap
+        j = i - 1
+        while j >= 0 and starts[j] > lowest:
+            if ends[j] + gap > start:
+                return self.labels[j]
+            j -= 1
+        return None
+
+    def find_overlap_daily(self, start: int, end: int, gap: int = 0) -> Optional[Hashable]:
+        """Като find_overlap, но в денонощие, което се повтаря (през полунощ)."""
+        for shift in (0, -DAY_MIN, DAY_MIN):
+            label = self.find_overlap(start + shift, end + shift, gap)
+            if label is not None:
+                return label
+        return None
+
+
+@dataclass
+class _Hall:
+    dated: IntervalIndex = field(default_factory=IntervalIndex)
+    daily: IntervalIndex = field(default_factory=IntervalIndex)
+    dated_tod: IntervalIndex = field(default_factory=IntervalIndex)
+
+
+def to_minutes(starts_at: str) -> int:
+    """starts_at ("YYYY-MM-DD HH:MM") -> минути от началото на летоброенето."""
+    day = date.fromisoformat(starts_at[:10]).toordinal()
+    return day * DAY_MIN + time_of_day(starts_at[11:16])
+
+
+def time_of_day(show_time: str) -> int:
+    """Час "HH:MM" -> минути от полунощ."""
+    hours, _, minutes = show_time.partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+class HallScheduleIndex:
+    def __init__(self, gap: int = TURNAROUND_MIN) -> None:
+        self.gap = gap
+        self._halls: Optional[Dict[str, _Hall]] = None
+        self._durations: Dict[str, int] = {}
+
+    # ---------- build ----------
+
+    def rebuild(self) -> None:
+        """Зарежда шаблоните и прожекциите от вчера нататък от базата."""
+        self._durations = storage.get_movie_durations()
+        self._halls = {}
+        for movie_id, hall, show_time in storage.get_show_templates():
+            self._add_template(movie_id, hall, show_time)
+        since = (date.today() - timedelta(days=1)).isoformat()
+        for movie_id, hall, starts_at in storage.get_screenings_between(since):
+            self._add_screening(movie_id, hall, starts_at)
+
+    def invalidate(self) -> None:
+        self._halls = None
+
+    def _hall(self, hall: str) -> _Hall:
+        if self._halls is None:
+            self.rebuild()
+        entry = self._halls.get(hall)
+        if entry is None:
+            entry = self._halls[hall] = _Hall()
+        return entry
+
+    def duration(self, movie_id: str) -> int:
+        if self._halls is None:
+            self.rebuild()
+        return self._durations.get(movie_id, DEFAULT_DURATION_MIN)
+
+    def _add_template(self, movie_id: str, hall: str, show_time: str) -> None:
+        start = time_of_day(show_time)
+        self._hall(hall).daily.add(start, start + self.duration(movie_id), Conflict(movie_id, show_time))
+
+    def _add_screening(self, movie_id: str, hall: str, starts_at: str) -> None:
+        entry = self._hall(hall)
+        start = to_minutes(starts_at)
+        end = start + self.duration(movie_id)
+        label = Conflict(movie_id, starts_at)
+        entry.dated.add(start, end, label)
+        # В проекцията една и съща прожекция всеки ден е един интервал
+        tod = start % DAY_MIN
+        if not entry.dated_tod.contains(tod, tod + (end - start)):
+            entry.dated_tod.add(tod, tod + (end - start), label)
+
+    # ---------- checks ----------
+
+    def check_screening(self, movie_id: str, hall: str, starts_at: str) -> Optional[Conflict]:
+        """Застъпване на датирана прожекция с друга или с ежедневен шаблон."""
+        entry = self._hall(hall)
+        start = to_minutes(starts_at)
+        end = start + self.duration(movie_id)
+        conflict = entry.dated.find_overlap(start, end, self.gap)
+        if conflict is None:
+            tod = start % DAY_MIN
+            conflict = entry.daily.find_overlap_daily(tod, tod + (end - start), self.gap)
+        return conflict
+
+    def check_template(self, movie_id: str, hall: str, show_time: str) -> Optional[Conflict]:
+        """Застъпване на ежедневен шаблон с друг шаблон или с насрочена прожекция."""
+        entry = self._hall(hall)
+        start = time_of_day(show_time)
+        end = start + self.duration(movie_id)
+        conflict = entry.daily.find_overlap_daily(start, end, self.gap)
+        if conflict is None:
+            conflict = entry.dated_tod.find_overlap_daily(start, end, self.gap)
+        return conflict
+
+    # ---------- writes ----------
+
+    def add_show(self, movie_id: str, hall: str, show_time: str) -> Optional[Conflict]:
+        """Записва ежедневен шаблон, ако не се застъпва. Връща конфликта или None."""
+        conflict = self.check_template(movie_id, hall, show_time)
+        if conflict is None:
+            try:
+                storage.add_show(movie_id, hall, show_time)
+            except ValueError:
+                # Застъпване със запис от друг терминал, който индексът не е видял
+                self.rebuild()
+                conflict = self.check_template(movie_id, hall, show_time)
+                if conflict is None:
+                    raise
+                return conflict
+            self._add_template(movie_id, hall, show_time)
+        return conflict
+
+    def add_screenings(
+        self, rows: Iterable[Tuple[str, str, str]]
+    ) -> Tuple[int, List[Tuple[Tuple[str, str, str], Conflict]]]:
+        """
+        Записва прожекциите (movie_id, hall, starts_at), които не се
+        застъпват с нищо (вкл. помежду си), в една транзакция.
+        Връща (записани, [(ред, конфликт)] за отхвърлените).
+        """
+        accepted, rejected = [], []
+        for row in rows:
+            conflict = self.check_screening(*row)
+            if conflict is None:
+                self._add_screening(*row)
+                accepted.append(row)
+            else:
+                rejected.append((row, conflict))
+        if not accepted:
+            return 0, rejected
+        try:
+            inserted = storage.add_screenings(accepted)
+        except Exception:
+            self.invalidate()
+            raise
+        if inserted < len(accepted):
+            # storage е отхвърлил застъпване, което индексът не е видял
+            self.invalidate()
+        return inserted, rejected
+
+
+HALL_INDEX = HallScheduleIndex()
@@ -1,86 +1,156 @@
-from typing import Dict
-
-LANG_EN: Dict[str, str] = {
-    "app_title": "Cinema Booking System",
-    "reservation_group": "Reservation",
-    "seat_group": "Seat map",
-    "theme_group": "Theme",
-    "lang_group": "Language",
-
-    "subtitle": "Cashier desktop · Select movie, hall, time, seats.",
-    "seat_subtitle": "Click seats to select. Green = selected, gray = free.",
-
-    "movie_label": "Movie",
-    "hall_label": "Hall",
-    "time_label": "Screening time",
-    "client_label": "Client name",
-    "summary_label": "Summary",
-    "client_summary": "Client",
-    "seats_summary": "Seats",
-
-    "confirm_button": "Confirm booking",
-
-    "lang_en": "EN",
-    "lang_bg": "BG",
-
-    "status_missing_name": "Client name is required.",
-    "status_missing_seats": "Please select at least one seat.",
-
-    "status_booked": (
-        "Booking confirmed: {movie} · {hall} · {time}\n"
-        "Client: {client} | Seats: {seats} | Code: {code}"
-    ),
-
-    # Stats-related
-    "stats_title": "Statistics",
-    "stats_movie_column": "Movie",
-    "stats_tickets_column": "Tickets",
-    "stats_button": "Stats",
-}
+# i18n.py
+
+"""
+Преводи от външни каталози locales/<език>.json.
+
+Каталогът е плосък JSON: ключ -> текст (с полета за str.format) или
+ключ -> {"one": ..., "other": ...} за множествено число ({n} = броят).
+Нов език = нов JSON файл, без промяна в кода.
+
+При първо зареждане каталогът се компилира в locales/.cache/<език>.pickle
+(текстове + множествени форми). Кешът е валиден, докато mtime и размерът
+на JSON-а не се сменят, така че следващите стартирания само го
+разпикълват. Липсващ ключ -> английският текст -> самият ключ.
+"""
+
+import json
+import pickle
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+LOCALES_DIR = Path(__file__).resolve().parent / "locales"
+CACHE_DIR = LOCALES_DIR / ".cache"
+FALLBACK_LANG = "en"
+CACHE_FORMAT = 1  # сменя се при промяна на компилирания формат
+
+Messages = Dict[str, str]
+Plurals = Dict[str, Dict[str, str]]
+
+
+def _plural_one_other(n: int) -> str:
+    return "one" if n == 1 else "other"
 
-LANG_BG: Dict[str, str] = {
-    "app_title": "Система за кино резервации",
-    "reservation_group": "Резервация",
-    "seat_group": "Салон",
-    "theme_group": "Тема",
-    "lang_group": "Език",
-
-    "subtitle": "Касиерски режим · Избери филм, зала, час и места.",
-    "seat_subtitle": "Кликни върху местата за избор. Зелено = избрано, сиво = свободно.",
-
-    "movie_label": "Филм",
-    "hall_label": "Зала",
-    "time_label": "Час на прожекция",
-    "client_label": "Име на клиент",
-    "summary_label": "Обобщение",
-    "client_summary": "Клиент",
-    "seats_summary": "Места",
-
-    "confirm_button": "Потвърди",
-
-    "lang_en": "EN",
-    "lang_bg": "BG",
-
-    "status_missing_name": "Въведи име на клиента.",
-    "status_missing_seats": "Избери поне едно място.",
-
-    "status_booked": (
-        "Резервацията е потвърдена: {movie} · {hall} · {time}\n"
-        "Клиент: {client} | Места: {seats} | Код: {code}"
-    ),
-
-    # Stats-related
-    "stats_title": "Статистика",
-    "stats_movie_column": "Филм",
-    "stats_tickets_column": "Брой билети",
-    "stats_button": "Статистика",
-}
 
-LANGS = {
-    "en": LANG_EN,
-    "bg": LANG_BG,
+# Език -> функция брой -> форма (one/few/many/other)
+PLURAL_RULES: Dict[str, Callable[[int], str]] = {
+    "en": _plural_one_other,
+    "bg": _plural_one_other,
 }
 
 
-def get_translations(lang_code: str) -> Dict[str, str]:
-    return LANGS.get(lang_code, LANG_EN)
+class Catalog(Mapping):
+    """Компилиран каталог; като речник връща суровите текстове."""
+
+    def __init__(
+        self, lang: str, messages: Messages, plurals: Plurals, fallback: Optional["Catalog"] = None
+    ) -> None:
+        self.lang = lang
+        self.messages = messages
+        self.plurals = plurals
+        self.fallback = fallback
+        self._plural_rule = PLURAL_RULES.get(lang, _plural_one_other)
+
+    def __getitem__(self, key: str) -> str:
+        try:
+            return self.messages[key]
+        except KeyError:
+            if self.fallback is None:
+                raise
+            return self.fallback[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.messages)
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def text(self, key: str, **kwargs) -> str:
+        """Текстът за key, форматиран с kwargs (ако има)."""
+        message = self.get(key, key)
+        return message.format(**kwargs) if kwargs else message
+
+    def plural(self, key: str, n: int, **kwargs) -> str:
+        """Формата за броя n; {n} е достъпно в текста."""
+        forms = self.plurals.get(key)
+        if forms is None:
+            if self.fallback is not None:
+                return self.fallback.plural(key, n, **kwargs)
+            return key
+        message = forms.get(self._plural_rule(n), forms["other"])
+        return message.format(n=n, **kwargs)
+
+
+# ---------------- COMPILE ----------------
+
+def _compile(source: Path) -> Tuple[Messages, Plurals]:
+    with source.open(encoding="utf-8") as f:
+        raw = json.load(f)
+    messages: Messages = {}
+    plurals: Plurals = {}
+    for key, value in raw.items():
+        if isinstance(value, dict):
+            if "other" not in value:
+                raise ValueError(f"{source.name}: plural '{key}' has no 'other' form")
+            plurals[key] = {form: str(text) for form, text in value.items()}
+        else:
+            messages[key] = str(value)
+    return messages, plurals
+
+
+def _load_compiled(lang: str) -> Tuple[Messages, Plurals]:
+    source = LOCALES_DIR / f"{lang}.json"
+    stat = source.stat()
+    stamp = (CACHE_FORMAT, stat.st_mtime_ns, stat.st_size)
+    cache = CACHE_DIR / f"{lang}.pickle"
+
+    try:
+        with cache.open("rb") as f:
+            cached_stamp, messages, plurals = pickle.load(f)
+        if cached_stamp == stamp:
+            return messages, plurals
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        pass  # няма кеш или е повреден -> компилираме наново
+
+    messages, plurals = _compile(source)
+    try:
+        CACHE_DIR.mkdir(exist_ok=True)
+        tmp = cache.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump((stamp, messages, plurals), f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(cache)
+    except OSError:
+        pass  # кешът е само ускорение (напр. папка само за четене)
+    return messages, plurals
+
+
+# ---------------- API ----------------
+
+_catalogs: Dict[str, Catalog] = {}
+
+
+def available_languages() -> List[str]:
+    """Кодовете на езиците, за които има каталог."""
+    return sorted(p.stem for p in LOCALES_DIR.glob("*.json"))
+
+
+def load_catalog(lang_code: str) -> Catalog:
+    """Каталогът за езика (зарежда се веднъж); непознат език -> английски."""
+    catalog = _catalogs.get(lang_code)
+    if catalog is not None:
+        return catalog
+    if not (LOCALES_DIR / f"{lang_code}.json").exists():
+        return load_catalog(FALLBACK_LANG) if lang_code != FALLBACK_LANG else Catalog(lang_code, {}, {})
+
+    fallback = None if lang_code == FALLBACK_LANG else load_catalog(FALLBACK_LANG)
+    messages, plurals = _load_compiled(lang_code)
+    catalog = _catalogs[lang_code] = Catalog(lang_code, messages, plurals, fallback)
+    return catalog
+
+
+def reload_catalogs() -> None:
+    """Забравя заредените каталози (след редакция на JSON файловете)."""
+    _catalogs.clear()
+
+
+def get_translations(lang_code: str) -> Catalog:
+    return load_catalog(lang_code)
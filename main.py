@@ -1,15 +1,48 @@
 # main.py
 
+import os
 import sys
 from PyQt5.QtWidgets import QApplication
 from ui_main_window import MainWindow
+from profiling import capture_dir_from_args, start_capture
+import storage
+
+
+def _server_address(argv):
+    """
+    "host:port" за клиентски режим или None. booking_server (asyncio,
+    async_storage, write_queue) се зарежда само ако има --server или CINEMA_SERVER.
+    """
+    if not any(arg.startswith("--server") for arg in argv[1:]) and not os.environ.get("CINEMA_SERVER"):
+        return None
+    from booking_server import server_address_from_args
+
+    return server_address_from_args(argv)
 
 
 def main():
     app = QApplication(sys.argv)
+
+    capture_dir = capture_dir_from_args(sys.argv)
+    capture = start_capture(capture_dir) if capture_dir else None
+
+    # Клиентски режим: базата е в booking_server.py
+    server_address = _server_address(sys.argv)
+    if server_address:
+        storage.use_server(server_address)
+
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+
+    # последно прочетените списъци/места - за следващ старт без базата
+    from offline import JOURNAL
+
+    JOURNAL.flush_read_cache()
+
+    if capture is not None:
+        capture.stop()
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,541 @@
+# migrations.py
+
+"""
+Версионирани миграции на cinema.db.
+
+Версията на схемата се пази в PRAGMA user_version. Всяка миграция има
+номер и се прилага точно веднъж, по ред:
+- обикновените миграции вървят в една транзакция заедно с вдигането
+  на user_version (или всичко, или нищо);
+- batched миграциите (backfill на големи таблици) комитват на порции
+  чрез `backfill_in_batches` и пазят прогреса си в
+  schema_migration_progress, така че прекъсната миграция продължава
+  оттам, докъдето е стигнала. Така вървят и миграциите, които не могат
+  да са в транзакция (напр. VACUUM).
+
+Когато базата е актуална, `migrate` прави само едно PRAGMA четене.
+
+Ръчно: `python migrations.py` показва версията и прилага чакащите миграции.
+"""
+
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List, Sequence
+
+import sales
+import seat_events
+from data import DEFAULT_DURATION_MIN, DEFAULT_TICKET_PRICES, MOVIES
+
+BATCH_SIZE = 5000
+
+# Прогресът на batched миграциите; създава се от migrate преди първата от тях.
+CREATE_MIGRATION_PROGRESS = """
+    CREATE TABLE IF NOT EXISTS schema_migration_progress (
+        name TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    )
+"""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+    batched: bool = False
+
+
+# ----------------- HELPERS -----------------
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def backfill_in_batches(
+    conn: sqlite3.Connection,
+    name: str,
+    select_sql: str,
+    apply_batch: Callable[[sqlite3.Connection, List[tuple]], None],
+    batch_size: int = BATCH_SIZE,
+) -> None:
+    """
+    Обхожда таблица по keyset (id > последния обработен) на порции.
+    `select_sql` приема (last_id, limit) и връща редове с id на първа позиция.
+    Всяка порция е отделна транзакция, прогресът се пази под `name`
+    (по конвенция "<версия>:<стъпка>", за да се изчисти след миграцията).
+    Прогресът и версията се четат вътре в транзакцията на порцията, така
+    че друг терминал, който мигрира едновременно, продължава от същото
+    място, а не прилага порциите повторно.
+    """
+    version = int(name.split(":", 1)[0])
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= version:
+                conn.execute("COMMIT")  # друг терминал я е довършил
+                break
+            row = conn.execute(
+                "SELECT last_id FROM schema_migration_progress WHERE name = ?", (name,)
+            ).fetchone()
+            last_id = row[0] if row else 0
+            rows = conn.execute(select_sql, (last_id, batch_size)).fetchall()
+            if rows:
+                apply_batch(conn, rows)
+                conn.execute(
+                    "INSERT OR REPLACE INTO schema_migration_progress (name, last_id) VALUES (?, ?)",
+                    (name, rows[-1][0]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if len(rows) < batch_size:
+            break
+
+
+# ----------------- MIGRATIONS -----------------
+
+
+def _m001_base_schema(conn: sqlite3.Connection) -> None:
+    """Основните таблици + колоните, добавяни ad hoc в по-стари бази."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_code TEXT NOT NULL,
+            movie_id TEXT NOT NULL,
+            movie_title TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            show_time TEXT NOT NULL,
+            client_name TEXT NOT NULL,
+            seats TEXT NOT NULL,
+            ticket_type TEXT,
+            price_per_seat REAL,
+            total_price REAL,
+            is_canceled INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            canceled_at TIMESTAMP
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS taken_seats (
+            movie_id TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            show_time TEXT NOT NULL,
+            seat_id TEXT NOT NULL,
+            PRIMARY KEY (movie_id, hall, show_time, seat_id)
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS movies (
+            movie_id TEXT PRIMARY KEY,
+            title TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movie_id TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            show_time TEXT NOT NULL
+        )
+        """
+    )
+
+    cols = _columns(conn, "bookings")
+    for name, ddl in (
+        ("ticket_type", "TEXT"),
+        ("price_per_seat", "REAL"),
+        ("total_price", "REAL"),
+        ("is_canceled", "INTEGER NOT NULL DEFAULT 0"),
+        ("canceled_at", "TIMESTAMP"),
+    ):
+        if name not in cols:
+            conn.execute(f"ALTER TABLE bookings ADD COLUMN {name} {ddl}")
+
+
+def _m002_lookup_indexes(conn: sqlite3.Connection) -> None:
+    """Индекси за отказ по код и за списъците със зали/часове."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_code ON bookings (booking_code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shows_movie_hall ON shows (movie_id, hall, show_time)")
+
+
+def _m003_sales_aggregates(conn: sqlite3.Connection) -> None:
+    """Агрегатни таблици за продажбите + backfill от bookings на порции."""
+    conn.execute(sales.CREATE_SALES_DAILY)
+    conn.execute(sales.CREATE_SALES_BY_MOVIE)
+    backfill_in_batches(
+        conn,
+        "3:sales",
+        """
+        SELECT id, movie_id, movie_title, hall, show_time, date(created_at),
+               seats, total_price, is_canceled
+        FROM bookings
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+        """,
+        lambda c, rows: sales.add_booking_rows(c.cursor(), rows),
+    )
+
+
+def _m004_booking_browse_indexes(conn: sqlite3.Connection) -> None:
+    """Индекси за филтрите в браузъра на резервации (rowid е последната колона)."""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_bookings_client ON bookings (client_name COLLATE NOCASE)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_movie ON bookings (movie_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_created ON bookings (created_at)")
+
+
+def _m005_bookings_fts(conn: sqlite3.Connection) -> None:
+    """
+    FTS5 индекс по клиент, код и филм (external content върху bookings),
+    синхронизиран с тригери. Попълва се с 'rebuild' в същата транзакция.
+    """
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS bookings_fts USING fts5(
+            client_name, booking_code, movie_title,
+            content='bookings', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS bookings_fts_vocab USING fts5vocab(bookings_fts, 'row')"
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS bookings_fts_ai AFTER INSERT ON bookings BEGIN
+            INSERT INTO bookings_fts (rowid, client_name, booking_code, movie_title)
+            VALUES (new.id, new.client_name, new.booking_code, new.movie_title);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS bookings_fts_ad AFTER DELETE ON bookings BEGIN
+            INSERT INTO bookings_fts (bookings_fts, rowid, client_name, booking_code, movie_title)
+            VALUES ('delete', old.id, old.client_name, old.booking_code, old.movie_title);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS bookings_fts_au
+        AFTER UPDATE OF client_name, booking_code, movie_title ON bookings BEGIN
+            INSERT INTO bookings_fts (bookings_fts, rowid, client_name, booking_code, movie_title)
+            VALUES ('delete', old.id, old.client_name, old.booking_code, old.movie_title);
+            INSERT INTO bookings_fts (rowid, client_name, booking_code, movie_title)
+            VALUES (new.id, new.client_name, new.booking_code, new.movie_title);
+        END
+        """
+    )
+    conn.execute("INSERT INTO bookings_fts (bookings_fts) VALUES ('rebuild')")
+
+
+def _m006_dated_screenings(conn: sqlite3.Connection) -> None:
+    """
+    Прожекции с дата: таблица screenings (id, филм, зала, начало).
+    taken_seats се преправя на (screening_id, seat_id), bookings получава
+    screening_id. Старите редове без дата отиват в една прожекция на
+    (филм, зала, час) с датата на последната продажба за нея
+    (до сега те така или иначе делят една карта на местата).
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS screenings (
+            id INTEGER PRIMARY KEY,
+            movie_id TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            starts_at TEXT NOT NULL,
+            UNIQUE (movie_id, hall, starts_at)
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screenings_hall_start ON screenings (hall, starts_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screenings_start ON screenings (starts_at)")
+
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO screenings (movie_id, hall, starts_at)
+        SELECT movie_id, hall, COALESCE(MAX(date(created_at)), date('now', 'localtime')) || ' ' || show_time
+        FROM (
+            SELECT movie_id, hall, show_time, created_at FROM bookings
+            UNION ALL
+            SELECT movie_id, hall, show_time, NULL FROM taken_seats
+        )
+        GROUP BY movie_id, hall, show_time
+        """
+    )
+
+    if "screening_id" not in _columns(conn, "bookings"):
+        conn.execute("ALTER TABLE bookings ADD COLUMN screening_id INTEGER")
+    conn.execute(
+        """
+        UPDATE bookings
+        SET screening_id = (
+            SELECT s.id FROM screenings s
+            WHERE s.movie_id = bookings.movie_id
+              AND s.hall = bookings.hall
+              AND substr(s.starts_at, 12) = bookings.show_time
+        )
+        WHERE screening_id IS NULL
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_screening ON bookings (screening_id)")
+
+    conn.execute(
+        """
+        CREATE TABLE taken_seats_new (
+            screening_id INTEGER NOT NULL,
+            seat_id TEXT NOT NULL,
+            PRIMARY KEY (screening_id, seat_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO taken_seats_new (screening_id, seat_id)
+        SELECT s.id, t.seat_id
+        FROM taken_seats t
+        JOIN screenings s
+          ON s.movie_id = t.movie_id
+         AND s.hall = t.hall
+         AND substr(s.starts_at, 12) = t.show_time
+        """
+    )
+    conn.execute("DROP TABLE taken_seats")
+    conn.execute("ALTER TABLE taken_seats_new RENAME TO taken_seats")
+
+
+def _m007_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """
+    auto_vacuum=INCREMENTAL, за да може архивирането да връща място
+    на порции. Смяната изисква еднократен пълен VACUUM (извън транзакция).
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+
+def _m008_movie_durations(conn: sqlite3.Connection) -> None:
+    """
+    movies.duration_min - продължителност в минути, нужна за проверка
+    за застъпване на прожекции в една зала.
+    """
+    if "duration_min" not in _columns(conn, "movies"):
+        conn.execute(
+            f"ALTER TABLE movies ADD COLUMN duration_min INTEGER NOT NULL DEFAULT {DEFAULT_DURATION_MIN}"
+        )
+    conn.executemany(
+        "UPDATE movies SET duration_min = ? WHERE movie_id = ?",
+        [(info["duration_min"], info["id"]) for info in MOVIES.values() if "duration_min" in info],
+    )
+
+
+def _m009_price_rules(conn: sqlite3.Connection) -> None:
+    """
+    Правила за цени (pricing.py). Празно поле = за всички.
+    kind: base (задава цена), percent (+/- процент), fixed (+/- сума).
+    Началните правила са досегашните цени по тип билет.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS price_rules (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN ('base', 'percent', 'fixed')),
+            amount REAL NOT NULL,
+            ticket_type TEXT,
+            movie_id TEXT,
+            hall TEXT,
+            seat_class TEXT,
+            weekdays TEXT,      -- "5,6" (0 = понеделник)
+            time_from TEXT,     -- "HH:MM", включително
+            time_to TEXT,       -- "HH:MM", без
+            valid_from TEXT,    -- "YYYY-MM-DD", включително (промоции)
+            valid_to TEXT,      -- "YYYY-MM-DD", включително
+            priority INTEGER NOT NULL DEFAULT 0,
+            active INTEGER NOT NULL DEFAULT 1
+        )
+        """
+    )
+    if conn.execute("SELECT COUNT(*) FROM price_rules").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO price_rules (name, kind, amount, ticket_type) VALUES (?, 'base', ?, ?)",
+            [(f"{t} ticket", price, t) for t, price in DEFAULT_TICKET_PRICES.items()],
+        )
+
+
+def _m010_booking_request_keys(conn: sqlite3.Connection) -> None:
+    """
+    bookings.request_key - ключ на заявката за продажба (idempotency key).
+    Повторен book със същия ключ връща първата резервация, вместо да
+    създаде втора. Старите редове нямат ключ (NULL не се брои за дубликат).
+    """
+    if "request_key" not in _columns(conn, "bookings"):
+        conn.execute("ALTER TABLE bookings ADD COLUMN request_key TEXT")
+    conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_request_key
+        ON bookings (request_key) WHERE request_key IS NOT NULL
+        """
+    )
+
+
+def _m011_seat_events(conn: sqlite3.Connection) -> None:
+    """
+    Журнал на местата (seat_events.py) + снимки. Текущите заети места
+    стават базова снимка - историята започва от миграцията.
+    """
+    conn.execute(seat_events.CREATE_SEAT_EVENTS)
+    conn.execute(seat_events.CREATE_SEAT_EVENTS_INDEX)
+    conn.execute(seat_events.CREATE_SEAT_SNAPSHOTS)
+    seat_events.snapshot_current(conn)
+
+
+def _m012_backup_runs(conn: sqlite3.Connection) -> None:
+    """
+    backup_runs - кой терминал е поел планирания backup и кога
+    (backup.claim_scheduled_backup): базата е обща, копие е нужно едно.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS backup_runs (
+            id INTEGER PRIMARY KEY,
+            started_at INTEGER NOT NULL,
+            host TEXT NOT NULL,
+            finished_at INTEGER,
+            path TEXT
+        )
+        """
+    )
+
+
+def _m013_fts_column_vocab(conn: sqlite3.Connection) -> None:
+    """
+    Речник на FTS индекса по колони: размитото търсене обхожда само
+    думите от имената и заглавията, не кодовете на резервациите
+    (по един уникален код на ред - те са почти целият речник).
+    """
+    conn.execute("DROP TABLE IF EXISTS bookings_fts_vocab")
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS bookings_fts_vocab USING fts5vocab(bookings_fts, 'col')"
+    )
+
+
+def _m014_booking_browse_keys(conn: sqlite3.Connection) -> None:
+    """
+    Филтрите в браузъра на резервации без сортиране на съвпаденията:
+    - bookings.client_fold = str.casefold(client_name): NOCASE сгъва само
+      ASCII, така че "иван" не намираше "Иван";
+    - индекс по date(created_at): денят става равенство и ORDER BY id
+      идва наготово от индекса (rowid е последната колона).
+    """
+    if "client_fold" not in _columns(conn, "bookings"):
+        conn.execute("ALTER TABLE bookings ADD COLUMN client_fold TEXT")
+    conn.create_function("casefold", 1, lambda s: (s or "").casefold(), deterministic=True)
+    conn.execute("UPDATE bookings SET client_fold = casefold(client_name) WHERE client_fold IS NULL")
+    conn.execute("DROP INDEX IF EXISTS idx_bookings_client")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_client_fold ON bookings (client_fold)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bookings_day ON bookings (date(created_at))")
+
+
+MIGRATIONS: Sequence[Migration] = (
+    Migration(1, "base schema", _m001_base_schema),
+    Migration(2, "lookup indexes", _m002_lookup_indexes),
+    Migration(3, "sales aggregates", _m003_sales_aggregates, batched=True),
+    Migration(4, "booking browse indexes", _m004_booking_browse_indexes),
+    Migration(5, "bookings full-text index", _m005_bookings_fts),
+    Migration(6, "dated screenings", _m006_dated_screenings),
+    Migration(7, "incremental vacuum", _m007_incremental_vacuum, batched=True),
+    Migration(8, "movie durations", _m008_movie_durations),
+    Migration(9, "price rules", _m009_price_rules),
+    Migration(10, "booking request keys", _m010_booking_request_keys),
+    Migration(11, "seat event log", _m011_seat_events),
+    Migration(12, "backup runs", _m012_backup_runs),
+    Migration(13, "full-text column vocabulary", _m013_fts_column_vocab),
+    Migration(14, "booking browse keys", _m014_booking_browse_keys),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ----------------- RUNNER -----------------
+
+
+def pending(conn: sqlite3.Connection) -> List[Migration]:
+    version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Прилага чакащите миграции. Връща колко са приложени от тази връзка.
+    Версията се проверява отново след BEGIN IMMEDIATE: ако друг терминал
+    вече е приложил миграцията, тя се прескача.
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return 0
+
+    applied = 0
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None  # транзакциите се управляват ръчно
+    try:
+        conn.execute(CREATE_MIGRATION_PROGRESS)
+        for migration in MIGRATIONS:
+            if current_version(conn) >= migration.version:
+                continue
+            if migration.batched:
+                # Порциите комитват сами; тук само отбелязваме края.
+                migration.apply(conn)
+                conn.execute("BEGIN IMMEDIATE")
+                if current_version(conn) >= migration.version:
+                    conn.execute("COMMIT")
+                    continue
+                conn.execute(
+                    "DELETE FROM schema_migration_progress WHERE name LIKE ?",
+                    (f"{migration.version}:%",),
+                )
+            else:
+                conn.execute("BEGIN IMMEDIATE")
+                if current_version(conn) >= migration.version:
+                    conn.execute("COMMIT")
+                    continue
+                try:
+                    migration.apply(conn)
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+            conn.execute("COMMIT")
+            applied += 1
+    finally:
+        conn.isolation_level = old_isolation
+    return applied
+
+
+if __name__ == "__main__":
+    from storage import get_connection
+
+    connection = get_connection()
+    print(f"Schema version: {current_version(connection)} (latest {LATEST_VERSION})")
+    for m in pending(connection):
+        print(f"  pending: {m.version} {m.name}{' (batched)' if m.batched else ''}")
+    applied = migrate(connection)
+    print(f"Applied {applied} migration(s), now at {current_version(connection)}")
+    connection.close()
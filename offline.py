@@ -0,0 +1,491 @@
+# offline.py
+
+"""
+Офлайн режим: продажби, когато cinema.db (напр. на мрежов диск) е недостъпна.
+
+Всяка продажба, която не може да се запише в основната база, отива в
+локален журнал (journal.db до програмата - JOURNAL_PATH трябва да е на
+локалния диск). Журналът е само за добавяне: продажбите не се променят,
+резултатът от синхронизацията се пази в отделна таблица.
+
+Офлайн = файлът не може да се отвори или I/O грешка (is_offline_error).
+Заключена база (backup, архивиране) не е офлайн: call_db повтаря
+заявката и накрая вдига DatabaseBusy - продажбата не отива в журнала.
+
+Докато сме офлайн:
+- основната база не се пипа изобщо (никакви таймаути при всяка продажба),
+  докато `probe()` не я види отново;
+- заетите места = последно видяното от базата + продаденото офлайн, така
+  че терминалът не продава едно място два пъти. Места за терминала не се
+  резервират предварително: друга каса (онлайн или също офлайн) може да
+  продаде същото място. Рискът се показва на касиера при всяка офлайн
+  продажба, а при sync такава продажба излиза като конфликт;
+- списъците с зали/часове/филми идват от последно прочетените стойности
+  (пазят се в паметта и се записват в journal.db на READ_CACHE_FLUSH_S
+  и при минаване офлайн).
+
+`sync()` записва чакащите продажби в базата на порции от SYNC_BATCH (една
+транзакция на порция, вж. storage.replay_bookings). Продажба, чиито места
+междувременно са продадени от друг терминал, не се записва и се връща
+като конфликт - касиерът трябва да я уреди с клиента. Невалиден ред
+(грешно място и т.н.) се маркира "failed" с текста на грешката и не
+спира продажбите след него.
+
+Ръчно: `python offline.py` (състояние) или `python offline.py sync`.
+"""
+
+import json
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import storage
+
+JOURNAL_PATH = Path(__file__).resolve().parent / "journal.db"
+SYNC_BATCH = 50
+SYNC_INTERVAL_S = 15       # през колко време MainWindow проверява за базата
+PROBE_TIMEOUT_S = 2.0
+
+READ_CACHE_FLUSH_S = 60    # колко често read_cache се записва в journal.db онлайн
+BUSY_RETRIES = 3
+BUSY_BACKOFF_S = 0.05
+
+# Текстове на sqlite3.OperationalError, при които базата е недостъпна
+# (мрежовият диск е изчезнал). "database is locked" НЕ е сред тях -
+# backup/архив държат lock за кратко и заявката се повтаря.
+_OFFLINE_MESSAGES = ("unable to open database", "disk i/o error")
+_BUSY_MESSAGES = ("database is locked", "database is busy", "database table is locked")
+
+
+class DatabaseOffline(Exception):
+    """Основната база (или booking_server) е недостъпна."""
+
+
+class DatabaseBusy(Exception):
+    """Базата остава заключена и след повторенията."""
+
+
+def is_offline_error(error: BaseException) -> bool:
+    if isinstance(error, OSError):  # вкл. ConnectionError от booking_server
+        return True
+    return isinstance(error, sqlite3.OperationalError) and any(
+        m in str(error).lower() for m in _OFFLINE_MESSAGES
+    )
+
+
+def is_busy_error(error: BaseException) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and any(
+        m in str(error).lower() for m in _BUSY_MESSAGES
+    )
+
+
+def call_db(fn: Callable, *args, **kwargs):
+    """
+    fn(...) върху основната база: заета база -> до BUSY_RETRIES повторения
+    (после DatabaseBusy), недостъпна -> DatabaseOffline. Другите грешки минават.
+    """
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return fn(*args, **kwargs)
+        except (sqlite3.OperationalError, OSError) as e:
+            if is_offline_error(e):
+                raise DatabaseOffline(str(e)) from e
+            if not is_busy_error(e):
+                raise
+            if attempt == BUSY_RETRIES:
+                raise DatabaseBusy(str(e)) from e
+        time.sleep(BUSY_BACKOFF_S * 2 ** attempt)
+
+_JOURNAL_COLUMNS = (
+    "booking_code, movie_id, movie_title, hall, starts_at, show_time, client_name, "
+    "seats, ticket_type, price_per_seat, total_price, created_at, request_key"
+)
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_code TEXT NOT NULL UNIQUE,
+    movie_id TEXT NOT NULL,
+    movie_title TEXT NOT NULL,
+    hall TEXT NOT NULL,
+    starts_at TEXT NOT NULL,
+    show_time TEXT NOT NULL,
+    client_name TEXT NOT NULL,
+    seats TEXT NOT NULL,
+    ticket_type TEXT,
+    price_per_seat REAL,
+    total_price REAL,
+    created_at TEXT NOT NULL,
+    request_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_show ON journal (movie_id, hall, starts_at);
+
+CREATE TABLE IF NOT EXISTS journal_sync (
+    seq INTEGER PRIMARY KEY REFERENCES journal (seq),
+    status TEXT NOT NULL CHECK (status IN ('synced', 'conflict', 'failed')),
+    detail TEXT NOT NULL DEFAULT '',
+    synced_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS read_cache (
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (name, args)
+);
+"""
+
+
+@dataclass
+class SyncReport:
+    synced: int = 0
+    # (booking_code, client_name, местата, продадени другаде)
+    conflicts: List[Tuple[str, str, str]] = field(default_factory=list)
+    # (booking_code, client_name, грешката) - невалидни редове, пропуснати
+    failed: List[Tuple[str, str, str]] = field(default_factory=list)
+    remaining: int = 0
+    error: str = ""  # sync е спрял заради грешка в базата; редовете чакат
+
+
+def _taken_seats_for(movie_id: str, hall: str, starts_at: str) -> List[str]:
+    screening_id = storage.find_screening(movie_id, hall, starts_at)
+    return sorted(storage.get_taken_seats(screening_id)) if screening_id is not None else []
+
+
+class OfflineJournal:
+    def __init__(self, path: Path = JOURNAL_PATH) -> None:
+        self.path = Path(path)
+        self.online = True
+        self._schema_ready = False
+        # последните прочетени стойности; в journal.db отиват на порции
+        # (READ_CACHE_FLUSH_S) и при минаване офлайн, не при всяко четене
+        self._read_cache: Dict[Tuple[str, str], str] = {}
+        self._unsaved: Set[Tuple[str, str]] = set()
+        self._flushed_at = time.monotonic()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        if not self._schema_ready:
+            conn.executescript(_SCHEMA)
+            # журнали отпреди request_key
+            if "request_key" not in {row[1] for row in conn.execute("PRAGMA table_info(journal)")}:
+                conn.execute("ALTER TABLE journal ADD COLUMN request_key TEXT")
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_journal_request_key ON journal (request_key) "
+                "WHERE request_key IS NOT NULL"
+            )
+            # журнали отпреди статус 'failed': CHECK не се сменя с ALTER
+            sync_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'journal_sync'").fetchone()[0]
+            if "'failed'" not in sync_sql:
+                conn.executescript(
+                    "BEGIN;"
+                    "ALTER TABLE journal_sync RENAME TO journal_sync_old;"
+                    + sync_sql.replace("('synced', 'conflict')", "('synced', 'conflict', 'failed')") + ";"
+                    "INSERT INTO journal_sync SELECT * FROM journal_sync_old;"
+                    "DROP TABLE journal_sync_old;"
+                    "COMMIT;"
+                )
+            self._schema_ready = True
+        return conn
+
+    # ---------- online / offline ----------
+
+    def go_offline(self) -> None:
+        if self.online:
+            self.flush_read_cache()
+        self.online = False
+
+    def probe(self) -> bool:
+        """Проверява дали базата (или booking_server) е достъпна; обновява `online`."""
+        client = storage.server_client()
+        try:
+            if client is not None:
+                client.ping()
+            else:
+                # mode=rw: липсващ файл е грешка, а не нова празна база
+                conn = sqlite3.connect(f"file:{storage.DB_PATH}?mode=rw", uri=True, timeout=PROBE_TIMEOUT_S)
+                try:
+                    conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()
+                finally:
+                    conn.close()
+        except (sqlite3.OperationalError, OSError) as e:
+            # заключена база е достъпна база
+            self.online = not is_offline_error(e)
+        else:
+            self.online = True
+        return self.online
+
+    # ---------- reads ----------
+
+    def cached(self, name: str, fn: Callable, *args):
+        """
+        fn(*args) от базата, а офлайн - последният резултат за същите
+        аргументи (None, ако никога не е четен). Резултатът трябва да е JSON.
+        """
+        if self.online:
+            try:
+                value = call_db(fn, *args)
+            except DatabaseOffline:
+                self.go_offline()
+            except DatabaseBusy:
+                pass  # последната стойност, без да минаваме офлайн
+            else:
+                self._remember(name, args, value)
+                return value
+        return self._recall(name, args)
+
+    def _remember(self, name: str, args: tuple, value) -> None:
+        key = (name, json.dumps(args))
+        encoded = json.dumps(value)
+        if self._read_cache.get(key) == encoded:
+            return
+        self._read_cache[key] = encoded
+        self._unsaved.add(key)
+        if time.monotonic() - self._flushed_at >= READ_CACHE_FLUSH_S:
+            self.flush_read_cache()
+
+    def flush_read_cache(self) -> None:
+        """Записва незаписаните прочетени стойности в journal.db."""
+        self._flushed_at = time.monotonic()
+        if not self._unsaved:
+            return
+        rows = [(*key, self._read_cache[key]) for key in self._unsaved]
+        self._unsaved.clear()
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO read_cache VALUES (?, ?, ?)", rows)
+        conn.close()
+
+    def _recall(self, name: str, args: tuple):
+        key = (name, json.dumps(args))
+        encoded = self._read_cache.get(key)
+        if encoded is None:
+            conn = self._connect()
+            row = conn.execute("SELECT value FROM read_cache WHERE name = ? AND args = ?", key).fetchone()
+            conn.close()
+            encoded = self._read_cache[key] = row[0] if row else "null"
+        return json.loads(encoded)
+
+    def taken_seats(self, movie_id: str, hall: str, starts_at: str) -> Set[str]:
+        """Заетите места: от базата (или последно видените) + чакащите офлайн продажби."""
+        seats = set(self.cached("taken_seats", _taken_seats_for, movie_id, hall, starts_at) or ())
+        conn = self._connect()
+        rows = conn.execute(
+            """
+            SELECT j.seats FROM journal j
+            LEFT JOIN journal_sync s ON s.seq = j.seq
+            WHERE j.movie_id = ? AND j.hall = ? AND j.starts_at = ? AND s.seq IS NULL
+            """,
+            (movie_id, hall, starts_at),
+        ).fetchall()
+        conn.close()
+        for (seats_str,) in rows:
+            seats.update(s for s in seats_str.split(",") if s)
+        return seats
+
+    # ---------- writes ----------
+
+    def book(
+        self,
+        movie_id: str,
+        movie_title: str,
+        hall: str,
+        starts_at: str,
+        show_time: str,
+        client_name: str,
+        seats: Iterable[str],
+        booking_code: str,
+        ticket_type: str,
+        price_per_seat: float,
+        total_price: float,
+        request_key: Optional[str] = None,
+    ) -> str:
+        """
+        Записва продажбата в базата или, ако тя е недостъпна, в журнала.
+        Връща "ok", "duplicate" (request_key вече е записан), "seats_taken"
+        (нищо не е записано) или "offline" (в журнала). Заета база ->
+        DatabaseBusy (нищо не е записано, опитай пак).
+        """
+        seats = [s.strip() for s in seats]
+        if self.online:
+            try:
+                ok, reason = call_db(
+                    storage.book,
+                    movie_id=movie_id,
+                    movie_title=movie_title,
+                    hall=hall,
+                    starts_at=starts_at,
+                    show_time=show_time,
+                    client_name=client_name,
+                    seats=seats,
+                    booking_code=booking_code,
+                    ticket_type=ticket_type,
+                    price_per_seat=price_per_seat,
+                    total_price=total_price,
+                    request_key=request_key,
+                )
+            except DatabaseOffline:
+                self.go_offline()
+            else:
+                if ok:
+                    # Офлайн тези места трябва да останат заети
+                    show = (movie_id, hall, starts_at)
+                    self._remember("taken_seats", show, sorted(set(self._recall("taken_seats", show) or ()) | set(seats)))
+                return reason
+
+        # Като CURRENT_TIMESTAMP в bookings (UTC)
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        conn = self._connect()
+        with conn:
+            # повторение на вече записана офлайн продажба не се добавя втори път
+            conn.execute(
+                f"INSERT OR IGNORE INTO journal ({_JOURNAL_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (booking_code, movie_id, movie_title, hall, starts_at, show_time, client_name,
+                 ",".join(seats), ticket_type, price_per_seat, total_price, created_at, request_key),
+            )
+        conn.close()
+        return "offline"
+
+    # ---------- sync ----------
+
+    def pending_count(self) -> int:
+        conn = self._connect()
+        count = conn.execute(
+            "SELECT COUNT(*) FROM journal j LEFT JOIN journal_sync s ON s.seq = j.seq WHERE s.seq IS NULL"
+        ).fetchone()[0]
+        conn.close()
+        return count
+
+    def conflicts(self, status: str = "conflict") -> List[Tuple[str, str, str]]:
+        """
+        Офлайн продажбите, които не можаха да се запишат: "conflict" (местата
+        са продадени другаде) или "failed" (невалиден ред; detail = грешката).
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            """
+            SELECT j.booking_code, j.client_name, s.detail
+            FROM journal j JOIN journal_sync s ON s.seq = j.seq
+            WHERE s.status = ?
+            ORDER BY j.seq
+            """,
+            (status,),
+        ).fetchall()
+        conn.close()
+        return rows
+
+    @staticmethod
+    def _replay_rows(rows: List[tuple]) -> List[Tuple[str, str, str]]:
+        """
+        По един ред: грешката на един ред го маркира "failed", а следващите
+        продължават. Офлайн/заета база и OperationalError спират всичко.
+        """
+        results = []
+        for row in rows:
+            try:
+                results.extend(call_db(storage.replay_bookings, [row[1:]]))
+            except (DatabaseOffline, DatabaseBusy, sqlite3.OperationalError):
+                raise
+            except Exception as e:
+                results.append((row[1], "failed", f"{type(e).__name__}: {e}"))
+        return results
+
+    def sync(self, max_batches: Optional[int] = None, batch: int = SYNC_BATCH) -> SyncReport:
+        """
+        Записва чакащите продажби в базата, порция по порция.
+        max_batches ограничава работата за едно извикване (за UI таймера).
+        """
+        report = SyncReport()
+        if not self.online and not self.probe():
+            report.remaining = self.pending_count()
+            return report
+
+        done = 0
+        while max_batches is None or done < max_batches:
+            conn = self._connect()
+            rows = conn.execute(
+                f"""
+                SELECT j.seq, {", ".join("j." + c.strip() for c in _JOURNAL_COLUMNS.split(","))}
+                FROM journal j LEFT JOIN journal_sync s ON s.seq = j.seq
+                WHERE s.seq IS NULL
+                ORDER BY j.seq
+                LIMIT ?
+                """,
+                (batch,),
+            ).fetchall()
+            conn.close()
+            if not rows:
+                break
+
+            try:
+                try:
+                    results = call_db(storage.replay_bookings, [row[1:] for row in rows])
+                except (DatabaseOffline, DatabaseBusy, sqlite3.OperationalError):
+                    raise
+                except Exception:
+                    # Грешка извън обработката по редове в replay_bookings
+                    # (напр. от booking_server) - порцията се повтаря ред по ред
+                    results = self._replay_rows(rows)
+            except DatabaseOffline:
+                self.go_offline()
+                break
+            except DatabaseBusy:
+                break  # следващият тик на таймера
+            except sqlite3.OperationalError as e:
+                report.error = str(e)  # напр. стара схема; продажбите остават в журнала
+                break
+
+            # Базата е комитната; ако тук спрем, следващият sync
+            # разпознава записаните по booking_code.
+            by_code = {row[1]: row for row in rows}
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO journal_sync (seq, status, detail) VALUES (?, ?, ?)",
+                    [(by_code[code][0], status, detail) for code, status, detail in results],
+                )
+            conn.close()
+
+            for code, status, detail in results:
+                if status == "conflict":
+                    report.conflicts.append((code, by_code[code][7], detail))
+                elif status == "failed":
+                    report.failed.append((code, by_code[code][7], detail))
+                else:
+                    report.synced += 1
+            done += 1
+
+        report.remaining = self.pending_count()
+        return report
+
+
+JOURNAL = OfflineJournal()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "sync":
+        result = JOURNAL.sync()
+        print(
+            f"Synced {result.synced}, conflicts {len(result.conflicts)}, "
+            f"failed {len(result.failed)}, remaining {result.remaining}"
+        )
+        for code, client, seats in result.conflicts:
+            print(f"  conflict: {code} {client} seats {seats}")
+        for code, client, error in result.failed:
+            print(f"  failed: {code} {client} {error}")
+        if result.error:
+            print(f"Stopped: {result.error}")
+        sys.exit(0 if JOURNAL.online and not result.error else 1)
+
+    print(f"Database {'reachable' if JOURNAL.probe() else 'UNREACHABLE'}")
+    print(f"Pending offline sales: {JOURNAL.pending_count()}")
+    for code, client, seats in JOURNAL.conflicts():
+        print(f"  conflict: {code} {client} seats {seats}")
+    for code, client, error in JOURNAL.conflicts("failed"):
+        print(f"  failed: {code} {client} {error}")
@@ -0,0 +1,212 @@
+# pricing.py
+
+"""
+Цени на билетите по правила от таблицата price_rules.
+
+Правилата се зареждат веднъж и се компилират в речник
+тип билет -> зала -> [правила] (празно поле = за всички), така че за
+дадена прожекция се проверяват само четирите списъка, които могат да
+съвпаднат. За (тип билет, филм, зала, начало) се смята таблица
+клас на мястото -> цена и се кешира; цената на всяко място после е
+едно търсене в речник. Офертата за целия избор е едно извикване на
+`quote`, достатъчно бързо за всяко кликване по картата на местата.
+
+Цена на място: базовото правило с най-висок priority (при равенство -
+най-конкретното), после всички percent/fixed правила по priority.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from data import SEAT_CLASSES
+from diagnostics import COUNTERS
+from storage import get_connection
+
+MAX_CACHED_TABLES = 256
+DEFAULT_SEAT_CLASS = "standard"
+
+_RULE_COLUMNS = (
+    "id, name, kind, amount, ticket_type, movie_id, hall, seat_class, "
+    "weekdays, time_from, time_to, valid_from, valid_to, priority"
+)
+
+
+@dataclass(frozen=True)
+class PriceRule:
+    id: int
+    name: str
+    kind: str  # base / percent / fixed
+    amount: float
+    ticket_type: Optional[str] = None
+    movie_id: Optional[str] = None
+    hall: Optional[str] = None
+    seat_class: Optional[str] = None
+    weekdays: Optional[FrozenSet[int]] = None
+    time_from: Optional[str] = None
+    time_to: Optional[str] = None
+    valid_from: Optional[str] = None
+    valid_to: Optional[str] = None
+    priority: int = 0
+
+    @property
+    def specificity(self) -> int:
+        fields = (self.ticket_type, self.movie_id, self.hall, self.seat_class,
+                  self.weekdays, self.time_from or self.time_to, self.valid_from or self.valid_to)
+        return sum(1 for f in fields if f is not None)
+
+    def matches(self, movie_id: str, day: str, weekday: int, show_time: str) -> bool:
+        """Всичко освен тип билет, зала (по индекса) и клас (по таблицата)."""
+        if self.movie_id is not None and self.movie_id != movie_id:
+            return False
+        if self.weekdays is not None and weekday not in self.weekdays:
+            return False
+        if (self.time_from or self.time_to) and not show_time:
+            return False
+        if self.time_from is not None and show_time < self.time_from:
+            return False
+        if self.time_to is not None and show_time >= self.time_to:
+            return False
+        if self.valid_from is not None and day < self.valid_from:
+            return False
+        if self.valid_to is not None and day > self.valid_to:
+            return False
+        return True
+
+
+@dataclass(frozen=True)
+class Quote:
+    seat_prices: Tuple[Tuple[str, float], ...]  # (seat_id, цена)
+    total: float
+
+    @property
+    def unit_prices(self) -> Tuple[float, float]:
+        """(най-ниска, най-висока) цена на място."""
+        prices = [p for _, p in self.seat_prices]
+        return (min(prices), max(prices)) if prices else (0.0, 0.0)
+
+    @property
+    def average_price(self) -> float:
+        return round(self.total / len(self.seat_prices), 2) if self.seat_prices else 0.0
+
+
+def seat_class(seat_id: str) -> str:
+    return SEAT_CLASSES.get(seat_id.rstrip("0123456789"), DEFAULT_SEAT_CLASS)
+
+
+class PriceEngine:
+    def __init__(self, rules: Iterable[PriceRule]) -> None:
+        self.rules = list(rules)
+        self.ticket_types: List[str] = []
+        self.seat_classes = sorted(set(SEAT_CLASSES.values()) | {DEFAULT_SEAT_CLASS})
+        # ticket_type -> hall -> правила (None = за всички)
+        self._index: Dict[Optional[str], Dict[Optional[str], List[PriceRule]]] = {}
+        self._tables: "OrderedDict[tuple, Dict[str, float]]" = OrderedDict()
+
+        for rule in sorted(self.rules, key=lambda r: (r.priority, r.id)):
+            self._index.setdefault(rule.ticket_type, {}).setdefault(rule.hall, []).append(rule)
+            if rule.kind == "base" and rule.ticket_type and rule.ticket_type not in self.ticket_types:
+                self.ticket_types.append(rule.ticket_type)
+
+    @classmethod
+    def load(cls) -> "PriceEngine":
+        conn = get_connection()
+        cur = conn.cursor()
+        cur.execute(f"SELECT {_RULE_COLUMNS} FROM price_rules WHERE active = 1 ORDER BY id")
+        rows = cur.fetchall()
+        conn.close()
+        rules = []
+        for row in rows:
+            weekdays = row[8]
+            rules.append(
+                PriceRule(
+                    *row[:8],
+                    frozenset(int(d) for d in weekdays.split(",")) if weekdays else None,
+                    *row[9:],
+                )
+            )
+        return cls(rules)
+
+    # ---------- lookup ----------
+
+    def _candidates(self, ticket_type: str, hall: str) -> List[PriceRule]:
+        out: List[PriceRule] = []
+        for tt in (ticket_type, None):
+            by_hall = self._index.get(tt)
+            if by_hall:
+                out.extend(by_hall.get(hall, ()))
+                if hall is not None:
+                    out.extend(by_hall.get(None, ()))
+        return out
+
+    def price_table(self, ticket_type: str, movie_id: str, hall: str, starts_at: str) -> Dict[str, float]:
+        """{клас на мястото: цена} за прожекцията; 0.0, ако типът не се продава."""
+        key = (ticket_type, movie_id, hall, starts_at)
+        table = self._tables.get(key)
+        if table is not None:
+            COUNTERS.record_cache("price tables", True)
+            self._tables.move_to_end(key)
+            return table
+        COUNTERS.record_cache("price tables", False)
+
+        day, _, show_time = starts_at.partition(" ")
+        weekday = date.fromisoformat(day).weekday() if day else -1
+        rules = [
+            r for r in self._candidates(ticket_type, hall)
+            if r.matches(movie_id, day, weekday, show_time)
+        ]
+
+        table = {}
+        for cls_name in self.seat_classes:
+            applicable = [r for r in rules if r.seat_class in (None, cls_name)]
+            bases = [r for r in applicable if r.kind == "base"]
+            if not bases:
+                table[cls_name] = 0.0
+                continue
+            price = max(bases, key=lambda r: (r.priority, r.specificity, r.id)).amount
+            for r in sorted((r for r in applicable if r.kind != "base"), key=lambda r: (r.priority, r.id)):
+                price = price * (1 + r.amount / 100) if r.kind == "percent" else price + r.amount
+            table[cls_name] = round(max(price, 0.0), 2)
+
+        self._tables[key] = table
+        if len(self._tables) > MAX_CACHED_TABLES:
+            self._tables.popitem(last=False)
+        return table
+
+    def quote(
+        self,
+        seats: Iterable[str],
+        ticket_type: str,
+        movie_id: str = "",
+        hall: Optional[str] = None,
+        starts_at: str = "",
+    ) -> Quote:
+        """Цени за всички избрани места наведнъж."""
+        table = self.price_table(ticket_type, movie_id, hall, starts_at)
+        seat_prices = tuple((s, table.get(seat_class(s), 0.0)) for s in seats)
+        return Quote(seat_prices, round(sum(p for _, p in seat_prices), 2))
+
+    def base_price(
+        self, ticket_type: str, movie_id: str = "", hall: Optional[str] = None, starts_at: str = ""
+    ) -> float:
+        """Цената на обикновено място (за етикета преди избор на места)."""
+        return self.price_table(ticket_type, movie_id, hall, starts_at).get(DEFAULT_SEAT_CLASS, 0.0)
+
+
+_engine: Optional[PriceEngine] = None
+
+
+def get_engine() -> PriceEngine:
+    """Компилираните правила; зареждат се при първа нужда."""
+    global _engine
+    if _engine is None:
+        _engine = PriceEngine.load()
+    return _engine
+
+
+def reload_rules() -> PriceEngine:
+    """Прочита наново price_rules (след промяна на правилата)."""
+    global _engine
+    _engine = PriceEngine.load()
+    return _engine
@@ -0,0 +1,190 @@
+# profiling.py
+
+"""
+Режим за профилиране на терминал "на място".
+
+Включва се с `python main.py --profile[=DIR]` или с env променлива
+CINEMA_PROFILE=1 / CINEMA_PROFILE=DIR. Докато приложението работи:
+- cProfile покрива целия Qt event loop и се записва на всеки интервал
+  в отделен .prof файл;
+- tracemalloc прави snapshot на всеки интервал и записва top-N алокации;
+- пазят се само последните MAX_CAPTURES файла от всеки вид.
+
+Отчет: `python profiling.py report [DIR]`.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_CAPTURE_DIR = Path(__file__).resolve().parent / "profiles"
+ENV_VAR = "CINEMA_PROFILE"
+FLAG = "--profile"
+
+CAPTURE_INTERVAL_S = 60
+TOP_ALLOCATIONS = 25
+MAX_CAPTURES = 20
+
+# Файловете, които отчетът обобщава.
+REPORT_MODULES = ("ui_main_window.py", "storage.py")
+
+
+def capture_dir_from_args(argv: Sequence[str]) -> Optional[Path]:
+    """Връща папката за профили, ако режимът е включен (флаг или env)."""
+    for arg in argv[1:]:
+        if arg == FLAG:
+            return DEFAULT_CAPTURE_DIR
+        if arg.startswith(FLAG + "="):
+            return Path(arg.split("=", 1)[1])
+
+    value = os.environ.get(ENV_VAR, "").strip()
+    if not value or value == "0":
+        return None
+    if value.lower() in ("1", "true", "yes"):
+        return DEFAULT_CAPTURE_DIR
+    return Path(value)
+
+
+class ProfileCapture:
+    """cProfile + tracemalloc, записвани периодично с ротация на файловете."""
+
+    def __init__(
+        self,
+        out_dir: Path,
+        interval_s: int = CAPTURE_INTERVAL_S,
+        top_n: int = TOP_ALLOCATIONS,
+        keep: int = MAX_CAPTURES,
+    ) -> None:
+        self.out_dir = Path(out_dir)
+        self.interval_s = interval_s
+        self.top_n = top_n
+        self.keep = keep
+        self.profiler = cProfile.Profile()
+        self._timer = None
+        self._seq = 0
+
+    def start(self) -> None:
+        from PyQt5.QtCore import QTimer
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        tracemalloc.start()
+        self.profiler.enable()
+
+        self._timer = QTimer()
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(self.interval_s * 1000)
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+        self.flush()
+        self.profiler.disable()
+        tracemalloc.stop()
+
+    def flush(self) -> None:
+        """Записва текущия интервал и започва нов."""
+        self._seq += 1
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._seq:04d}"
+
+        self.profiler.disable()
+        self.profiler.dump_stats(str(self.out_dir / f"cpu-{stamp}.prof"))
+        self.profiler = cProfile.Profile()
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            self._write_allocations(snapshot, self.out_dir / f"mem-{stamp}.txt")
+
+        self._rotate("cpu-*.prof")
+        self._rotate("mem-*.txt")
+        self.profiler.enable()
+
+    def _write_allocations(self, snapshot: tracemalloc.Snapshot, path: Path) -> None:
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            )
+        )
+        stats = snapshot.statistics("lineno")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"traced: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB\n")
+            for stat in stats[: self.top_n]:
+                frame = stat.traceback[0]
+                f.write(
+                    f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  "
+                    f"{frame.filename}:{frame.lineno}\n"
+                )
+
+    def _rotate(self, pattern: str) -> None:
+        files = sorted(self.out_dir.glob(pattern))
+        for old in files[: -self.keep]:
+            old.unlink(missing_ok=True)
+
+
+def start_capture(out_dir: Path) -> ProfileCapture:
+    capture = ProfileCapture(out_dir)
+    capture.start()
+    print(f"Profiling enabled, writing captures to {capture.out_dir}")
+    return capture
+
+
+# ----------------- REPORT -----------------
+
+
+def summarize(
+    capture_dir: Path,
+    modules: Sequence[str] = REPORT_MODULES,
+    limit: int = 15,
+) -> List[Tuple[str, int, float, float]]:
+    """
+    Обобщава всички cpu-*.prof в папката.
+    Връща (функция, извиквания, собствено време, кумулативно време)
+    за функциите от `modules`, подредени по кумулативно време.
+    """
+    files = sorted(Path(capture_dir).glob("cpu-*.prof"))
+    if not files:
+        return []
+
+    stats = pstats.Stats(str(files[0]))
+    for extra in files[1:]:
+        stats.add(str(extra))
+
+    rows: Dict[str, Tuple[int, float, float]] = {}
+    for (filename, lineno, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        base = os.path.basename(filename)
+        if base not in modules:
+            continue
+        rows[f"{base}:{lineno}({func})"] = (ncalls, tottime, cumtime)
+
+    ordered = sorted(rows.items(), key=lambda item: item[1][2], reverse=True)
+    return [(name, n, tot, cum) for name, (n, tot, cum) in ordered[:limit]]
+
+
+def _print_report(capture_dir: Path) -> None:
+    rows = summarize(capture_dir)
+    if not rows:
+        print(f"No captures found in {capture_dir}")
+        return
+
+    print(f"{'calls':>8} {'tottime':>10} {'cumtime':>10}  function")
+    for name, ncalls, tottime, cumtime in rows:
+        print(f"{ncalls:8d} {tottime:10.4f} {cumtime:10.4f}  {name}")
+
+    mem_files = sorted(Path(capture_dir).glob("mem-*.txt"))
+    if mem_files:
+        print(f"\nLatest allocation snapshot ({mem_files[-1].name}):")
+        print(mem_files[-1].read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "report":
+        print("Usage: python profiling.py report [DIR]")
+        sys.exit(1)
+    _print_report(Path(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_CAPTURE_DIR)
@@ -0,0 +1,205 @@
+# reporting.py
+
+"""
+Отчети за заетост и приход (табовете в StatsDialog).
+
+Всеки отчет е една SQL агрегация (GROUP BY) върху активните резервации
+в периода: прожекциите се избират по индекса на screenings.starts_at,
+резервациите им - по idx_bookings_screening, така че цената зависи от
+периода, а не от размера на bookings. Готовите отчети се кешират,
+докато bookings не се промени.
+
+Заетост = продадени билети / (прожекции с продажби × места в залата).
+Периодът и денят от седмицата са по датата на прожекцията. Когато
+периодът покрива архивирани месеци, архивите се прикачват (archive.py)
+и влизат в заявката.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from archive import attach_archives
+from data import ROWS, NUM_COLUMNS
+from diagnostics import COUNTERS
+from storage import get_connection
+
+HALL_CAPACITY = len(ROWS) * NUM_COLUMNS
+MAX_CACHED_REPORTS = 64
+
+
+@dataclass
+class ReportFrame:
+    """Готов отчет: ключове на колоните (за i18n) и редове."""
+
+    name: str
+    columns: Sequence[str]
+    rows: List[tuple]
+
+
+_reports: "OrderedDict[tuple, ReportFrame]" = OrderedDict()
+
+
+# ----------------- SOURCE -----------------
+
+
+def _fingerprint(cur, schemas: Sequence[str]) -> tuple:
+    """
+    Евтин отпечатък на bookings: нов ред, отказ или архивиране го променят
+    (архивирането намалява прожекциите в основната база и расте архива).
+    """
+    cur.execute("SELECT MAX(id) FROM bookings")
+    max_id = cur.fetchone()[0] or 0
+    cur.execute("SELECT COALESCE(SUM(cancellations), 0) FROM sales_by_movie")
+    parts = [max_id, cur.fetchone()[0]]
+    for schema in schemas:
+        cur.execute(f"SELECT MAX(rowid) FROM {schema}.bookings")
+        parts.append((schema, cur.fetchone()[0]))
+    cur.execute("SELECT COUNT(*) FROM screenings")
+    parts.append(cur.fetchone()[0])
+    return tuple(parts)
+
+
+# Един ред на активна резервация; прожекцията се идентифицира по
+# (зала, начало), защото id-тата в архивите и в основната база могат да се повтарят.
+_SOURCE = """
+    SELECT b.movie_title AS title, b.hall AS hall, b.show_time AS show_time,
+           sc.hall || '|' || sc.starts_at AS screening, sc.starts_at AS starts_at,
+           CASE WHEN trim(b.seats) = '' THEN 0
+                ELSE length(b.seats) - length(replace(b.seats, ',', '')) + 1 END AS tickets,
+           COALESCE(b.total_price, 0.0) AS revenue,
+           COALESCE(b.ticket_type, 'Standard') AS ticket_type
+    FROM {schema}.screenings sc
+    JOIN {schema}.bookings b ON b.screening_id = sc.id
+    WHERE sc.starts_at >= ? AND sc.starts_at < ? AND b.is_canceled = 0
+"""
+
+
+def _period_bounds(date_from: Optional[date], date_to: Optional[date]) -> Tuple[str, str]:
+    """[от, до) като низове за сравнение със starts_at ("YYYY-MM-DD HH:MM")."""
+    lo = date_from.isoformat() if date_from else ""
+    hi = (date_to + timedelta(days=1)).isoformat() if date_to else "9999"
+    return lo, hi
+
+
+def _aggregate(cur, schemas: Sequence[str], keys: Sequence[str], bounds: Tuple[str, str]) -> Dict:
+    """
+    {ключ: (билети, приход, брой прожекции)} за периода. keys са SQL
+    изрази над колоните на _SOURCE; ключът е кортеж при повече от един.
+    """
+    source = " UNION ALL ".join(_SOURCE.format(schema=s) for s in ("main",) + tuple(schemas))
+    key_cols = ", ".join(f"{expr} AS k{i}" for i, expr in enumerate(keys))
+    group_by = ", ".join(f"k{i}" for i in range(len(keys)))
+    cur.execute(
+        f"""
+        SELECT {key_cols}, SUM(tickets), SUM(revenue), COUNT(DISTINCT screening)
+        FROM ({source})
+        GROUP BY {group_by}
+        """,
+        bounds * (1 + len(schemas)),
+    )
+    width = len(keys)
+    acc = {}
+    for row in cur.fetchall():
+        key = row[:width] if width > 1 else row[0]
+        acc[key] = (row[width], row[width + 1], row[width + 2])
+    return acc
+
+
+def _occupancy_rows(acc: Dict, label: Callable) -> List[tuple]:
+    out = []
+    for key in sorted(acc):
+        tickets, revenue, screenings = acc[key]
+        capacity = screenings * HALL_CAPACITY
+        occupancy = 100.0 * tickets / capacity if capacity else 0.0
+        out.append(label(key) + (screenings, tickets, round(occupancy, 1), round(revenue, 2)))
+    return out
+
+
+# ----------------- REPORTS -----------------
+
+_OCCUPANCY_COLUMNS = ("col_screenings", "col_tickets", "col_occupancy", "col_revenue")
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+_HOUR_SQL = (
+    "CASE WHEN instr(show_time, ':') > 0 "
+    "THEN CAST(substr(show_time, 1, instr(show_time, ':') - 1) AS INTEGER) ELSE 0 END"
+)
+# strftime('%w'): 0 = неделя -> 0 = понеделник
+_WEEKDAY_SQL = "(CAST(strftime('%w', substr(starts_at, 1, 10)) AS INTEGER) + 6) % 7"
+
+
+def _by_show(cur, schemas: Sequence[str], bounds: Tuple[str, str]) -> ReportFrame:
+    acc = _aggregate(cur, schemas, ("title", "hall", "show_time"), bounds)
+    return ReportFrame(
+        "by_show",
+        ("col_movie", "col_hall", "col_time") + _OCCUPANCY_COLUMNS,
+        _occupancy_rows(acc, tuple),
+    )
+
+
+def _by_hall(cur, schemas: Sequence[str], bounds: Tuple[str, str]) -> ReportFrame:
+    acc = _aggregate(cur, schemas, ("hall",), bounds)
+    return ReportFrame("by_hall", ("col_hall",) + _OCCUPANCY_COLUMNS, _occupancy_rows(acc, lambda h: (h,)))
+
+
+def _by_hour(cur, schemas: Sequence[str], bounds: Tuple[str, str]) -> ReportFrame:
+    acc = _aggregate(cur, schemas, (_HOUR_SQL,), bounds)
+    return ReportFrame(
+        "by_hour", ("col_hour",) + _OCCUPANCY_COLUMNS, _occupancy_rows(acc, lambda h: (f"{h:02d}:00",))
+    )
+
+
+def _by_weekday(cur, schemas: Sequence[str], bounds: Tuple[str, str]) -> ReportFrame:
+    acc = _aggregate(cur, schemas, (_WEEKDAY_SQL,), bounds)
+    return ReportFrame(
+        "by_weekday", ("col_weekday",) + _OCCUPANCY_COLUMNS, _occupancy_rows(acc, lambda w: (WEEKDAYS[w],))
+    )
+
+
+def _by_ticket_type(cur, schemas: Sequence[str], bounds: Tuple[str, str]) -> ReportFrame:
+    acc = _aggregate(cur, schemas, ("ticket_type",), bounds)
+    out = [
+        (t, acc[t][0], round(acc[t][1], 2))
+        for t in sorted(acc, key=lambda t: acc[t][1], reverse=True)
+    ]
+    return ReportFrame("by_ticket_type", ("col_ticket_type", "col_tickets", "col_revenue"), out)
+
+
+REPORTS = {
+    "by_show": _by_show,
+    "by_hall": _by_hall,
+    "by_hour": _by_hour,
+    "by_weekday": _by_weekday,
+    "by_ticket_type": _by_ticket_type,
+}
+
+
+def get_report(
+    name: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> ReportFrame:
+    """Връща отчет `name` (ключ от REPORTS) за периода [date_from, date_to]."""
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        with attach_archives(conn, date_from, date_to) as schemas:
+            key = (_fingerprint(cur, schemas), name, date_from, date_to)
+            frame = _reports.get(key)
+            if frame is not None:
+                COUNTERS.record_cache("reports", True)
+                _reports.move_to_end(key)
+                return frame
+
+            COUNTERS.record_cache("reports", False)
+            frame = REPORTS[name](cur, schemas, _period_bounds(date_from, date_to))
+            cur.close()
+    finally:
+        conn.close()
+
+    _reports[key] = frame
+    if len(_reports) > MAX_CACHED_REPORTS:
+        _reports.popitem(last=False)
+    return frame
@@ -0,0 +1,129 @@
+# sales.py
+
+"""
+Материализирани агрегати за продажбите.
+
+sales_daily    - по филм / зала / час / ден: билети, приход, резервации, откази
+sales_by_movie - същото, сумирано по филм (за StatsDialog)
+
+Билетите, приходът и броят резервации са нетни (без отказаните).
+Обновяват се в същата транзакция като записа/отказа на резервация,
+така че StatsDialog чете малка таблица вместо GROUP BY върху bookings.
+"""
+
+import sqlite3
+from typing import Iterable, Optional
+
+CREATE_SALES_DAILY = """
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        movie_id TEXT NOT NULL,
+        hall TEXT NOT NULL,
+        show_time TEXT NOT NULL,
+        day TEXT NOT NULL,
+        tickets INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        cancellations INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (movie_id, hall, show_time, day)
+    )
+"""
+
+CREATE_SALES_BY_MOVIE = """
+    CREATE TABLE IF NOT EXISTS sales_by_movie (
+        movie_id TEXT PRIMARY KEY,
+        movie_title TEXT NOT NULL,
+        tickets INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        cancellations INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+_UPSERT_DAILY = """
+    INSERT INTO sales_daily (movie_id, hall, show_time, day, tickets, revenue, bookings, cancellations)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (movie_id, hall, show_time, day) DO UPDATE SET
+        tickets = tickets + excluded.tickets,
+        revenue = revenue + excluded.revenue,
+        bookings = bookings + excluded.bookings,
+        cancellations = cancellations + excluded.cancellations
+"""
+
+_UPSERT_MOVIE = """
+    INSERT INTO sales_by_movie (movie_id, movie_title, tickets, revenue, bookings, cancellations)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (movie_id) DO UPDATE SET
+        movie_title = excluded.movie_title,
+        tickets = tickets + excluded.tickets,
+        revenue = revenue + excluded.revenue,
+        bookings = bookings + excluded.bookings,
+        cancellations = cancellations + excluded.cancellations
+"""
+
+
+def count_seats(seats_str: str) -> int:
+    return sum(1 for s in seats_str.split(",") if s.strip())
+
+
+def apply_delta(
+    cur: sqlite3.Cursor,
+    movie_id: str,
+    movie_title: str,
+    hall: str,
+    show_time: str,
+    day: str,
+    tickets: int,
+    revenue: float,
+    bookings: int,
+    cancellations: int,
+) -> None:
+    """Добавя разлика към двете агрегатни таблици (без commit)."""
+    cur.execute(
+        _UPSERT_DAILY,
+        (movie_id, hall, show_time, day, tickets, revenue, bookings, cancellations),
+    )
+    cur.execute(
+        _UPSERT_MOVIE,
+        (movie_id, movie_title, tickets, revenue, bookings, cancellations),
+    )
+
+
+def record_booking(
+    cur: sqlite3.Cursor,
+    movie_id: str,
+    movie_title: str,
+    hall: str,
+    show_time: str,
+    day: str,
+    seat_count: int,
+    total_price: Optional[float],
+) -> None:
+    apply_delta(cur, movie_id, movie_title, hall, show_time, day, seat_count, total_price or 0.0, 1, 0)
+
+
+def record_cancellation(
+    cur: sqlite3.Cursor,
+    movie_id: str,
+    movie_title: str,
+    hall: str,
+    show_time: str,
+    day: str,
+    seat_count: int,
+    total_price: Optional[float],
+) -> None:
+    apply_delta(cur, movie_id, movie_title, hall, show_time, day, -seat_count, -(total_price or 0.0), -1, 1)
+
+
+def add_booking_rows(cur: sqlite3.Cursor, rows: Iterable[tuple]) -> None:
+    """
+    Backfill от редове
+    (id, movie_id, movie_title, hall, show_time, day, seats, total_price, is_canceled).
+    Отказаните се броят само като cancellations.
+    """
+    for _, movie_id, movie_title, hall, show_time, day, seats_str, total_price, is_canceled in rows:
+        if is_canceled:
+            apply_delta(cur, movie_id, movie_title, hall, show_time, day, 0, 0.0, 0, 1)
+        else:
+            record_booking(
+                cur, movie_id, movie_title, hall, show_time, day, count_seats(seats_str), total_price
+            )
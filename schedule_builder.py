@@ -0,0 +1,252 @@
+# schedule_builder.py
+
+from typing import List
+
+from PyQt5.QtCore import QDate
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QGroupBox,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QComboBox,
+    QCheckBox,
+    QDateEdit,
+    QListWidget,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+)
+
+from scheduling import (
+    RecurrenceRule,
+    PlannedScreening,
+    STATUS_CONFLICT,
+    STATUS_EXISTS,
+    build_plan,
+    has_conflicts,
+    new_rows,
+    parse_times,
+)
+from hall_index import HALL_INDEX
+from storage import get_all_movie_titles, get_movie_id_for_title
+
+WEEKDAY_LABELS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+class ScheduleBuilderDialog(QDialog):
+    """
+    Програма по правила (Admin):
+    - правило = филм + зала + период + дни от седмицата + часове
+    - Preview показва всички прожекции и застъпванията в залите
+    - Commit записва новите прожекции в една транзакция
+    """
+
+    HEADERS = ["Date", "Day", "Hall", "Start", "End", "Movie", "Status"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Admin · Schedule builder")
+        self.resize(820, 600)
+
+        self.rules: List[RecurrenceRule] = []
+        self.plan: List[PlannedScreening] = []
+
+        layout = QVBoxLayout()
+
+        # ---- Rule editor ----
+        rule_group = QGroupBox("Recurrence rule")
+        rg_layout = QVBoxLayout()
+
+        row1 = QHBoxLayout()
+        self.movie_combo = QComboBox()
+        titles = get_all_movie_titles()
+        self.movie_combo.addItems(titles)
+        self._titles = {get_movie_id_for_title(t): t for t in titles}
+        self.hall_edit = QLineEdit()
+        self.hall_edit.setPlaceholderText("Hall (e.g. Hall 1)")
+        self.times_edit = QLineEdit()
+        self.times_edit.setPlaceholderText("Times (e.g. 11:00, 14:30, 20:00)")
+        row1.addWidget(self.movie_combo)
+        row1.addWidget(self.hall_edit)
+        row1.addWidget(self.times_edit)
+        rg_layout.addLayout(row1)
+
+        row2 = QHBoxLayout()
+        today = QDate.currentDate()
+        self.from_edit = QDateEdit(today)
+        self.to_edit = QDateEdit(today.addDays(6))
+        for edit in (self.from_edit, self.to_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+        row2.addWidget(QLabel("From"))
+        row2.addWidget(self.from_edit)
+        row2.addWidget(QLabel("To"))
+        row2.addWidget(self.to_edit)
+
+        self.weekday_checks = []
+        for label in WEEKDAY_LABELS:
+            check = QCheckBox(label)
+            check.setChecked(True)
+            self.weekday_checks.append(check)
+            row2.addWidget(check)
+        rg_layout.addLayout(row2)
+
+        self.add_rule_btn = QPushButton("Add rule")
+        self.add_rule_btn.clicked.connect(self._handle_add_rule)
+        rg_layout.addWidget(self.add_rule_btn)
+        rule_group.setLayout(rg_layout)
+        layout.addWidget(rule_group)
+
+        # ---- Rules ----
+        rules_row = QHBoxLayout()
+        self.rules_list = QListWidget()
+        self.rules_list.setMaximumHeight(90)
+        self.remove_rule_btn = QPushButton("Remove rule")
+        self.remove_rule_btn.clicked.connect(self._handle_remove_rule)
+        rules_row.addWidget(self.rules_list)
+        rules_row.addWidget(self.remove_rule_btn)
+        layout.addLayout(rules_row)
+
+        # ---- Preview ----
+        self.grid = QTableWidget()
+        self.grid.setColumnCount(len(self.HEADERS))
+        self.grid.setHorizontalHeaderLabels(self.HEADERS)
+        self.grid.verticalHeader().setVisible(False)
+        self.grid.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.grid.horizontalHeader().setStretchLastSection(True)
+        self.grid.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.grid)
+
+        buttons = QHBoxLayout()
+        self.preview_btn = QPushButton("Preview")
+        self.preview_btn.clicked.connect(self._handle_preview)
+        self.commit_btn = QPushButton("Commit")
+        self.commit_btn.setEnabled(False)
+        self.commit_btn.clicked.connect(self._handle_commit)
+        buttons.addWidget(self.preview_btn)
+        buttons.addWidget(self.commit_btn)
+        layout.addLayout(buttons)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+    # ---------- rules ----------
+
+    def _handle_add_rule(self) -> None:
+        title = self.movie_combo.currentText().strip()
+        hall = self.hall_edit.text().strip()
+        movie_id = get_movie_id_for_title(title) if title else ""
+        if not movie_id or not hall:
+            self.status_label.setText("Movie and hall are required.")
+            return
+        try:
+            times = parse_times(self.times_edit.text())
+        except ValueError as e:
+            self.status_label.setText(f"Invalid time: {e}")
+            return
+        if not times:
+            self.status_label.setText("Enter at least one time.")
+            return
+
+        weekdays = frozenset(i for i, check in enumerate(self.weekday_checks) if check.isChecked())
+        first_day = self.from_edit.date().toPyDate()
+        last_day = self.to_edit.date().toPyDate()
+        if not weekdays or last_day < first_day:
+            self.status_label.setText("Pick weekdays and a valid date range.")
+            return
+
+        rule = RecurrenceRule(movie_id, hall, first_day, last_day, weekdays, times)
+        self.rules.append(rule)
+        days = ",".join(WEEKDAY_LABELS[d] for d in sorted(weekdays))
+        self.rules_list.addItem(
+            f"{title} · {hall} · {first_day}..{last_day} · {days} · {' '.join(times)}"
+        )
+        self._invalidate_plan()
+
+    def _handle_remove_rule(self) -> None:
+        row = self.rules_list.currentRow()
+        if row < 0:
+            return
+        self.rules_list.takeItem(row)
+        del self.rules[row]
+        self._invalidate_plan()
+
+    def _invalidate_plan(self) -> None:
+        self.plan = []
+        self.grid.setRowCount(0)
+        self.commit_btn.setEnabled(False)
+        self.commit_btn.setText("Commit")
+
+    # ---------- preview ----------
+
+    def _handle_preview(self) -> None:
+        if not self.rules:
+            self.status_label.setText("Add at least one rule.")
+            return
+
+        self.plan = build_plan(self.rules, HALL_INDEX)
+        self._fill_grid()
+
+        to_add = len(new_rows(self.plan))
+        conflicts = sum(1 for p in self.plan if p.status == STATUS_CONFLICT)
+        self.commit_btn.setEnabled(to_add > 0 and not has_conflicts(self.plan))
+        self.commit_btn.setText(f"Commit {to_add} screening(s)")
+        if conflicts:
+            self.status_label.setText(f"{conflicts} screening(s) overlap in their hall — fix the rules first.")
+        else:
+            self.status_label.setText(f"{to_add} new screening(s), {len(self.plan) - to_add} already scheduled.")
+
+    def _fill_grid(self) -> None:
+        conflict_color = QColor("#f8d7da")
+        exists_color = QColor("#e2e3e5")
+
+        self.grid.setUpdatesEnabled(False)
+        self.grid.setRowCount(len(self.plan))
+        for i, p in enumerate(self.plan):
+            day, start = p.starts_at.split(" ")
+            end_min = p.end % 1440
+            status = "New"
+            if p.status == STATUS_EXISTS:
+                status = "Exists"
+            elif p.status == STATUS_CONFLICT:
+                status = f"Overlaps {self._title(p.conflict_with.movie_id)} {p.conflict_with.when}"
+
+            values = (
+                day,
+                WEEKDAY_LABELS[(p.start // 1440 + 6) % 7],
+                p.hall,
+                start,
+                f"{end_min // 60:02d}:{end_min % 60:02d}",
+                self._title(p.movie_id),
+                status,
+            )
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if p.status == STATUS_CONFLICT:
+                    item.setBackground(conflict_color)
+                elif p.status == STATUS_EXISTS:
+                    item.setBackground(exists_color)
+                self.grid.setItem(i, col, item)
+        self.grid.setUpdatesEnabled(True)
+
+    def _title(self, movie_id: str) -> str:
+        return self._titles.get(movie_id, movie_id)
+
+    # ---------- commit ----------
+
+    def _handle_commit(self) -> None:
+        if not self.plan or has_conflicts(self.plan):
+            return
+        inserted, rejected = HALL_INDEX.add_screenings(new_rows(self.plan))
+        text = f"Added {inserted} screening(s)."
+        if rejected:
+            # Някой друг е насрочил нещо в залата след Preview
+            text += f" {len(rejected)} rejected as overlapping — preview again."
+        self.status_label.setText(text)
+        self._invalidate_plan()
@@ -0,0 +1,112 @@
+# scheduling.py
+
+"""
+Генератор на програма по правила за повторение.
+
+Правилото е (филм, зала, период, дни от седмицата, часове). `build_plan`
+разгръща правилата в конкретни прожекции и ги проверява за застъпване
+в залата спрямо вече записаните (индекса в hall_index) и помежду им.
+Готовият план се записва с HALL_INDEX.add_screenings в една транзакция.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from hall_index import Conflict, HallScheduleIndex, IntervalIndex, to_minutes
+
+STATUS_NEW = "new"
+STATUS_EXISTS = "exists"
+STATUS_CONFLICT = "conflict"
+
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    movie_id: str
+    hall: str
+    first_day: date
+    last_day: date
+    weekdays: FrozenSet[int]  # 0 = понеделник
+    times: Tuple[str, ...]    # "HH:MM"
+
+    def occurrences(self) -> Iterator[str]:
+        """starts_at ("YYYY-MM-DD HH:MM") за всяка прожекция по правилото."""
+        day = self.first_day
+        while day <= self.last_day:
+            if day.weekday() in self.weekdays:
+                for show_time in self.times:
+                    yield f"{day.isoformat()} {show_time}"
+            day += timedelta(days=1)
+
+
+@dataclass
+class PlannedScreening:
+    movie_id: str
+    hall: str
+    starts_at: str
+    start: int  # минути от началото на летоброенето
+    end: int
+    status: str = STATUS_NEW
+    conflict_with: Optional[Conflict] = None
+
+
+def parse_time(text: str) -> str:
+    """Час "H:MM" / "HH:MM" -> "HH:MM". ValueError при грешен час ("25:99", "9:0")."""
+    match = _TIME_RE.fullmatch(text.strip())
+    if match is None:
+        raise ValueError(text)
+    h, m = int(match.group(1)), int(match.group(2))
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(text)
+    return f"{h:02d}:{m:02d}"
+
+
+def parse_times(text: str) -> Tuple[str, ...]:
+    """Часове, разделени със запетая/интервал -> ("11:00", "14:30"). ValueError при грешен час."""
+    return tuple(sorted({parse_time(part) for part in text.replace(",", " ").split()}))
+
+
+def build_plan(rules: Sequence[RecurrenceRule], index: HallScheduleIndex) -> List[PlannedScreening]:
+    """
+    Разгръща правилата и маркира всяка прожекция като new / exists /
+    conflict спрямо индекса на залите и вече планираните в същия план.
+    Връща плана, подреден по зала и начало.
+    """
+    planned: Dict[Tuple[str, str, str], PlannedScreening] = {}
+    for rule in rules:
+        for starts_at in rule.occurrences():
+            key = (rule.movie_id, rule.hall, starts_at)
+            if key not in planned:
+                start = to_minutes(starts_at)
+                end = start + index.duration(rule.movie_id)
+                planned[key] = PlannedScreening(rule.movie_id, rule.hall, starts_at, start, end)
+
+    plan = sorted(planned.values(), key=lambda p: (p.hall, p.start))
+    accepted: Dict[str, IntervalIndex] = {}
+    for p in plan:
+        conflict = index.check_screening(p.movie_id, p.hall, p.starts_at)
+        if conflict is not None and conflict.movie_id == p.movie_id and p.starts_at.endswith(conflict.when):
+            # същата прожекция - вече е насрочена (датирана или ежедневна)
+            p.status = STATUS_EXISTS
+            continue
+        if conflict is None:
+            hall = accepted.setdefault(p.hall, IntervalIndex())
+            conflict = hall.find_overlap(p.start, p.end, index.gap)
+            if conflict is None:
+                hall.add(p.start, p.end, Conflict(p.movie_id, p.starts_at))
+                continue
+        p.status = STATUS_CONFLICT
+        p.conflict_with = conflict
+    return plan
+
+
+def new_rows(plan: Iterable[PlannedScreening]) -> List[Tuple[str, str, str]]:
+    """Редовете за запис: само новите, без конфликтни."""
+    return [(p.movie_id, p.hall, p.starts_at) for p in plan if p.status == STATUS_NEW]
+
+
+def has_conflicts(plan: Iterable[PlannedScreening]) -> bool:
+    return any(p.status == STATUS_CONFLICT for p in plan)
@@ -0,0 +1,151 @@
+# seat_allocation.py
+
+"""
+Автоматичен избор на най-добрите свободни места за група от N души.
+
+Всяко място има оценка (по-малка = по-добро): отдалеченост от средата
+на реда + отдалеченост от предпочитания ред (около 2/3 назад от екрана).
+Оценките и префиксните им суми по редове се смятат веднъж за дадена
+геометрия (ROWS x NUM_COLUMNS). При търсене за всеки ред се обхождат
+възможните начала на блок от N свободни места (битови маски по ред) и
+се взима началото, най-близо до средата - при изпъкнала оценка по
+колоната то е и най-евтиното. Така редът струва O(log N) операции.
+
+Ако няма N последователни свободни места, групата се разделя на
+възможно най-големи блокове (`allow_split`).
+"""
+
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from data import ROWS, NUM_COLUMNS
+
+CENTER_WEIGHT = 1.0
+ROW_WEIGHT = 1.5
+PREFERRED_ROW = 0.65  # дял от дълбочината на залата (0 = до екрана)
+
+
+class SeatAllocator:
+    def __init__(self, rows: Sequence[str], num_columns: int) -> None:
+        self.rows = tuple(rows)
+        self.num_columns = num_columns
+        center = (num_columns + 1) / 2
+        half = max(num_columns / 2, 1)
+        ideal_row = PREFERRED_ROW * (len(self.rows) - 1)
+        depth = max(len(self.rows), 1)
+
+        self.center = center
+        self.full = (1 << num_columns) - 1
+        self.row_index = {row: i for i, row in enumerate(self.rows)}
+        # prefix[r][c] = сума от оценките на места 1..c в ред r
+        self.prefix: List[List[float]] = []
+        for r in range(len(self.rows)):
+            row_cost = ROW_WEIGHT * abs(r - ideal_row) / depth
+            acc, sums = 0.0, [0.0]
+            for col in range(1, num_columns + 1):
+                acc += row_cost + CENTER_WEIGHT * abs(col - center) / half
+                sums.append(acc)
+            self.prefix.append(sums)
+
+    # ---------- masks ----------
+
+    def masks_for(self, taken: Iterable[str]) -> List[int]:
+        """Заетите места като битова маска по ред (бит c-1 = колона c)."""
+        masks = [0] * len(self.rows)
+        for seat_id in taken:
+            label = seat_id.rstrip("0123456789")
+            r = self.row_index.get(label)
+            if r is not None:
+                masks[r] |= 1 << (int(seat_id[len(label):]) - 1)
+        return masks
+
+    def _block_starts(self, free: int, n: int) -> int:
+        """Маска на колоните, от които започват n свободни места подред."""
+        starts, width = free, 1
+        # удвояване: след стъпката starts покрива 2*width места
+        while width * 2 <= n:
+            starts &= starts >> width
+            width *= 2
+        if width < n:
+            starts &= starts >> (n - width)
+        return starts
+
+    def _best_block(self, n: int, masks: List[int]) -> Optional[Tuple[float, int, int]]:
+        """(оценка, ред, първа колона) на най-добрия блок от n места или None."""
+        if n > self.num_columns:
+            return None  # не се събира в един ред -> allocate_masks разделя групата
+        # 0-базов бит на идеалното начало (блок, центриран в реда)
+        ideal = min(max(round(self.center - (n - 1) / 2) - 1, 0), self.num_columns - n)
+        low_bits = (1 << (ideal + 1)) - 1
+        best = None
+        for r, taken in enumerate(masks):
+            starts = self._block_starts(self.full & ~taken, n)
+            if not starts:
+                continue
+            # Оценката е изпъкнала по колоната -> най-близкото до идеалното начало
+            candidates = []
+            below = starts & low_bits
+            if below:
+                candidates.append(below.bit_length() - 1)
+            above = starts >> ideal
+            if above:
+                candidates.append(ideal + (above & -above).bit_length() - 1)
+            prefix = self.prefix[r]
+            for bit in candidates:
+                score = prefix[bit + n] - prefix[bit]
+                if best is None or score < best[0]:
+                    best = (score, r, bit + 1)
+        return best
+
+    def _longest_run(self, masks: List[int]) -> int:
+        longest = 0
+        for taken in masks:
+            free = self.full & ~taken
+            while free and self._block_starts(free, longest + 1):
+                longest += 1
+        return longest
+
+    # ---------- API ----------
+
+    def allocate(self, n: int, taken: Iterable[str], allow_split: bool = True) -> Optional[List[str]]:
+        """
+        Най-добрите n свободни места (id-та като "C5"), подредени.
+        None, ако няма достатъчно места (или блок от n без allow_split).
+        """
+        return self.allocate_masks(n, self.masks_for(taken), allow_split)
+
+    def allocate_masks(self, n: int, masks: List[int], allow_split: bool = True) -> Optional[List[str]]:
+        """Като allocate, но заетостта е вече като маски (masks_for)."""
+        if n <= 0:
+            return []
+        free_total = sum(bin(self.full & ~m).count("1") for m in masks)
+        if free_total < n:
+            return None
+
+        masks = list(masks)
+        chosen: List[Tuple[int, int]] = []
+        remaining = n
+        while remaining:
+            size = remaining
+            block = self._best_block(size, masks)
+            if block is None:
+                if not allow_split:
+                    return None
+                # Най-голямата възможна част от групата
+                size = min(remaining, self._longest_run(masks))
+                block = self._best_block(size, masks)
+            _, r, start = block
+            masks[r] |= ((1 << size) - 1) << (start - 1)
+            chosen.extend((r, col) for col in range(start, start + size))
+            remaining -= size
+        return [f"{self.rows[r]}{col}" for r, col in sorted(chosen)]
+
+
+@lru_cache(maxsize=8)
+def allocator_for(rows: Tuple[str, ...] = tuple(ROWS), num_columns: int = NUM_COLUMNS) -> SeatAllocator:
+    return SeatAllocator(rows, num_columns)
+
+
+def best_seats(n: int, taken: Iterable[str], allow_split: bool = True) -> Optional[List[str]]:
+    """Най-добрите n места в текущата зала (ROWS x NUM_COLUMNS)."""
+    return allocator_for().allocate(n, taken, allow_split)
@@ -0,0 +1,240 @@
+# seat_events.py
+
+"""
+Журнал на местата: кой е държал кое място и кога.
+
+seat_events се пише само с добавяне, в същата транзакция като промяната
+в taken_seats (book / отказ / отказ на цяла прожекция). Редовете са
+само цели числа:
+    (id, screening_id, seat, kind, at, booking_id)
+- seat  = (ред - 'A') * 256 + колона ("C7" -> 519);
+- kind  = BOOK / CANCEL / HOLD / RELEASE;
+- at    = секунди от epoch (UTC), моментът на записа в базата.
+
+seat_snapshots пази картата на прожекцията на всеки SNAPSHOT_EVERY
+събития (и базова снимка при миграцията). `seat_map_at` тръгва от
+последната снимка преди момента и превърта само събитията след нея.
+
+Ръчно: `python seat_events.py <screening_id> ["YYYY-MM-DD HH:MM:SS"]`.
+"""
+
+import sqlite3
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BOOK = 1
+CANCEL = 2
+HOLD = 3
+RELEASE = 4
+
+KIND_NAMES = {BOOK: "book", CANCEL: "cancel", HOLD: "hold", RELEASE: "release"}
+
+SNAPSHOT_EVERY = 200  # събития на прожекция между две снимки
+_ROW_STRIDE = 256
+
+CREATE_SEAT_EVENTS = """
+    CREATE TABLE IF NOT EXISTS seat_events (
+        id INTEGER PRIMARY KEY,
+        screening_id INTEGER NOT NULL,
+        seat INTEGER NOT NULL,
+        kind INTEGER NOT NULL,
+        at INTEGER NOT NULL,
+        booking_id INTEGER
+    )
+"""
+
+CREATE_SEAT_EVENTS_INDEX = """
+    CREATE INDEX IF NOT EXISTS idx_seat_events_screening ON seat_events (screening_id, id)
+"""
+
+CREATE_SEAT_SNAPSHOTS = """
+    CREATE TABLE IF NOT EXISTS seat_snapshots (
+        screening_id INTEGER NOT NULL,
+        event_id INTEGER NOT NULL,   -- последното събитие, включено в снимката
+        at INTEGER NOT NULL,
+        taken BLOB NOT NULL,         -- array('H') от кодовете на местата
+        held BLOB NOT NULL,
+        PRIMARY KEY (screening_id, event_id)
+    ) WITHOUT ROWID
+"""
+
+
+@dataclass
+class SeatMap:
+    taken: Set[str] = field(default_factory=set)
+    held: Set[str] = field(default_factory=set)
+
+
+# ----------------- ENCODING -----------------
+
+
+def encode_seat(seat: str) -> int:
+    seat = seat.strip().upper()
+    row, column = seat[:1], seat[1:]
+    if not ("A" <= row <= "Z") or not column.isdigit() or int(column) >= _ROW_STRIDE:
+        raise ValueError(f"Bad seat id: {seat!r}")
+    return (ord(row) - ord("A")) * _ROW_STRIDE + int(column)
+
+
+def decode_seat(code: int) -> str:
+    return f"{chr(ord('A') + code // _ROW_STRIDE)}{code % _ROW_STRIDE}"
+
+
+def _pack(codes: Iterable[int]) -> bytes:
+    return array("H", sorted(codes)).tobytes()
+
+
+def _unpack(blob: bytes) -> Set[int]:
+    codes = array("H")
+    codes.frombytes(blob)
+    return set(codes)
+
+
+def to_epoch(moment: str) -> int:
+    """"YYYY-MM-DD HH:MM[:SS]" (UTC, като created_at) -> секунди от epoch."""
+    fmt = "%Y-%m-%d %H:%M:%S" if moment.count(":") == 2 else "%Y-%m-%d %H:%M"
+    return int(datetime.strptime(moment, fmt).replace(tzinfo=timezone.utc).timestamp())
+
+
+# ----------------- WRITE -----------------
+
+
+def record(
+    cur: sqlite3.Cursor,
+    screening_id: int,
+    kind: int,
+    seats: Iterable[str],
+    booking_id: Optional[int] = None,
+) -> None:
+    """Добавя по едно събитие на място (без commit) и при нужда снимка."""
+    now = int(time.time())
+    cur.executemany(
+        "INSERT INTO seat_events (screening_id, seat, kind, at, booking_id) VALUES (?, ?, ?, ?, ?)",
+        [(screening_id, encode_seat(seat), kind, now, booking_id) for seat in seats],
+    )
+    _maybe_snapshot(cur, screening_id)
+
+
+def _last_snapshot(cur: sqlite3.Cursor, screening_id: int, before: Optional[int] = None):
+    """(event_id, taken, held) на последната снимка (до момента `before`)."""
+    cur.execute(
+        f"""
+        SELECT event_id, taken, held FROM seat_snapshots
+        WHERE screening_id = ? {"AND at <= ?" if before is not None else ""}
+        ORDER BY event_id DESC
+        LIMIT 1
+        """,
+        (screening_id,) if before is None else (screening_id, before),
+    )
+    row = cur.fetchone()
+    if row is None:
+        return 0, set(), set()
+    return row[0], _unpack(row[1]), _unpack(row[2])
+
+
+def _apply(taken: Set[int], held: Set[int], events: Iterable[Tuple[int, int]]) -> None:
+    for seat, kind in events:
+        if kind == BOOK:
+            taken.add(seat)
+            held.discard(seat)
+        elif kind == CANCEL:
+            taken.discard(seat)
+        elif kind == HOLD:
+            held.add(seat)
+        elif kind == RELEASE:
+            held.discard(seat)
+
+
+def _maybe_snapshot(cur: sqlite3.Cursor, screening_id: int) -> None:
+    cur.execute("SELECT MAX(event_id) FROM seat_snapshots WHERE screening_id = ?", (screening_id,))
+    since = cur.fetchone()[0] or 0
+    cur.execute(
+        "SELECT COUNT(*) FROM seat_events WHERE screening_id = ? AND id > ?", (screening_id, since)
+    )
+    if cur.fetchone()[0] < SNAPSHOT_EVERY:
+        return
+
+    event_id, taken, held = _last_snapshot(cur, screening_id)
+    cur.execute(
+        "SELECT id, seat, kind, at FROM seat_events WHERE screening_id = ? AND id > ? ORDER BY id",
+        (screening_id, event_id),
+    )
+    events = cur.fetchall()
+    _apply(taken, held, ((seat, kind) for _, seat, kind, _ in events))
+    last_id, _, _, last_at = events[-1]
+    cur.execute(
+        "INSERT INTO seat_snapshots (screening_id, event_id, at, taken, held) VALUES (?, ?, ?, ?, ?)",
+        (screening_id, last_id, last_at, _pack(taken), _pack(held)),
+    )
+
+
+def snapshot_current(conn: sqlite3.Connection) -> None:
+    """Базови снимки от taken_seats (за миграцията - историята започва оттук)."""
+    now = int(time.time())
+    per_screening: Dict[int, Set[int]] = {}
+    for screening_id, seat in conn.execute("SELECT screening_id, seat_id FROM taken_seats"):
+        try:
+            per_screening.setdefault(screening_id, set()).add(encode_seat(seat))
+        except ValueError:
+            continue  # място извън схемата - не може да се кодира
+    conn.executemany(
+        "INSERT OR IGNORE INTO seat_snapshots (screening_id, event_id, at, taken, held) VALUES (?, 0, ?, ?, ?)",
+        [(sid, now, _pack(seats), _pack(())) for sid, seats in per_screening.items()],
+    )
+
+
+# ----------------- REPLAY -----------------
+
+
+def seat_map_at(cur: sqlite3.Cursor, screening_id: int, at: Optional[int] = None) -> SeatMap:
+    """Картата на прожекцията в момента `at` (секунди от epoch; None - сега)."""
+    event_id, taken, held = _last_snapshot(cur, screening_id, at)
+    cur.execute(
+        f"""
+        SELECT seat, kind FROM seat_events
+        WHERE screening_id = ? AND id > ? {"AND at <= ?" if at is not None else ""}
+        ORDER BY id
+        """,
+        (screening_id, event_id) if at is None else (screening_id, event_id, at),
+    )
+    _apply(taken, held, cur.fetchall())
+    return SeatMap({decode_seat(c) for c in taken}, {decode_seat(c) for c in held})
+
+
+def seat_history(cur: sqlite3.Cursor, screening_id: int) -> List[Tuple[int, str, str, Optional[str]]]:
+    """Всички събития за прожекцията: (at, място, вид, booking_code)."""
+    cur.execute(
+        """
+        SELECT e.at, e.seat, e.kind, b.booking_code
+        FROM seat_events e LEFT JOIN bookings b ON b.id = e.booking_id
+        WHERE e.screening_id = ?
+        ORDER BY e.id
+        """,
+        (screening_id,),
+    )
+    return [(at, decode_seat(seat), KIND_NAMES.get(kind, str(kind)), code) for at, seat, kind, code in cur.fetchall()]
+
+
+if __name__ == "__main__":
+    from storage import get_connection, init_db
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: python seat_events.py <screening_id> [\"YYYY-MM-DD HH:MM:SS\"]")
+    sid = int(sys.argv[1])
+    moment = to_epoch(sys.argv[2]) if len(sys.argv) > 2 else None
+    init_db()
+    connection = get_connection()
+    cursor = connection.cursor()
+    seat_map = seat_map_at(cursor, sid, moment)
+    print(f"Taken ({len(seat_map.taken)}): {', '.join(sorted(seat_map.taken))}")
+    if seat_map.held:
+        print(f"Held ({len(seat_map.held)}): {', '.join(sorted(seat_map.held))}")
+    if moment is None:
+        for at, seat, kind, code in seat_history(cursor, sid):
+            stamp = datetime.fromtimestamp(at, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"  {stamp}  {seat:>4}  {kind:<7} {code or ''}")
+    connection.close()
@@ -1,156 +1,367 @@
 # storage.py
 
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from typing import Iterable, Set, List, Tuple, Optional
+from typing import Callable, Dict, Iterable, Set, List, Sequence, Tuple, Optional
+import functools
 import sqlite3
 
-from data import MOVIES  # ползва се за първоначално пълнене
+from data import DEFAULT_DURATION_MIN, MOVIES, TURNAROUND_MIN  # MOVIES - за първоначално пълнене
+from diagnostics import TimedConnection
+from migrations import migrate
+import sales
+import seat_events
 
 DB_PATH = Path(__file__).resolve().parent / "cinema.db"
 
 
 def get_connection() -> sqlite3.Connection:
-    return sqlite3.connect(DB_PATH)
+    return sqlite3.connect(DB_PATH, factory=TimedConnection)
 
 
+# ----------------- CLIENT MODE -----------------
+#
+# След use_server("host:port") функциите с @_remote се изпълняват от
+# booking_server.py (той държи базата), а не директно върху файла.
+# Модулите, които ползват get_connection() сами (отчети, цени, backup),
+# продължават да четат файла.
+
+# име -> локалната функция (booking_server изпълнява тези)
+REMOTE: Dict[str, Callable] = {}
+_client = None
+
+
+def _remote(fn: Callable) -> Callable:
+    REMOTE[fn.__name__] = fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _client is not None:
+            return _client.call(fn.__name__, args, kwargs)
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def use_server(address: Optional[str]) -> None:
+    """Клиентски режим към booking_server на "host:port"; None - директно към файла."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+    if address:
+        from booking_server import BookingClient
+
+        _client = BookingClient.from_address(address)
+
+
+def server_client():
+    """Текущият BookingClient или None (директен режим)."""
+    return _client
+
+
+@_remote
 def init_db() -> None:
-    """Създава таблиците и прави миграции, ако е нужно."""
+    """Прилага чакащите миграции (вж. migrations.py) и пълни началните данни."""
     conn = get_connection()
+    if migrate(conn):
+        _seed_initial_movies_and_shows(conn)
+    conn.close()
+
+
+def _seed_initial_movies_and_shows(conn: sqlite3.Connection) -> None:
+    """Пълни таблиците movies/shows от MOVIES, ако са празни."""
     cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM movies")
+    count = cur.fetchone()[0]
+    if count > 0:
+        return
 
-    # Основна таблица за резервации
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_code TEXT NOT NULL,
-            movie_id TEXT NOT NULL,
-            movie_title TEXT NOT NULL,
-            hall TEXT NOT NULL,
-            show_time TEXT NOT NULL,
-            client_name TEXT NOT NULL,
-            seats TEXT NOT NULL,
-            ticket_type TEXT,
-            price_per_seat REAL,
-            total_price REAL,
-            is_canceled INTEGER NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            canceled_at TIMESTAMP
+    for title, info in MOVIES.items():
+        movie_id = info["id"]
+        cur.execute(
+            "INSERT OR IGNORE INTO movies (movie_id, title, duration_min) VALUES (?, ?, ?)",
+            (movie_id, title, info.get("duration_min", DEFAULT_DURATION_MIN)),
         )
-        """
+    # Шаблоните - след всички филми, за да се знаят продължителностите
+    for info in MOVIES.values():
+        for hall, times in info["halls"].items():
+            for t in times:
+                _add_show(cur, info["id"], hall, t)
+
+    conn.commit()
+
+
+# ----------------- SCREENINGS -----------------
+
+
+def screening_start(day: str, show_time: str) -> str:
+    """("YYYY-MM-DD", "HH:MM") -> starts_at на прожекция."""
+    return f"{day} {show_time}"
+
+
+# ----------------- HALL OVERLAPS -----------------
+#
+# Същата проверка като hall_index (продължителност + TURNAROUND_MIN), но
+# в транзакцията на записа - важи за всеки път до shows/screenings,
+# включително през booking_server и от други терминали.
+
+_DAY_MIN = 24 * 60
+
+
+def _clock(show_time: str) -> int:
+    """"HH:MM" -> минути от полунощ."""
+    hours, _, minutes = show_time.partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def _too_close(start: int, length: int, other: int, other_length: int) -> bool:
+    return start < other + other_length + TURNAROUND_MIN and other < start + length + TURNAROUND_MIN
+
+
+def _too_close_daily(start: int, length: int, other: int, other_length: int) -> bool:
+    """Като _too_close, но в денонощие, което се повтаря (през полунощ)."""
+    return any(
+        _too_close(start + shift, length, other, other_length)
+        for shift in (0, -_DAY_MIN, _DAY_MIN)
     )
 
-    # Заети места по прожекция
+
+def _duration(cur: sqlite3.Cursor, movie_id: str) -> int:
+    cur.execute("SELECT duration_min FROM movies WHERE movie_id = ?", (movie_id,))
+    row = cur.fetchone()
+    return row[0] if row and row[0] else DEFAULT_DURATION_MIN
+
+
+def _hall_templates(cur: sqlite3.Cursor, hall: str) -> List[Tuple[str, str, int]]:
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS taken_seats (
-            movie_id TEXT NOT NULL,
-            hall TEXT NOT NULL,
-            show_time TEXT NOT NULL,
-            seat_id TEXT NOT NULL,
-            PRIMARY KEY (movie_id, hall, show_time, seat_id)
-        )
-        """
+        SELECT s.movie_id, s.show_time, COALESCE(m.duration_min, ?)
+        FROM shows s
+        LEFT JOIN movies m ON m.movie_id = s.movie_id
+        WHERE s.hall = ?
+        """,
+        (DEFAULT_DURATION_MIN, hall),
     )
+    return cur.fetchall()
 
-    # Филми
+
+def _screening_conflict(
+    cur: sqlite3.Cursor, movie_id: str, hall: str, starts_at: str
+) -> Optional[str]:
+    """Прожекцията в залата, с която се застъпва датираната ("филм at час"), или None."""
+    length = _duration(cur, movie_id)
+    start = datetime.fromisoformat(starts_at)
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS movies (
-            movie_id TEXT PRIMARY KEY,
-            title TEXT NOT NULL
-        )
-        """
+        SELECT sc.movie_id, sc.starts_at, COALESCE(m.duration_min, ?)
+        FROM screenings sc
+        LEFT JOIN movies m ON m.movie_id = sc.movie_id
+        WHERE sc.hall = ? AND sc.starts_at > ? AND sc.starts_at < ?
+        """,
+        (
+            DEFAULT_DURATION_MIN,
+            hall,
+            (start - timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+            (start + timedelta(days=1)).strftime("%Y-%m-%d %H:%M"),
+        ),
     )
-
-    # Прожекции (hall + hour)
+    for other_id, other_at, other_length in cur.fetchall():
+        offset = (datetime.fromisoformat(other_at) - start) // timedelta(minutes=1)
+        if _too_close(0, length, offset, other_length):
+            return f"{other_id} at {other_at}"
+    tod = start.hour * 60 + start.minute
+    for other_id, show_time, other_length in _hall_templates(cur, hall):
+        if (other_id, _clock(show_time)) == (movie_id, tod):
+            continue  # прожекция по собствения си шаблон
+        if _too_close_daily(tod, length, _clock(show_time), other_length):
+            return f"{other_id} at {show_time}"
+    return None
+
+
+def _show_conflict(cur: sqlite3.Cursor, movie_id: str, hall: str, show_time: str) -> Optional[str]:
+    """Шаблон или насрочена прожекция (от вчера нататък), с която се застъпва нов шаблон."""
+    start = _clock(show_time)
+    length = _duration(cur, movie_id)
+    for other_id, other_time, other_length in _hall_templates(cur, hall):
+        if _too_close_daily(start, length, _clock(other_time), other_length):
+            return f"{other_id} at {other_time}"
     cur.execute(
         """
-        CREATE TABLE IF NOT EXISTS shows (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            movie_id TEXT NOT NULL,
-            hall TEXT NOT NULL,
-            show_time TEXT NOT NULL
-        )
-        """
+        SELECT DISTINCT sc.movie_id, substr(sc.starts_at, 12, 5), COALESCE(m.duration_min, ?)
+        FROM screenings sc
+        LEFT JOIN movies m ON m.movie_id = sc.movie_id
+        WHERE sc.hall = ? AND sc.starts_at >= ?
+        """,
+        (DEFAULT_DURATION_MIN, hall, (date.today() - timedelta(days=1)).isoformat()),
     )
+    for other_id, other_time, other_length in cur.fetchall():
+        if _too_close_daily(start, length, _clock(other_time), other_length):
+            return f"{other_id} at {other_time}"
+    return None
 
-    _ensure_booking_columns(cur)
-    conn.commit()
 
-    _seed_initial_movies_and_shows(conn)
+@_remote
+def find_screening(movie_id: str, hall: str, starts_at: str) -> Optional[int]:
+    """id на прожекцията или None, ако още не е създадена."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT id FROM screenings WHERE movie_id = ? AND hall = ? AND starts_at = ?",
+        (movie_id, hall, starts_at),
+    )
+    row = cur.fetchone()
     conn.close()
+    return row[0] if row else None
 
 
-def _ensure_booking_columns(cur: sqlite3.Cursor) -> None:
-    """Добавя липсващи колони в bookings (ако DB е по-стар)."""
-    cur.execute("PRAGMA table_info(bookings)")
-    cols = {row[1] for row in cur.fetchall()}
+def _ensure_screening(cur: sqlite3.Cursor, movie_id: str, hall: str, starts_at: str) -> int:
+    cur.execute(
+        "SELECT id FROM screenings WHERE movie_id = ? AND hall = ? AND starts_at = ?",
+        (movie_id, hall, starts_at),
+    )
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    # Прожекция по ежедневен шаблон е проверена при добавянето на шаблона;
+    # извънредна (час извън shows) се проверява тук.
+    cur.execute(
+        "SELECT 1 FROM shows WHERE movie_id = ? AND hall = ? AND show_time = ?",
+        (movie_id, hall, starts_at[11:16]),
+    )
+    if cur.fetchone() is None:
+        conflict = _screening_conflict(cur, movie_id, hall, starts_at)
+        if conflict:
+            raise ValueError(f"{hall}: {movie_id} at {starts_at} overlaps {conflict}")
+    cur.execute(
+        "INSERT INTO screenings (movie_id, hall, starts_at) VALUES (?, ?, ?)",
+        (movie_id, hall, starts_at),
+    )
+    return cur.lastrowid
 
-    def add_column_if_missing(name: str, ddl: str) -> None:
-        if name not in cols:
-            cur.execute(f"ALTER TABLE bookings ADD COLUMN {name} {ddl}")
 
-    add_column_if_missing("ticket_type", "TEXT")
-    add_column_if_missing("price_per_seat", "REAL")
-    add_column_if_missing("total_price", "REAL")
-    add_column_if_missing("is_canceled", "INTEGER NOT NULL DEFAULT 0")
-    add_column_if_missing("canceled_at", "TIMESTAMP")
+@_remote
+def ensure_screening(movie_id: str, hall: str, starts_at: str) -> int:
+    """Връща id на прожекцията, като я създава при нужда."""
+    return _write("ensure_screening", movie_id, hall, starts_at)
 
 
-def _seed_initial_movies_and_shows(conn: sqlite3.Connection) -> None:
-    """Пълни таблиците movies/shows от MOVIES, ако са празни."""
+@_remote
+def get_screenings_between(
+    first_day: str, last_day: Optional[str] = None
+) -> List[Tuple[str, str, str]]:
+    """
+    (movie_id, hall, starts_at) на датираните прожекции в дните
+    [first_day, last_day]; без last_day - всички от first_day нататък.
+    """
+    conn = get_connection()
     cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM movies")
-    count = cur.fetchone()[0]
-    if count > 0:
-        return
+    cur.execute(
+        """
+        SELECT movie_id, hall, starts_at
+        FROM screenings
+        WHERE starts_at >= ? AND (? IS NULL OR starts_at < date(?, '+1 day'))
+        ORDER BY starts_at
+        """,
+        (first_day, last_day, last_day),
+    )
+    rows = cur.fetchall()
+    conn.close()
+    return rows
 
-    for title, info in MOVIES.items():
-        movie_id = info["id"]
-        cur.execute(
-            "INSERT OR IGNORE INTO movies (movie_id, title) VALUES (?, ?)",
-            (movie_id, title),
-        )
-        for hall, times in info["halls"].items():
-            for t in times:
-                cur.execute(
-                    "INSERT INTO shows (movie_id, hall, show_time) VALUES (?, ?, ?)",
-                    (movie_id, hall, t),
-                )
 
-    conn.commit()
+@_remote
+def add_screenings(rows: Iterable[Tuple[str, str, str]]) -> int:
+    """
+    Записва много прожекции (movie_id, hall, starts_at) в една транзакция.
+    Вече съществуващите и застъпващите се (вж. _screening_conflict)
+    се пропускат.
+    Връща броя на новозаписаните.
+    """
+    return _in_transaction(_add_screenings, list(rows))
+
+
+def _add_screenings(cur: sqlite3.Cursor, rows: List[Tuple[str, str, str]]) -> int:
+    inserted = 0
+    for movie_id, hall, starts_at in rows:
+        if _screening_conflict(cur, movie_id, hall, starts_at) is None:
+            cur.execute(
+                "INSERT INTO screenings (movie_id, hall, starts_at) VALUES (?, ?, ?)",
+                (movie_id, hall, starts_at),
+            )
+            inserted += 1
+    return inserted
 
 
 # ----------------- BOOKING / SEATS -----------------
+#
+# Записите са на две нива: _функция(cur, ...) върши работата в чужда
+# транзакция (write_queue събира много такива в един commit), а
+# публичната функция я изпълнява в своя връзка (_in_transaction) или,
+# след use_write_queue, в общата партида на опашката.
 
+_write_queue = None
 
-def save_booking(
+
+def _in_transaction(op: Callable, *args, **kwargs):
+    """op(cur, ...) в нова връзка и BEGIN IMMEDIATE транзакция."""
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        result = op(cur, *args, **kwargs)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return result
+
+
+def use_write_queue(writes) -> None:
+    """Записите от WRITE_OPS минават през write_queue.WriteQueue; None - всеки със свой commit."""
+    global _write_queue
+    _write_queue = writes
+
+
+def _write(name: str, *args, **kwargs):
+    """WRITE_OPS[name](cur, ...) в общата партида или в своя транзакция."""
+    if _write_queue is not None:
+        return _write_queue.call(name, *args, **kwargs)
+    return _in_transaction(WRITE_OPS[name], *args, **kwargs)
+
+
+def _save_booking(
+    cur: sqlite3.Cursor,
     movie_id: str,
     movie_title: str,
     hall: str,
     show_time: str,
+    screening_id: int,
     client_name: str,
     seats: Iterable[str],
     booking_code: str,
     ticket_type: str,
     price_per_seat: float,
     total_price: float,
-) -> None:
-    """Записва резервацията в bookings."""
-    conn = get_connection()
-    cur = conn.cursor()
-
-    seats_str = ",".join(seats)
+    created_at: Optional[str] = None,
+    request_key: Optional[str] = None,
+) -> int:
+    """Връща id на новия ред в bookings."""
+    seats = list(seats)
+    if created_at is None:
+        # като CURRENT_TIMESTAMP (UTC) -> денят също е по UTC
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
     cur.execute(
         """
         INSERT INTO bookings (
             booking_code, movie_id, movie_title,
-            hall, show_time, client_name, seats,
-            ticket_type, price_per_seat, total_price
+            hall, show_time, screening_id, client_name, client_fold, seats,
+            ticket_type, price_per_seat, total_price, created_at, request_key
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             booking_code,
@@ -158,52 +369,87 @@ def save_booking(
             movie_title,
             hall,
             show_time,
+            screening_id,
             client_name,
-            seats_str,
+            client_name.casefold(),
+            ",".join(seats),
             ticket_type,
             price_per_seat,
             total_price,
+            created_at,
+            request_key,
         ),
     )
-
-    conn.commit()
-    conn.close()
+    booking_id = cur.lastrowid
+    sales.record_booking(
+        cur, movie_id, movie_title, hall, show_time, created_at[:10], len(seats), total_price
+    )
+    return booking_id
 
 
-def mark_seats_taken(
+@_remote
+def save_booking(
     movie_id: str,
+    movie_title: str,
     hall: str,
     show_time: str,
+    screening_id: int,
+    client_name: str,
     seats: Iterable[str],
+    booking_code: str,
+    ticket_type: str,
+    price_per_seat: float,
+    total_price: float,
 ) -> None:
+    """Записва резервацията в bookings и обновява агрегатите за продажби."""
+    _write(
+        "save_booking", movie_id, movie_title, hall, show_time, screening_id, client_name,
+        seats, booking_code, ticket_type, price_per_seat, total_price,
+    )
+
+
+def _mark_seats_taken(
+    cur: sqlite3.Cursor, screening_id: int, seats: Iterable[str], booking_id: Optional[int] = None
+) -> None:
+    seats = list(dict.fromkeys(seat.strip() for seat in seats))
+    # в журнала отиват само местата, които наистина се заемат сега
+    new = sorted(set(seats) - set(_taken_among(cur, screening_id, seats)))
+    cur.executemany(
+        "INSERT INTO taken_seats (screening_id, seat_id) VALUES (?, ?)",
+        [(screening_id, seat) for seat in new],
+    )
+    seat_events.record(cur, screening_id, seat_events.BOOK, new, booking_id)
+
+
+@_remote
+def mark_seats_taken(screening_id: int, seats: Iterable[str]) -> None:
     """Маркира местата като заети за дадена прожекция."""
-    conn = get_connection()
-    cur = conn.cursor()
+    _write("mark_seats_taken", screening_id, list(seats))
 
-    for seat in seats:
-        cur.execute(
-            """
-            INSERT OR IGNORE INTO taken_seats (movie_id, hall, show_time, seat_id)
-            VALUES (?, ?, ?, ?)
-            """,
-            (movie_id, hall, show_time, seat.strip()),
-        )
 
-    conn.commit()
-    conn.close()
+def _taken_among(cur: sqlite3.Cursor, screening_id: int, seats: List[str]) -> List[str]:
+    """Кои от seats вече са заети."""
+    if not seats:
+        return []
+    cur.execute(
+        f"""
+        SELECT seat_id FROM taken_seats
+        WHERE screening_id = ? AND seat_id IN ({",".join("?" * len(seats))})
+        """,
+        (screening_id, *seats),
+    )
+    return sorted(row[0] for row in cur.fetchall())
 
 
-def get_taken_seats(movie_id: str, hall: str, show_time: str) -> Set[str]:
+@_remote
+def get_taken_seats(screening_id: int) -> Set[str]:
     """Връща всички заети места за дадена прожекция."""
     conn = get_connection()
     cur = conn.cursor()
 
     cur.execute(
-        """
-        SELECT seat_id FROM taken_seats
-        WHERE movie_id = ? AND hall = ? AND show_time = ?
-        """,
-        (movie_id, hall, show_time),
+        "SELECT seat_id FROM taken_seats WHERE screening_id = ?",
+        (screening_id,),
     )
 
     rows = cur.fetchall()
@@ -212,19 +458,115 @@ def get_taken_seats(movie_id: str, hall: str, show_time: str) -> Set[str]:
     return {row[0] for row in rows}
 
 
-def cancel_booking(booking_code: str) -> Tuple[bool, str]:
-    """
-    Отказва резервация по код:
-    - маха заетите места от taken_seats
-    - маркира booking като canceled
-    Връща (успех, причина).
-    """
+def get_taken_seats_many(screening_ids: Iterable[int]) -> Dict[int, Set[str]]:
+    """Заетите места за много прожекции с една заявка (за async_storage)."""
+    screening_ids = list(screening_ids)
+    out: Dict[int, Set[str]] = {sid: set() for sid in screening_ids}
+    if not screening_ids:
+        return out
     conn = get_connection()
     cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT screening_id, seat_id FROM taken_seats
+        WHERE screening_id IN ({",".join("?" * len(screening_ids))})
+        """,
+        screening_ids,
+    )
+    for screening_id, seat_id in cur.fetchall():
+        out[screening_id].add(seat_id)
+    conn.close()
+    return out
+
 
+def _booking_for_request(cur: sqlite3.Cursor, request_key: str) -> Optional[Tuple[str, int, List[str]]]:
+    """(booking_code, screening_id, места) на резервацията с този request_key."""
+    cur.execute(
+        "SELECT booking_code, screening_id, seats FROM bookings WHERE request_key = ?",
+        (request_key,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return row[0], row[1], [s for s in row[2].split(",") if s]
+
+
+def _book(
+    cur: sqlite3.Cursor,
+    movie_id: str,
+    movie_title: str,
+    hall: str,
+    starts_at: str,
+    show_time: str,
+    client_name: str,
+    seats: Iterable[str],
+    booking_code: str,
+    ticket_type: str,
+    price_per_seat: float,
+    total_price: float,
+    request_key: Optional[str] = None,
+) -> Tuple[bool, str, int, List[str]]:
+    """(успех, причина, screening_id, местата - продадените или заетите)."""
+    if request_key is not None:
+        original = _booking_for_request(cur, request_key)
+        if original is not None:
+            _, screening_id, sold = original
+            return True, "duplicate", screening_id, sold
+    seats = [s.strip() for s in seats]
+    screening_id = _ensure_screening(cur, movie_id, hall, starts_at)
+    clashes = _taken_among(cur, screening_id, seats)
+    if clashes:
+        return False, "seats_taken", screening_id, clashes
+    booking_id = _save_booking(
+        cur, movie_id, movie_title, hall, show_time, screening_id, client_name,
+        seats, booking_code, ticket_type, price_per_seat, total_price, None, request_key,
+    )
+    _mark_seats_taken(cur, screening_id, seats, booking_id)
+    return True, "ok", screening_id, seats
+
+
+@_remote
+def book(
+    movie_id: str,
+    movie_title: str,
+    hall: str,
+    starts_at: str,
+    show_time: str,
+    client_name: str,
+    seats: Iterable[str],
+    booking_code: str,
+    ticket_type: str,
+    price_per_seat: float,
+    total_price: float,
+    request_key: Optional[str] = None,
+) -> Tuple[bool, str]:
+    """
+    Прожекция + резервация + заети места в една транзакция.
+    Ако някое място вече е заето, нищо не се записва.
+    request_key (по един на продажба) прави повторенията безопасни: ако
+    резервация с този ключ вече е записана, нищо ново не се записва.
+    Връща (успех, причина): "ok", "duplicate" (вече записана) или "seats_taken".
+    """
+    if request_key is not None:
+        # Повторение след таймаут: отговор без да чакаме за запис
+        conn = get_connection()
+        original = _booking_for_request(conn.cursor(), request_key)
+        conn.close()
+        if original is not None:
+            return True, "duplicate"
+    ok, reason, _, _ = _write(
+        "book", movie_id, movie_title, hall, starts_at, show_time, client_name,
+        seats, booking_code, ticket_type, price_per_seat, total_price, request_key,
+    )
+    return ok, reason
+
+
+def _cancel_booking(cur: sqlite3.Cursor, booking_code: str) -> Tuple[bool, str, Optional[int], List[str]]:
+    """(успех, причина, screening_id, освободените места)."""
     cur.execute(
         """
-        SELECT movie_id, hall, show_time, seats, is_canceled
+        SELECT id, movie_id, movie_title, hall, show_time, screening_id, seats, is_canceled,
+               date(created_at), total_price
         FROM bookings
         WHERE booking_code = ?
         """,
@@ -232,24 +574,20 @@ def cancel_booking(booking_code: str) -> Tuple[bool, str]:
     )
     row = cur.fetchone()
     if not row:
-        conn.close()
-        return False, "not_found"
+        return False, "not_found", None, []
 
-    movie_id, hall, show_time, seats_str, is_canceled = row
+    (booking_id, movie_id, movie_title, hall, show_time, screening_id,
+     seats_str, is_canceled, day, total_price) = row
     if is_canceled:
-        conn.close()
-        return False, "already_canceled"
+        return False, "already_canceled", screening_id, []
 
     seats = [s.strip() for s in seats_str.split(",") if s.strip()]
 
-    for seat in seats:
-        cur.execute(
-            """
-            DELETE FROM taken_seats
-            WHERE movie_id = ? AND hall = ? AND show_time = ? AND seat_id = ?
-            """,
-            (movie_id, hall, show_time, seat),
-        )
+    cur.executemany(
+        "DELETE FROM taken_seats WHERE screening_id = ? AND seat_id = ?",
+        [(screening_id, seat) for seat in seats],
+    )
+    seat_events.record(cur, screening_id, seat_events.CANCEL, seats, booking_id)
 
     cur.execute(
         """
@@ -261,14 +599,371 @@ def cancel_booking(booking_code: str) -> Tuple[bool, str]:
         (booking_code,),
     )
 
-    conn.commit()
+    sales.record_cancellation(
+        cur, movie_id, movie_title, hall, show_time, day, len(seats), total_price
+    )
+    return True, "ok", screening_id, seats
+
+
+@_remote
+def cancel_booking(booking_code: str) -> Tuple[bool, str]:
+    """
+    Отказва резервация по код:
+    - маха заетите места от taken_seats
+    - маркира booking като canceled
+    - вади билетите/прихода от агрегатите за продажби
+    Връща (успех, причина).
+    """
+    ok, reason, _, _ = _write("cancel_booking", booking_code)
+    return ok, reason
+
+
+def _replay_booking(
+    cur: sqlite3.Cursor,
+    booking_code: str,
+    movie_id: str,
+    movie_title: str,
+    hall: str,
+    starts_at: str,
+    show_time: str,
+    client_name: str,
+    seats_str: str,
+    ticket_type: str,
+    price_per_seat: float,
+    total_price: float,
+    created_at: str,
+    request_key: Optional[str] = None,
+) -> Tuple[str, str]:
+    # Вече записана (резервацията и местата са в една транзакция) - нищо
+    # не се пипа: ако междувременно е отказана, местата остават свободни.
+    cur.execute("SELECT 1 FROM bookings WHERE booking_code = ?", (booking_code,))
+    if cur.fetchone():
+        return "synced", ""
+    if request_key is not None and _booking_for_request(cur, request_key) is not None:
+        # Същата продажба е минала онлайн (напр. отговорът се е загубил)
+        return "synced", ""
+
+    seats = [s.strip() for s in seats_str.split(",") if s.strip()]
+    screening_id = _ensure_screening(cur, movie_id, hall, starts_at)
+
+    clashes = _taken_among(cur, screening_id, seats)
+    if clashes:
+        return "conflict", ",".join(clashes)
+
+    # Продажбата се брои в деня, в който е направена
+    booking_id = _save_booking(
+        cur, movie_id, movie_title, hall, show_time, screening_id, client_name,
+        seats, booking_code, ticket_type, price_per_seat, total_price, created_at, request_key,
+    )
+    _mark_seats_taken(cur, screening_id, seats, booking_id)
+    return "synced", ""
+
+
+@_remote
+def replay_bookings(rows: Iterable[tuple]) -> List[Tuple[str, str, str]]:
+    """
+    Записва продажби от офлайн журнала (вж. offline.py) в една транзакция.
+    Редовете са (booking_code, movie_id, movie_title, hall, starts_at,
+    show_time, client_name, seats, ticket_type, price_per_seat,
+    total_price, created_at[, request_key]).
+    Връща [(booking_code, статус, подробности)]:
+    - "synced"   - записана (или вече записана при прекъснат sync)
+    - "conflict" - някое място е продадено междувременно; подробности = местата
+    - "failed"   - редът е невалиден (грешно място, застъпване, ...); подробности =
+                   текстът на грешката. Всеки ред е в свой SAVEPOINT, така че
+                   лош ред не спира останалите.
+    """
+    def replay(cur: sqlite3.Cursor) -> List[Tuple[str, str, str]]:
+        results = []
+        for row in rows:
+            cur.execute("SAVEPOINT row")
+            try:
+                results.append((row[0], *_replay_booking(cur, *row)))
+            except (ValueError, TypeError, sqlite3.IntegrityError) as e:
+                cur.execute("ROLLBACK TO row")
+                results.append((row[0], "failed", f"{type(e).__name__}: {e}"))
+            cur.execute("RELEASE row")
+        return results
+
+    return _in_transaction(replay)
+
+
+# Операциите, които booking_server може да събере в обща транзакция
+WRITE_OPS: Dict[str, Callable] = {
+    "ensure_screening": _ensure_screening,
+    "save_booking": _save_booking,
+    "mark_seats_taken": _mark_seats_taken,
+    "book": _book,
+    "cancel_booking": _cancel_booking,
+}
+
+
+def run_write_batch(conn: sqlite3.Connection, ops: Sequence[Tuple[str, tuple, dict]]) -> List[Tuple[bool, object]]:
+    """
+    Group commit: изпълнява WRITE_OPS операциите (име, args, kwargs) в една
+    транзакция с един commit. Всяка е в свой SAVEPOINT - грешка в една
+    връща назад само нея. Връща [(успех, резултат или изключение)].
+    """
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    results: List[Tuple[bool, object]] = []
+    try:
+        for name, args, kwargs in ops:
+            cur.execute("SAVEPOINT op")
+            try:
+                results.append((True, WRITE_OPS[name](cur, *args, **kwargs)))
+            except Exception as e:
+                cur.execute("ROLLBACK TO op")
+                results.append((False, e))
+            cur.execute("RELEASE op")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return results
+
+
+BOOKING_PAGE_COLUMNS = (
+    "id", "booking_code", "created_at", "client_name", "movie_title",
+    "hall", "show_time", "seats", "total_price", "is_canceled",
+)
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Най-малкият низ след всички, започващи с prefix (за range по индекс)."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+@_remote
+def fetch_bookings_page(
+    before_id: Optional[int] = None,
+    limit: int = 200,
+    code_prefix: str = "",
+    client_prefix: str = "",
+    movie_id: str = "",
+    day: str = "",
+) -> List[tuple]:
+    """
+    Страница резервации, най-новите първи (keyset по id, без OFFSET).
+    Следващата страница се взима с before_id = id на последния ред.
+    Филтрите са по индексирани колони: код/клиент по префикс (клиентът
+    без значение от регистъра, и на кирилица), филм по movie_id, ден като
+    "YYYY-MM-DD". Филм и ден са равенства и идват подредени по id от
+    индекса; префиксите сортират само съвпаденията.
+    """
+    where = []
+    params: List = []
+
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    if code_prefix:
+        code_prefix = code_prefix.upper()
+        where.append("booking_code >= ? AND booking_code < ?")
+        params += [code_prefix, _prefix_upper_bound(code_prefix)]
+    if client_prefix:
+        client_prefix = client_prefix.casefold()
+        where.append("client_fold >= ? AND client_fold < ?")
+        params += [client_prefix, _prefix_upper_bound(client_prefix)]
+    if movie_id:
+        where.append("movie_id = ?")
+        params.append(movie_id)
+    if day:
+        where.append("date(created_at) = ?")
+        params.append(day)
+
+    sql = f"SELECT {', '.join(BOOKING_PAGE_COLUMNS)} FROM bookings"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
     conn.close()
-    return True, "ok"
+    return rows
+
+
+def _cancel_show(cur: sqlite3.Cursor, screening_id: int) -> List[Tuple[str, str, str, str, float]]:
+    """
+    Отказва всички активни резервации за прожекция (напр. повреден проектор)
+    в една транзакция, с set-based UPDATE/DELETE:
+    - маркира резервациите като canceled
+    - освобождава всички места в taken_seats
+    - вади билетите/прихода от агрегатите
+    Връща манифест за връщане на пари:
+    (booking_code, client_name, seats, ticket_type, total_price).
+    """
+    cur.execute(
+        """
+        SELECT booking_code, client_name, seats, ticket_type, total_price,
+               movie_id, movie_title, hall, show_time, date(created_at), id
+        FROM bookings
+        WHERE screening_id = ? AND is_canceled = 0
+        ORDER BY id
+        """,
+        (screening_id,),
+    )
+    rows = cur.fetchall()
+
+    # Журнал: кое място от коя резервация се освобождава
+    cur.execute("SELECT seat_id FROM taken_seats WHERE screening_id = ?", (screening_id,))
+    released = {row[0]: None for row in cur.fetchall()}
+    for row in rows:
+        for seat in row[2].split(","):
+            if seat.strip() in released:
+                released[seat.strip()] = row[10]
+    by_booking: Dict[Optional[int], List[str]] = {}
+    for seat, booking_id in released.items():
+        by_booking.setdefault(booking_id, []).append(seat)
+    for booking_id, seats in by_booking.items():
+        seat_events.record(cur, screening_id, seat_events.CANCEL, seats, booking_id)
+
+    cur.execute(
+        """
+        UPDATE bookings
+        SET is_canceled = 1,
+            canceled_at = CURRENT_TIMESTAMP
+        WHERE screening_id = ? AND is_canceled = 0
+        """,
+        (screening_id,),
+    )
+    cur.execute("DELETE FROM taken_seats WHERE screening_id = ?", (screening_id,))
+
+    # Агрегатите се обновяват по ден, не по резервация
+    per_day = {}
+    for _, _, seats_str, _, total_price, movie_id, movie_title, hall, show_time, day, _ in rows:
+        totals = per_day.setdefault((movie_id, hall, show_time, day), [movie_title, 0, 0.0, 0])
+        totals[1] += sales.count_seats(seats_str)
+        totals[2] += total_price or 0.0
+        totals[3] += 1
+    for (movie_id, hall, show_time, day), (movie_title, tickets, revenue, count) in per_day.items():
+        sales.apply_delta(cur, movie_id, movie_title, hall, show_time, day, -tickets, -revenue, -count, count)
+
+    return [(row[0], row[1], row[2], row[3], row[4] or 0.0) for row in rows]
+
+
+@_remote
+def cancel_show(screening_id: int) -> List[Tuple[str, str, str, str, float]]:
+    """Вж. _cancel_show. IMMEDIATE: никой не може да продаде място между SELECT-а и UPDATE-а."""
+    return _in_transaction(_cancel_show, screening_id)
+
+
+# ----------------- SEARCH -----------------
+
+
+def _search_tokens(query: str) -> List[str]:
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in query.lower())
+    return cleaned.split()
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein с ранен изход, когато разстоянието надхвърли limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _pieces(text: str, count: int) -> List[str]:
+    """text на count последователни части с почти равна дължина."""
+    size, extra = divmod(len(text), count)
+    out, start = [], 0
+    for i in range(count):
+        end = start + size + (i < extra)
+        out.append(text[start:end])
+        start = end
+    return out
+
+
+def _fuzzy_terms(cur: sqlite3.Cursor, token: str) -> List[str]:
+    """
+    Думи от речника на FTS индекса, близки до token
+    (същата първа буква, до 1 грешка; до 2 за по-дълги думи).
+    Кодовете на резервациите не участват (търсят се по префикс).
+
+    Кандидатите се отсяват в SQL, преди Levenshtein в Python:
+    - range по първата буква (fts5vocab обхожда само него);
+    - думи, по-къси от token с повече от limit букви, отпадат;
+    - останалата част от token се дели на limit + 1 парчета: всяка грешка
+      поврежда най-много едно, така че поне едно трябва да се среща
+      непокътнато в началото на думата (instr, без загуба на съвпадения).
+    """
+    limit = 1 if len(token) < 6 else 2
+    width = len(token) + limit  # думата се сравнява по префикс с тази дължина
+    pieces = _pieces(token[1:], limit + 1)
+    sql = """
+        SELECT DISTINCT term FROM bookings_fts_vocab
+        WHERE term >= ? AND term < ? AND col IN ('client_name', 'movie_title')
+          AND length(term) >= ?
+    """
+    params: list = [token[0], _prefix_upper_bound(token[0]), len(token) - limit]
+    if all(pieces):
+        sql += " AND (" + " OR ".join("instr(substr(term, 1, ?), ?) > 0" for _ in pieces) + ")"
+        for piece in pieces:
+            params += [width, piece]
+    cur.execute(sql, params)
+    return [
+        term for (term,) in cur.fetchall()
+        if _edit_distance(token, term[:width], limit) <= limit
+    ]
+
+
+@_remote
+def search_bookings(query: str, limit: int = 20) -> List[tuple]:
+    """
+    Търси резервации по име на клиент, код или филм (FTS5).
+    Първо по префикс на всяка дума; ако няма резултат - размито,
+    през думите от речника на индекса.
+    Връща (booking_code, client_name, movie_title, hall, show_time, is_canceled).
+    """
+    tokens = _search_tokens(query)
+    if not tokens:
+        return []
+
+    conn = get_connection()
+    cur = conn.cursor()
+    sql = """
+        SELECT b.booking_code, b.client_name, b.movie_title, b.hall, b.show_time, b.is_canceled
+        FROM bookings_fts f
+        JOIN bookings b ON b.id = f.rowid
+        WHERE bookings_fts MATCH ?
+        ORDER BY f.rank
+        LIMIT ?
+    """
+
+    prefix_match = " AND ".join(f'"{t}"*' for t in tokens)
+    cur.execute(sql, (prefix_match, limit))
+    rows = cur.fetchall()
+
+    if not rows:
+        groups = []
+        for token in tokens:
+            terms = _fuzzy_terms(cur, token)
+            if not terms:
+                break
+            groups.append("(" + " OR ".join(f'"{t}"' for t in terms) + ")")
+        else:
+            cur.execute(sql, (" AND ".join(groups), limit))
+            rows = cur.fetchall()
+
+    conn.close()
+    return rows
 
 
 # ----------------- MOVIES / SHOWS -----------------
 
 
+@_remote
 def get_all_movie_titles() -> List[str]:
     conn = get_connection()
     cur = conn.cursor()
@@ -278,6 +973,7 @@ def get_all_movie_titles() -> List[str]:
     return [r[0] for r in rows]
 
 
+@_remote
 def get_movie_id_for_title(title: str) -> str:
     conn = get_connection()
     cur = conn.cursor()
@@ -287,25 +983,34 @@ def get_movie_id_for_title(title: str) -> str:
     return row[0] if row else ""
 
 
-def get_halls_for_movie(title: str) -> List[str]:
+@_remote
+def get_halls_for_movie(title: str, day: str) -> List[str]:
+    """Зали с прожекции на филма в деня: ежедневните (shows) + датираните."""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
         """
-        SELECT DISTINCT s.hall
+        SELECT s.hall
         FROM shows s
         JOIN movies m ON s.movie_id = m.movie_id
         WHERE m.title = ?
-        ORDER BY s.hall
+        UNION
+        SELECT sc.hall
+        FROM screenings sc
+        JOIN movies m ON sc.movie_id = m.movie_id
+        WHERE m.title = ? AND sc.starts_at >= ? AND sc.starts_at < date(?, '+1 day')
+        ORDER BY 1
         """,
-        (title,),
+        (title, title, day, day),
     )
     rows = cur.fetchall()
     conn.close()
     return [r[0] for r in rows]
 
 
-def get_show_times(title: str, hall: str) -> List[str]:
+@_remote
+def get_show_times(title: str, hall: str, day: str) -> List[str]:
+    """Часове "HH:MM" за филм + зала в деня: ежедневните (shows) + датираните."""
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
@@ -314,9 +1019,15 @@ def get_show_times(title: str, hall: str) -> List[str]:
         FROM shows s
         JOIN movies m ON s.movie_id = m.movie_id
         WHERE m.title = ? AND s.hall = ?
-        ORDER BY s.show_time
+        UNION
+        SELECT substr(sc.starts_at, 12)
+        FROM screenings sc
+        JOIN movies m ON sc.movie_id = m.movie_id
+        WHERE m.title = ? AND sc.hall = ?
+          AND sc.starts_at >= ? AND sc.starts_at < date(?, '+1 day')
+        ORDER BY 1
         """,
-        (title, hall),
+        (title, hall, title, hall, day, day),
     )
     rows = cur.fetchall()
     conn.close()
@@ -330,31 +1041,60 @@ def _make_slug(title: str) -> str:
     return cleaned or "movie"
 
 
-def add_movie(title: str) -> str:
+@_remote
+def add_movie(title: str, duration_min: int = DEFAULT_DURATION_MIN) -> str:
     """Добавя нов филм. Връща movie_id (slug)."""
     movie_id = _make_slug(title)
     conn = get_connection()
     cur = conn.cursor()
     cur.execute(
-        "INSERT OR IGNORE INTO movies (movie_id, title) VALUES (?, ?)",
-        (movie_id, title),
+        "INSERT OR IGNORE INTO movies (movie_id, title, duration_min) VALUES (?, ?, ?)",
+        (movie_id, title, duration_min),
     )
     conn.commit()
     conn.close()
     return movie_id
 
 
+@_remote
 def add_show(movie_id: str, hall: str, show_time: str) -> None:
-    conn = get_connection()
-    cur = conn.cursor()
+    """Добавя ежедневна прожекция. ValueError, ако се застъпва с друга в залата."""
+    _in_transaction(_add_show, movie_id, hall, show_time)
+
+
+def _add_show(cur: sqlite3.Cursor, movie_id: str, hall: str, show_time: str) -> None:
+    conflict = _show_conflict(cur, movie_id, hall, show_time)
+    if conflict:
+        raise ValueError(f"{hall}: {movie_id} at {show_time} overlaps {conflict}")
     cur.execute(
         "INSERT INTO shows (movie_id, hall, show_time) VALUES (?, ?, ?)",
         (movie_id, hall, show_time),
     )
-    conn.commit()
+
+
+@_remote
+def get_show_templates() -> List[Tuple[str, str, str]]:
+    """Ежедневните прожекции от shows: (movie_id, hall, show_time)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT movie_id, hall, show_time FROM shows ORDER BY hall, show_time")
+    rows = cur.fetchall()
     conn.close()
+    return rows
 
 
+@_remote
+def get_movie_durations() -> Dict[str, int]:
+    """{movie_id: продължителност в минути}."""
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT movie_id, duration_min FROM movies")
+    rows = cur.fetchall()
+    conn.close()
+    return dict(rows)
+
+
+@_remote
 def get_movies_with_show_counts() -> List[Tuple[str, int]]:
     """За Admin таблицата: (title, number_of_shows)."""
     conn = get_connection()
@@ -376,20 +1116,21 @@ def get_movies_with_show_counts() -> List[Tuple[str, int]]:
 # ----------------- STATS -----------------
 
 
-def get_stats_by_movie() -> List[Tuple[str, int]]:
+@_remote
+def get_stats_by_movie() -> List[Tuple[str, int, float]]:
     """
-    Колко резервации има за всеки филм (без отменените).
+    Билети и приход за всеки филм (без отменените),
+    от материализираната таблица sales_by_movie.
     """
     conn = get_connection()
     cur = conn.cursor()
 
     cur.execute(
         """
-        SELECT movie_title, COUNT(*) as cnt
-        FROM bookings
-        WHERE is_canceled = 0
-        GROUP BY movie_id, movie_title
-        ORDER BY cnt DESC, movie_title ASC
+        SELECT movie_title, tickets, revenue
+        FROM sales_by_movie
+        WHERE bookings > 0
+        ORDER BY tickets DESC, movie_title ASC
         """
     )
 
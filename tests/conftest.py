@@ -0,0 +1,19 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Нова cinema.db в tmp_path с всички миграции (никога репото cinema.db)."""
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "cinema.db")
+    storage.init_db()
+    return storage.DB_PATH
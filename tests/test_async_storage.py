@@ -0,0 +1,56 @@
+# tests/test_async_storage.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import storage
+from async_storage import AsyncStorage
+
+
+class _Unhashable:
+    __hash__ = None
+
+
+@pytest.fixture
+def slow_read(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def read(*args, **kwargs):
+        with lock:
+            calls.append((args, kwargs))
+        time.sleep(0.05)
+        return len(calls)
+
+    monkeypatch.setitem(storage.REMOTE, "slow_read", read)
+    return calls
+
+
+def _read_twice(first, second):
+    async def main():
+        db = AsyncStorage()
+        try:
+            return await asyncio.gather(db.read("slow_read", *first), db.read("slow_read", *second))
+        finally:
+            await db.close()
+
+    return asyncio.run(main())
+
+
+def test_equal_list_args_share_one_read(db, slow_read):
+    results = _read_twice((["A1", "A2"], {"day": ["2030-01-01"]}), (["A1", "A2"], {"day": ["2030-01-01"]}))
+    assert results == [1, 1]
+    assert len(slow_read) == 1
+
+
+def test_different_args_are_not_shared(db, slow_read):
+    _read_twice((["A1"],), (["A2"],))
+    assert len(slow_read) == 2
+
+
+def test_unhashable_args_skip_dedup(db, slow_read):
+    _read_twice((_Unhashable(),), (_Unhashable(),))
+    assert len(slow_read) == 2
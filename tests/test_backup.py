@@ -0,0 +1,57 @@
+# tests/test_backup.py
+
+import pytest
+
+import backup
+import storage
+from backup import BackupRestarted, backup_database, verify_backup
+
+
+def _grow(rows: int = 200) -> None:
+    """Няколкостотин страници, за да има много стъпки."""
+    conn = storage.get_connection()
+    conn.execute("CREATE TABLE IF NOT EXISTS filler (id INTEGER PRIMARY KEY, data BLOB)")
+    conn.executemany("INSERT INTO filler (data) VALUES (?)", [(b"x" * 4000,) for _ in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def test_restart_guard_counts_only_restarts():
+    guard = backup._step_progress(max_restarts=1, pause=0)
+    for remaining in (90, 60, 30, 0):
+        guard(0, remaining, 100)
+    guard(0, 100, 100)  # първи рестарт - още е в лимита
+    with pytest.raises(BackupRestarted):
+        guard(0, 70, 100)
+        guard(0, 100, 100)
+
+
+def test_backup_in_small_steps(db, tmp_path):
+    _grow()
+    path = backup_database(tmp_path / "backups", pages=8, sleep=0)
+    assert verify_backup(path)
+    assert not list((tmp_path / "backups").glob("*.partial"))
+
+
+def test_backup_gives_up_when_writes_keep_restarting_it(db, tmp_path, monkeypatch):
+    _grow()
+    other = storage.get_connection()  # "друга каса", пише между стъпките
+    step_progress = backup._step_progress
+
+    def writing_progress(max_restarts, pause):
+        progress = step_progress(max_restarts, pause)
+
+        def step(status, remaining, total):
+            progress(status, remaining, total)
+            other.execute("INSERT INTO filler (data) VALUES (x'00')")
+            other.commit()
+
+        return step
+
+    monkeypatch.setattr(backup, "_step_progress", writing_progress)
+    try:
+        with pytest.raises(BackupRestarted):
+            backup_database(tmp_path / "backups", pages=8, sleep=0, max_restarts=2)
+    finally:
+        other.close()
+    assert not list((tmp_path / "backups").glob("*"))
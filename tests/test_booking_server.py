@@ -0,0 +1,124 @@
+# tests/test_booking_server.py
+
+import asyncio
+import socket
+import threading
+
+import pytest
+
+import storage
+from booking_server import BookingServer
+from offline import OfflineJournal
+
+SHOW = dict(movie_id="m1", movie_title="Movie", hall="Hall 9", starts_at="2030-02-01 20:00", show_time="20:00")
+
+
+def _sale(code, seats, request_key=None):
+    return dict(
+        SHOW,
+        client_name="Ann",
+        seats=seats,
+        booking_code=code,
+        ticket_type="Standard",
+        price_per_seat=10.0,
+        total_price=10.0 * len(seats),
+        request_key=request_key,
+    )
+
+
+class _Running:
+    """BookingServer в собствен event loop в друга нишка."""
+
+    def __init__(self, port: int = 0) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = BookingServer(port=port)
+        self.host, self.port = self._run(self.server.start())
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(10)
+
+    def stop(self) -> None:
+        self._run(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(10)
+        self.loop.close()
+
+
+@pytest.fixture
+def server(db):
+    running = _Running()
+    storage.use_server(f"{running.host}:{running.port}")
+    yield running.server
+    storage.use_server(None)
+    running.stop()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_book_then_duplicate_seats_are_refused(server):
+    assert storage.book(**_sale("C1", ["A1", "A2"])) == [True, "ok"]
+    assert storage.book(**_sale("C2", ["A2", "A3"])) == [False, "seats_taken"]
+    # повторение със същия request_key е дубликат, не отказ
+    assert storage.book(**_sale("C3", ["B1"], request_key="k1")) == [True, "ok"]
+    assert storage.book(**_sale("C3", ["B1"], request_key="k1")) == [True, "duplicate"]
+
+    screening_id = storage.find_screening(SHOW["movie_id"], SHOW["hall"], SHOW["starts_at"])
+    assert storage.get_taken_seats(screening_id) == {"A1", "A2", "B1"}
+    conn = storage.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM bookings").fetchone() == (2,)
+    conn.close()
+
+
+def test_cancel_updates_cached_seats(server):
+    storage.book(**_sale("C1", ["A1", "A2"]))
+    storage.book(**_sale("C2", ["A3"]))
+    screening_id = storage.find_screening(SHOW["movie_id"], SHOW["hall"], SHOW["starts_at"])
+    assert storage.get_taken_seats(screening_id) == {"A1", "A2", "A3"}
+    assert screening_id in server._seats
+
+    assert storage.cancel_booking("C1") == [True, "ok"]
+    assert storage.get_taken_seats(screening_id) == {"A3"}
+    # мястото е свободно и за нов book през паметта на сървъра
+    assert storage.book(**_sale("C4", ["A1"])) == [True, "ok"]
+
+
+def test_cancel_show_drops_cached_seats(server):
+    storage.book(**_sale("C1", ["A1", "A2"]))
+    screening_id = storage.find_screening(SHOW["movie_id"], SHOW["hall"], SHOW["starts_at"])
+    assert storage.get_taken_seats(screening_id) == {"A1", "A2"}
+
+    manifest = storage.cancel_show(screening_id)
+    assert [line[0] for line in manifest] == ["C1"]
+    assert screening_id not in server._seats
+    assert storage.get_taken_seats(screening_id) == set()
+    assert storage.book(**_sale("C2", ["A1"])) == [True, "ok"]
+
+
+def test_client_mode_falls_back_to_journal_when_server_is_down(db, tmp_path):
+    port = _free_port()
+    storage.use_server(f"127.0.0.1:{port}")
+    journal = OfflineJournal(tmp_path / "journal.db")
+    try:
+        assert journal.book(**_sale("OFF1", ["D1"])) == "offline"
+        assert not journal.online
+        assert not journal.probe()
+        assert journal.pending_count() == 1
+
+        running = _Running(port)
+        try:
+            report = journal.sync()
+            assert (report.synced, report.remaining) == (1, 0)
+            assert journal.online
+            screening_id = storage.find_screening(SHOW["movie_id"], SHOW["hall"], SHOW["starts_at"])
+            assert storage.get_taken_seats(screening_id) == {"D1"}
+        finally:
+            storage.use_server(None)
+            running.stop()
+    finally:
+        storage.use_server(None)
@@ -0,0 +1,66 @@
+# tests/test_hall_overlaps.py
+
+import pytest
+
+import storage
+from data import MOVIES
+from hall_index import HallScheduleIndex
+from scheduling import parse_time, parse_times
+
+
+def test_seed_has_no_overlaps(db):
+    index = HallScheduleIndex()
+    index.rebuild()
+    for info in MOVIES.values():
+        for hall, times in info["halls"].items():
+            for t in times:
+                # всеки шаблон се застъпва само със себе си
+                conflict = index.check_template(info["id"], hall, t)
+                assert conflict is not None and conflict.movie_id == info["id"]
+                assert conflict.when == t
+
+
+def test_add_show_rejects_overlap_in_storage(db):
+    # Hall 1: Indiana Jones 10:00 (127 мин) + 15 мин почистване -> до 12:22
+    with pytest.raises(ValueError):
+        storage.add_show("godfather", "Hall 1", "12:15")
+    storage.add_show("godfather", "Hall 4", "15:00")
+    assert ("godfather", "Hall 4", "15:00") in storage.get_show_templates()
+
+
+def test_add_screenings_skips_overlaps(db):
+    rows = [
+        ("godfather", "Hall 4", "2030-01-01 10:00"),
+        ("pulp_fiction", "Hall 4", "2030-01-01 12:00"),  # застъпва предния ред
+        ("pulp_fiction", "Hall 4", "2030-01-01 13:10"),
+        ("godfather", "Hall 4", "2030-01-01 18:00"),  # Lost Highway 19:00 всеки ден
+    ]
+    assert storage.add_screenings(rows) == 2
+    starts = [r[2] for r in storage.get_screenings_between("2030-01-01")]
+    assert starts == ["2030-01-01 10:00", "2030-01-01 13:10"]
+
+
+def test_booking_on_template_time_creates_screening(db):
+    sid = storage.ensure_screening("true_romance", "Hall 1", "2030-01-01 12:30")
+    assert storage.ensure_screening("true_romance", "Hall 1", "2030-01-01 12:30") == sid
+    with pytest.raises(ValueError):
+        storage.ensure_screening("godfather", "Hall 1", "2030-01-01 13:00")
+
+
+def test_stale_index_reports_conflict_from_storage(db):
+    index = HallScheduleIndex()
+    index.rebuild()
+    storage.add_show("godfather", "Hall 4", "15:00")  # друг терминал
+    conflict = index.add_show("pulp_fiction", "Hall 4", "14:00")
+    assert conflict is not None and conflict.movie_id == "godfather"
+
+
+@pytest.mark.parametrize("text", ["25:99", "9:0", "24:00", "12", "12:5a", ""])
+def test_parse_time_rejects_bad_input(text):
+    with pytest.raises(ValueError):
+        parse_time(text)
+
+
+def test_parse_time_is_canonical():
+    assert parse_time(" 9:05 ") == "09:05"
+    assert parse_times("9:30, 14:00 9:30") == ("09:30", "14:00")
@@ -0,0 +1,70 @@
+# tests/test_idempotency.py
+
+import storage
+from write_queue import WriteQueue
+
+SHOW = dict(movie_id="m1", movie_title="Movie", hall="Hall 9", starts_at="2030-02-01 20:00", show_time="20:00")
+
+
+def _sale(code, seats, request_key):
+    return dict(
+        SHOW,
+        client_name="Ann",
+        seats=seats,
+        booking_code=code,
+        ticket_type="Standard",
+        price_per_seat=10.0,
+        total_price=10.0 * len(seats),
+        request_key=request_key,
+    )
+
+
+def _state():
+    conn = storage.get_connection()
+    state = (
+        conn.execute("SELECT booking_code, seats, request_key FROM bookings ORDER BY id").fetchall(),
+        conn.execute("SELECT seat_id FROM taken_seats ORDER BY seat_id").fetchall(),
+        conn.execute("SELECT tickets, revenue, bookings FROM sales_by_movie WHERE movie_id = 'm1'").fetchone(),
+        conn.execute("SELECT SUM(tickets), SUM(revenue) FROM sales_daily WHERE movie_id = 'm1'").fetchone(),
+        conn.execute("SELECT COUNT(*) FROM seat_events").fetchone()[0],
+    )
+    conn.close()
+    return state
+
+
+def test_retry_with_same_key_is_a_duplicate(db):
+    assert storage.book(**_sale("C1", ["A1", "A2"], "k1")) == (True, "ok")
+    before = _state()
+    assert before[2] == (2, 20.0, 1)
+
+    # повторение след таймаут: нов код на касата, същият ключ
+    assert storage.book(**_sale("C1", ["A1", "A2"], "k1")) == (True, "duplicate")
+    assert storage.book(**_sale("C9", ["A1", "A2"], "k1")) == (True, "duplicate")
+    assert _state() == before
+
+
+def test_duplicate_is_detected_inside_the_write_transaction(db):
+    # двата опита идват едновременно: бързата проверка в book не вижда нищо,
+    # решава проверката в _book, в същата партида
+    writes = WriteQueue(window_ms=50)
+    try:
+        sale = _sale("C1", ["A1"], "k1")
+        args = [sale[k] for k in (
+            "movie_id", "movie_title", "hall", "starts_at", "show_time", "client_name",
+            "seats", "booking_code", "ticket_type", "price_per_seat", "total_price", "request_key",
+        )]
+        first, second = writes.submit("book", *args), writes.submit("book", *args)
+        assert first.result(10)[:2] == (True, "ok")
+        assert second.result(10)[:2] == (True, "duplicate")
+    finally:
+        writes.close()
+    bookings, seats, by_movie, daily, events = _state()
+    assert len(bookings) == 1 and seats == [("A1",)]
+    assert by_movie == (1, 10.0, 1) and daily == (1, 10.0) and events == 1
+
+
+def test_different_key_for_the_same_seats_is_refused(db):
+    assert storage.book(**_sale("C1", ["A1", "A2"], "k1")) == (True, "ok")
+    before = _state()
+    assert storage.book(**_sale("C2", ["A2", "A3"], "k2")) == (False, "seats_taken")
+    assert _state() == before
@@ -0,0 +1,123 @@
+# tests/test_migrations.py
+
+import sqlite3
+
+import pytest
+
+import migrations
+import storage
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """
+    База от преди миграциите (user_version 0): bookings без цени и
+    прожекции, taken_seats по (филм, зала, час).
+    """
+    path = tmp_path / "cinema.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_code TEXT NOT NULL,
+            movie_id TEXT NOT NULL,
+            movie_title TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            show_time TEXT NOT NULL,
+            client_name TEXT NOT NULL,
+            seats TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE taken_seats (
+            movie_id TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            show_time TEXT NOT NULL,
+            seat_id TEXT NOT NULL,
+            PRIMARY KEY (movie_id, hall, show_time, seat_id)
+        );
+        CREATE TABLE movies (movie_id TEXT PRIMARY KEY, title TEXT NOT NULL);
+        CREATE TABLE shows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movie_id TEXT NOT NULL,
+            hall TEXT NOT NULL,
+            show_time TEXT NOT NULL
+        );
+        INSERT INTO movies VALUES ('m1', 'Old Movie');
+        INSERT INTO shows (movie_id, hall, show_time) VALUES ('m1', 'Hall 1', '18:00');
+        INSERT INTO bookings (booking_code, movie_id, movie_title, hall, show_time, client_name, seats, created_at)
+        VALUES ('OLD00001', 'm1', 'Old Movie', 'Hall 1', '18:00', 'Иван Петров', 'C5,C6', '2024-03-01 17:00:00'),
+               ('OLD00002', 'm1', 'Old Movie', 'Hall 1', '18:00', 'Ann', 'D1', '2024-03-02 16:00:00');
+        INSERT INTO taken_seats VALUES ('m1', 'Hall 1', '18:00', 'C5'),
+                                       ('m1', 'Hall 1', '18:00', 'C6'),
+                                       ('m1', 'Hall 1', '18:00', 'D1');
+        """
+    )
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(storage, "DB_PATH", path)
+    return path
+
+
+def test_legacy_database_is_migrated_to_latest(legacy_db):
+    conn = storage.get_connection()
+    assert migrations.current_version(conn) == 0
+    assert migrations.migrate(conn) == len(migrations.MIGRATIONS)
+    assert migrations.current_version(conn) == migrations.LATEST_VERSION
+
+    (screening_id, starts_at), = conn.execute("SELECT id, starts_at FROM screenings").fetchall()
+    assert starts_at == "2024-03-02 18:00"  # датата на последната продажба
+    assert conn.execute("SELECT DISTINCT screening_id FROM bookings").fetchall() == [(screening_id,)]
+    assert storage.get_taken_seats(screening_id) == {"C5", "C6", "D1"}
+
+    assert conn.execute("SELECT tickets, bookings FROM sales_by_movie WHERE movie_id = 'm1'").fetchone() == (3, 2)
+    assert conn.execute("SELECT client_fold FROM bookings WHERE booking_code = 'OLD00001'").fetchone() == (
+        "иван петров",
+    )
+    assert conn.execute("SELECT COUNT(*) FROM price_rules").fetchone()[0] > 0
+    assert conn.execute("SELECT COUNT(*) FROM seat_snapshots WHERE screening_id = ?", (screening_id,)).fetchone() == (
+        1,
+    )
+    assert conn.execute("SELECT COUNT(*) FROM schema_migration_progress").fetchone() == (0,)
+    conn.close()
+
+    assert [row[1] for row in storage.fetch_bookings_page(client_prefix="ИВАН")] == ["OLD00001"]
+
+
+def test_migrate_is_a_no_op_when_up_to_date(legacy_db):
+    conn = storage.get_connection()
+    migrations.migrate(conn)
+    assert migrations.migrate(conn) == 0
+    conn.close()
+
+
+def test_migrations_applied_by_another_terminal_are_skipped(legacy_db, monkeypatch):
+    # другият терминал мигрира, докато този още вижда старата версия
+    other = sqlite3.connect(legacy_db)
+    migrations.migrate(other)
+    other.close()
+
+    conn = storage.get_connection()
+    real_version = migrations.current_version
+    stale_reads = [0, 0]  # проверката в началото + тази преди миграция 1
+
+    def current_version(c):
+        return stale_reads.pop() if stale_reads else real_version(c)
+
+    monkeypatch.setattr(migrations, "current_version", current_version)
+
+    assert migrations.migrate(conn) == 0
+    assert conn.execute("SELECT tickets FROM sales_by_movie WHERE movie_id = 'm1'").fetchone() == (3,)
+    conn.close()
+
+
+def test_batched_backfill_stops_when_the_migration_is_already_done(legacy_db):
+    conn = storage.get_connection()
+    migrations.migrate(conn)
+    conn.isolation_level = None
+    applied = []
+    migrations.backfill_in_batches(
+        conn, "3:sales", "SELECT id FROM bookings WHERE id > ? ORDER BY id LIMIT ?", lambda c, rows: applied.append(rows)
+    )
+    assert applied == []
+    conn.close()
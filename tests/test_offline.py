@@ -0,0 +1,186 @@
+# tests/test_offline.py
+
+import sqlite3
+
+import pytest
+
+import offline
+import storage
+from offline import DatabaseBusy, DatabaseOffline, OfflineJournal, call_db
+
+SHOW = dict(movie_id="m1", movie_title="Movie", hall="Hall 9", starts_at="2030-02-01 20:00", show_time="20:00")
+
+
+def _sale(code, seats, request_key=None, client_name="Ann"):
+    return dict(
+        SHOW,
+        client_name=client_name,
+        seats=seats,
+        booking_code=code,
+        ticket_type="Standard",
+        price_per_seat=10.0,
+        total_price=10.0 * len(seats),
+        request_key=request_key,
+    )
+
+
+@pytest.fixture
+def journal(db, tmp_path):
+    j = OfflineJournal(tmp_path / "journal.db")
+    j.online = False
+    return j
+
+
+def _state(conn):
+    return (
+        conn.execute("SELECT booking_code, seats FROM bookings ORDER BY id").fetchall(),
+        conn.execute("SELECT seat_id FROM taken_seats ORDER BY seat_id").fetchall(),
+        conn.execute("SELECT tickets, bookings FROM sales_by_movie WHERE movie_id = 'm1'").fetchone(),
+        conn.execute("SELECT COUNT(*) FROM seat_events").fetchone()[0],
+    )
+
+
+def test_offline_sale_is_synced_once(journal):
+    assert journal.book(**_sale("OFF00001", ["A1", "A2"])) == "offline"
+    assert journal.taken_seats(SHOW["movie_id"], SHOW["hall"], SHOW["starts_at"]) == {"A1", "A2"}
+
+    report = journal.sync()
+    assert (report.synced, report.conflicts, report.remaining) == (1, [], 0)
+    assert journal.online
+
+    conn = storage.get_connection()
+    bookings, seats, sales, events = _state(conn)
+    conn.close()
+    assert bookings == [("OFF00001", "A1,A2")]
+    assert seats == [("A1",), ("A2",)]
+    assert sales == (2, 1)
+    assert events == 2
+
+
+def test_replaying_an_already_synced_batch_changes_nothing(journal):
+    journal.book(**_sale("OFF00001", ["A1", "A2"]))
+    journal.sync()
+    conn = storage.get_connection()
+    before = _state(conn)
+
+    # sync, прекъснат след commit-а в базата: журналът не знае, че е записано
+    with sqlite3.connect(journal.path) as jconn:
+        jconn.execute("DELETE FROM journal_sync")
+    report = journal.sync()
+
+    assert (report.synced, report.conflicts) == (1, [])
+    assert _state(conn) == before
+    conn.close()
+
+
+def test_request_key_already_sold_online_is_not_duplicated(journal):
+    journal.online = True
+    assert journal.book(**_sale("ONL00001", ["B1"], request_key="k1")) == "ok"
+    journal.online = False
+    # повторният опит (същият ключ) е отишъл в журнала
+    assert journal.book(**_sale("ONL00001", ["B1"], request_key="k1")) == "offline"
+
+    report = journal.sync()
+    assert (report.synced, report.conflicts) == (1, [])
+    conn = storage.get_connection()
+    assert conn.execute("SELECT COUNT(*) FROM bookings WHERE request_key = 'k1'").fetchone() == (1,)
+    conn.close()
+
+
+def test_seats_sold_elsewhere_are_reported_as_conflict(journal):
+    journal.book(**_sale("OFF00001", ["C1"], client_name="Offline"))
+    ok, _ = storage.book(**_sale("ONL00002", ["C1"], client_name="Online"))
+    assert ok
+
+    report = journal.sync()
+    assert report.synced == 0
+    assert [(code, client) for code, client, _ in report.conflicts] == [("OFF00001", "Offline")]
+    assert [code for code, _, _ in journal.conflicts()] == ["OFF00001"]
+    assert journal.pending_count() == 0
+
+
+def test_call_db_retries_busy_then_gives_up(monkeypatch):
+    monkeypatch.setattr(offline, "BUSY_BACKOFF_S", 0)
+    calls = []
+
+    def locked():
+        calls.append(1)
+        raise sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(DatabaseBusy):
+        call_db(locked)
+    assert len(calls) == offline.BUSY_RETRIES + 1
+
+
+def test_call_db_classifies_offline_and_other_errors():
+    def unreachable():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    def broken():
+        raise sqlite3.OperationalError("no such table: nope")
+
+    with pytest.raises(DatabaseOffline):
+        call_db(unreachable)
+    with pytest.raises(sqlite3.OperationalError):
+        call_db(broken)
+
+
+def test_bad_row_is_marked_failed_and_does_not_block_the_rest(journal):
+    journal.book(**_sale("OFF00001", ["D1"]))
+    journal.book(**_sale("OFF00002", ["??"]))  # encode_seat -> ValueError
+    journal.book(**_sale("OFF00003", ["D2"]))
+
+    report = journal.sync()
+    assert report.synced == 2
+    assert [(code, error.split(":")[0]) for code, _, error in report.failed] == [("OFF00002", "ValueError")]
+    assert report.remaining == 0
+    assert [code for code, _, _ in journal.conflicts("failed")] == ["OFF00002"]
+    conn = storage.get_connection()
+    assert conn.execute("SELECT booking_code FROM bookings ORDER BY id").fetchall() == [("OFF00001",), ("OFF00003",)]
+    conn.close()
+
+
+def test_batch_error_outside_rows_falls_back_to_one_row_at_a_time(journal, monkeypatch):
+    real = storage.replay_bookings
+
+    def remote_replay(rows):
+        if any(row[0] == "OFF00002" for row in rows):
+            raise RuntimeError("server rejected the batch")
+        return real(rows)
+
+    monkeypatch.setattr(storage, "replay_bookings", remote_replay)
+    for n, seat in enumerate(["E1", "E2", "E3"], 1):
+        journal.book(**_sale(f"OFF0000{n}", [seat]))
+
+    report = journal.sync()
+    assert report.synced == 2
+    assert [code for code, _, _ in report.failed] == ["OFF00002"]
+    assert report.remaining == 0
+
+
+def test_database_error_stops_sync_and_keeps_sales_pending(journal, monkeypatch):
+    def broken(rows):
+        raise sqlite3.OperationalError("no such table: bookings")
+
+    monkeypatch.setattr(storage, "replay_bookings", broken)
+    journal.book(**_sale("OFF00001", ["F1"]))
+    report = journal.sync()
+    assert report.error and report.remaining == 1
+
+
+def test_old_journal_accepts_failed_status(tmp_path):
+    path = tmp_path / "journal.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(offline._SCHEMA.replace("'synced', 'conflict', 'failed'", "'synced', 'conflict'"))
+        conn.execute(
+            f"INSERT INTO journal (seq, {offline._JOURNAL_COLUMNS}) VALUES (1, 'OFF1', 'm1', 'Movie', 'Hall 9', "
+            "'2030-02-01 20:00', '20:00', 'Ann', 'A1', 'Standard', 10, 10, '2030-01-01 10:00:00', NULL)"
+        )
+        conn.execute("INSERT INTO journal_sync (seq, status) VALUES (1, 'synced')")
+    conn.close()
+
+    conn = OfflineJournal(path)._connect()
+    with conn:
+        conn.execute("UPDATE journal_sync SET status = 'failed' WHERE seq = 1")
+    assert conn.execute("SELECT status FROM journal_sync").fetchall() == [("failed",)]
+    conn.close()
@@ -0,0 +1,84 @@
+# tests/test_pricing.py
+
+import pytest
+
+from data import DEFAULT_TICKET_PRICES
+from pricing import PriceEngine, PriceRule, seat_class
+
+# 2030-01-05 е събота (weekday 5)
+SATURDAY_EVENING = "2030-01-05 20:00"
+MONDAY_AFTERNOON = "2030-01-07 14:00"
+
+
+def _engine(*rules):
+    base = PriceRule(1, "Standard", "base", 10.0, ticket_type="Standard")
+    return PriceEngine((base,) + rules)
+
+
+def test_base_price_for_every_seat_class():
+    engine = _engine()
+    table = engine.price_table("Standard", "m1", "Hall 1", MONDAY_AFTERNOON)
+    assert set(table) == set(engine.seat_classes)
+    assert set(table.values()) == {10.0}
+    assert engine.ticket_types == ["Standard"]
+
+
+def test_unknown_ticket_type_is_free_of_rules():
+    assert _engine().base_price("VIP", "m1", "Hall 1", MONDAY_AFTERNOON) == 0.0
+
+
+def test_more_specific_base_wins_at_equal_priority():
+    engine = _engine(PriceRule(2, "Hall 2", "base", 14.0, ticket_type="Standard", hall="Hall 2"))
+    assert engine.base_price("Standard", "m1", "Hall 1", MONDAY_AFTERNOON) == 10.0
+    assert engine.base_price("Standard", "m1", "Hall 2", MONDAY_AFTERNOON) == 14.0
+
+
+def test_higher_priority_base_beats_specificity():
+    engine = _engine(
+        PriceRule(2, "Hall 2", "base", 14.0, ticket_type="Standard", hall="Hall 2"),
+        PriceRule(3, "Flat", "base", 7.0, priority=5),
+    )
+    assert engine.base_price("Standard", "m1", "Hall 2", MONDAY_AFTERNOON) == 7.0
+
+
+def test_adjustments_apply_in_priority_order():
+    engine = _engine(
+        PriceRule(2, "Weekend evening", "percent", 20.0, weekdays=frozenset({5, 6}), time_from="18:00"),
+        PriceRule(3, "Booking fee", "fixed", 0.5, priority=1),
+    )
+    # (10 * 1.2) + 0.5
+    assert engine.base_price("Standard", "m1", "Hall 1", SATURDAY_EVENING) == 12.5
+    assert engine.base_price("Standard", "m1", "Hall 1", MONDAY_AFTERNOON) == 10.5
+
+
+def test_seat_class_rules_and_quote():
+    engine = _engine(PriceRule(2, "Premium rows", "fixed", 3.0, seat_class="premium"))
+    assert seat_class("H4") == "premium" and seat_class("C4") == "standard"
+    quote = engine.quote(["C4", "H4", "H5"], "Standard", "m1", "Hall 1", MONDAY_AFTERNOON)
+    assert quote.seat_prices == (("C4", 10.0), ("H4", 13.0), ("H5", 13.0))
+    assert quote.total == 36.0
+    assert quote.unit_prices == (10.0, 13.0)
+    assert quote.average_price == 12.0
+
+
+def test_promotion_is_limited_to_its_dates_and_never_negative():
+    engine = _engine(
+        PriceRule(2, "Launch", "fixed", -15.0, movie_id="m1", valid_from="2030-01-01", valid_to="2030-01-05")
+    )
+    assert engine.base_price("Standard", "m1", "Hall 1", SATURDAY_EVENING) == 0.0
+    assert engine.base_price("Standard", "m1", "Hall 1", MONDAY_AFTERNOON) == 10.0
+    assert engine.base_price("Standard", "m2", "Hall 1", SATURDAY_EVENING) == 10.0
+
+
+def test_price_tables_are_cached_per_screening():
+    engine = _engine()
+    first = engine.price_table("Standard", "m1", "Hall 1", MONDAY_AFTERNOON)
+    assert engine.price_table("Standard", "m1", "Hall 1", MONDAY_AFTERNOON) is first
+
+
+@pytest.mark.usefixtures("db")
+def test_load_uses_seeded_rules():
+    engine = PriceEngine.load()
+    assert sorted(engine.ticket_types) == sorted(DEFAULT_TICKET_PRICES)
+    for ticket_type, price in DEFAULT_TICKET_PRICES.items():
+        assert engine.base_price(ticket_type, "m1", "Hall 1", MONDAY_AFTERNOON) == price
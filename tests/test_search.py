@@ -0,0 +1,37 @@
+# tests/test_search.py
+
+import pytest
+
+import storage
+
+SHOW = dict(movie_id="m1", movie_title="Movie", hall="Hall 9", starts_at="2030-02-01 20:00", show_time="20:00")
+NAMES = ["Ivanov", "Ivanova", "Ivo Petrov", "Iliev", "Georgiev", "Alexandrov"]
+
+
+@pytest.fixture
+def bookings(db):
+    for n, name in enumerate(NAMES):
+        storage.book(
+            **SHOW, client_name=name, seats=[f"A{n + 1}"], booking_code=f"C{n}",
+            ticket_type="Standard", price_per_seat=10.0, total_price=10.0,
+        )
+
+
+def _clients(query):
+    return sorted(row[1] for row in storage.search_bookings(query))
+
+
+@pytest.mark.parametrize("query", ["ivnov", "ivamov", "ivanovv", "ivqnov"])
+def test_fuzzy_match_tolerates_one_typo(bookings, query):
+    assert _clients(query) == ["Ivanov", "Ivanova"]
+
+
+def test_fuzzy_match_tolerates_two_typos_in_long_words(bookings):
+    assert _clients("alexandorv") == ["Alexandrov"]
+    assert _clients("gorgiev") == ["Georgiev"]
+
+
+def test_pieces_cover_the_token():
+    assert storage._pieces("vanov", 2) == ["van", "ov"]
+    assert storage._pieces("lexandorv", 3) == ["lex", "and", "orv"]
+    assert "".join(storage._pieces("abcd", 3)) == "abcd"
@@ -0,0 +1,60 @@
+# tests/test_seat_allocation.py
+
+from data import NUM_COLUMNS, ROWS
+from seat_allocation import SeatAllocator, best_seats
+
+
+def _row_and_columns(seats):
+    rows = {s.rstrip("0123456789") for s in seats}
+    return rows, sorted(int(s[1:]) for s in seats)
+
+
+def test_empty_hall_gives_centered_block_in_one_row():
+    seats = best_seats(4, set())
+    rows, cols = _row_and_columns(seats)
+    assert len(rows) == 1
+    assert cols == [5, 6, 7, 8]
+
+
+def test_taken_seats_are_never_returned():
+    taken = {f"{row}{c}" for row in ROWS for c in range(4, 10)}
+    seats = best_seats(3, taken)
+    assert len(seats) == 3
+    assert not set(seats) & taken
+    rows, cols = _row_and_columns(seats)
+    assert len(rows) == 1
+    assert cols == list(range(cols[0], cols[0] + 3))
+
+
+def test_splits_group_when_no_block_is_long_enough():
+    # във всеки ред свободни са само 1-3 и 10-12
+    taken = {f"{row}{c}" for row in ROWS for c in range(4, 10)}
+    seats = best_seats(5, taken)
+    assert len(seats) == 5
+    assert not set(seats) & taken
+    assert best_seats(5, taken, allow_split=False) is None
+
+
+def test_group_wider_than_a_row_is_split():
+    seats = best_seats(NUM_COLUMNS + 2, set())
+    assert len(seats) == NUM_COLUMNS + 2
+    assert len(set(seats)) == len(seats)
+    assert best_seats(NUM_COLUMNS + 2, set(), allow_split=False) is None
+
+
+def test_not_enough_free_seats():
+    capacity = len(ROWS) * NUM_COLUMNS
+    assert best_seats(capacity + 1, set()) is None
+    taken = {f"{row}{c}" for row in ROWS for c in range(1, NUM_COLUMNS + 1)} - {"A1"}
+    assert best_seats(1, taken) == ["A1"]
+    assert best_seats(2, taken) is None
+
+
+def test_zero_seats():
+    assert best_seats(0, set()) == []
+
+
+def test_custom_geometry():
+    allocator = SeatAllocator("AB", 4)
+    assert allocator.allocate(8, set()) == ["A1", "A2", "A3", "A4", "B1", "B2", "B3", "B4"]
+    assert allocator.allocate(2, {"A2", "B2", "B3"}) == ["A3", "A4"]
@@ -0,0 +1,117 @@
+# tests/test_seat_events.py
+
+import pytest
+
+import seat_events
+import storage
+from seat_events import decode_seat, encode_seat, seat_history, seat_map_at
+
+SHOW = dict(movie_id="m1", movie_title="Movie", hall="Hall 9", starts_at="2030-02-01 20:00", show_time="20:00")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляем time.time() в seat_events (at е в цели секунди)."""
+    now = [1_900_000_000]
+    monkeypatch.setattr(seat_events.time, "time", lambda: now[0])
+    return now
+
+
+def _book(code, seats):
+    ok, reason = storage.book(
+        **SHOW,
+        client_name="Ann",
+        seats=seats,
+        booking_code=code,
+        ticket_type="Standard",
+        price_per_seat=10.0,
+        total_price=10.0 * len(seats),
+    )
+    assert ok, reason
+
+
+def _screening():
+    return storage.find_screening(SHOW["movie_id"], SHOW["hall"], SHOW["starts_at"])
+
+
+def test_seat_encoding_round_trip():
+    assert encode_seat("C7") == 2 * 256 + 7
+    assert encode_seat(" c7 ") == encode_seat("C7")
+    for seat in ("A1", "H12", "Z255"):
+        assert decode_seat(encode_seat(seat)) == seat
+    for bad in ("", "7C", "A", "AA1", "A256"):
+        with pytest.raises(ValueError):
+            encode_seat(bad)
+
+
+@pytest.mark.usefixtures("db")
+def test_seat_map_at_any_moment(clock):
+    _book("EV000001", ["A1", "A2"])
+    clock[0] += 60
+    _book("EV000002", ["B1"])
+    clock[0] += 60
+    ok, _ = storage.cancel_booking("EV000001")
+    assert ok
+    sid = _screening()
+
+    conn = storage.get_connection()
+    cur = conn.cursor()
+    start = 1_900_000_000
+    assert seat_map_at(cur, sid, start - 1).taken == set()
+    assert seat_map_at(cur, sid, start).taken == {"A1", "A2"}
+    assert seat_map_at(cur, sid, start + 60).taken == {"A1", "A2", "B1"}
+    assert seat_map_at(cur, sid, start + 120).taken == {"B1"}
+    assert seat_map_at(cur, sid).taken == storage.get_taken_seats(sid)
+
+    history = seat_history(cur, sid)
+    assert [(seat, kind, code) for _, seat, kind, code in history] == [
+        ("A1", "book", "EV000001"),
+        ("A2", "book", "EV000001"),
+        ("B1", "book", "EV000002"),
+        ("A1", "cancel", "EV000001"),
+        ("A2", "cancel", "EV000001"),
+    ]
+    conn.close()
+
+
+@pytest.mark.usefixtures("db")
+def test_snapshots_give_the_same_map_as_full_replay(clock, monkeypatch):
+    monkeypatch.setattr(seat_events, "SNAPSHOT_EVERY", 5)
+    codes = []
+    for i, seat in enumerate(f"{row}{col}" for row in "ABCD" for col in range(1, 7)):
+        clock[0] += 10
+        codes.append(f"SN{i:06d}")
+        _book(codes[-1], [seat])
+        if i % 3 == 2:
+            storage.cancel_booking(codes[i - 1])
+    sid = _screening()
+
+    conn = storage.get_connection()
+    cur = conn.cursor()
+    assert cur.execute("SELECT COUNT(*) FROM seat_snapshots WHERE screening_id = ?", (sid,)).fetchone()[0] >= 4
+    moments = [None] + [1_900_000_000 + 10 * k for k in range(0, 26, 3)]
+    with_snapshots = [seat_map_at(cur, sid, at) for at in moments]
+
+    cur.execute("DELETE FROM seat_snapshots")
+    full_replay = [seat_map_at(cur, sid, at) for at in moments]
+    conn.rollback()
+    conn.close()
+
+    assert with_snapshots == full_replay
+    assert with_snapshots[0].taken == storage.get_taken_seats(sid)
+
+
+@pytest.mark.usefixtures("db")
+def test_cancel_show_releases_every_seat_in_the_log(clock):
+    _book("CS000001", ["A1", "A2"])
+    _book("CS000002", ["B5"])
+    sid = _screening()
+    clock[0] += 60
+    refunds = storage.cancel_show(sid)
+    assert sorted(code for code, *_ in refunds) == ["CS000001", "CS000002"]
+
+    conn = storage.get_connection()
+    cur = conn.cursor()
+    assert seat_map_at(cur, sid, clock[0] - 1).taken == {"A1", "A2", "B5"}
+    assert seat_map_at(cur, sid).taken == set()
+    conn.close()
@@ -0,0 +1,74 @@
+# tests/test_write_queue.py
+
+import sqlite3
+import threading
+
+import pytest
+
+import storage
+from write_queue import WriteQueue
+
+SHOW = ("m1", "Movie", "Hall 9", "2030-02-01 20:00", "20:00")
+
+
+def _book(code, seats):
+    return ("book", (*SHOW, "Ann", seats, code, "Standard", 10.0, 10.0 * len(seats)), {})
+
+
+def _state():
+    conn = storage.get_connection()
+    state = (
+        conn.execute("SELECT booking_code FROM bookings ORDER BY id").fetchall(),
+        conn.execute("SELECT seat_id FROM taken_seats ORDER BY seat_id").fetchall(),
+        conn.execute("SELECT tickets, bookings FROM sales_by_movie WHERE movie_id = 'm1'").fetchone(),
+    )
+    conn.close()
+    return state
+
+
+def test_failing_op_rolls_back_only_its_savepoint(db):
+    conn = storage.get_connection()
+    # C2 записва резервацията и мястото B1, после seat_events отказва "??"
+    results = storage.run_write_batch(conn, [_book("C1", ["A1"]), _book("C2", ["B1", "??"]), _book("C3", ["A2"])])
+    conn.close()
+
+    assert [ok for ok, _ in results] == [True, False, True]
+    assert isinstance(results[1][1], ValueError)
+    assert _state() == ([("C1",), ("C3",)], [("A1",), ("A2",)], (2, 2))
+
+
+def test_queue_commits_the_rest_of_the_batch(db):
+    writes = WriteQueue(batch=16, window_ms=50)
+    try:
+        ops = [_book("C1", ["A1"]), _book("C2", ["??"]), _book("C3", ["A1"]), _book("C4", ["A2"])]
+        futures = [writes.submit(op, *args) for op, args, _ in ops]
+        assert [f.result(10)[:2] for f in (futures[0], futures[2], futures[3])] == [
+            (True, "ok"), (False, "seats_taken"), (True, "ok"),
+        ]
+        with pytest.raises(ValueError):
+            futures[1].result(10)
+    finally:
+        writes.close()
+    assert writes.commits == 1
+    assert _state()[0] == [("C1",), ("C4",)]
+
+
+def test_pending_futures_fail_when_writer_cannot_connect(db, monkeypatch):
+    release = threading.Event()
+
+    def unreachable():
+        release.wait(10)
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(storage, "get_connection", unreachable)
+    writes = WriteQueue()
+    futures = [writes.submit(op, *args) for op, args, _ in (_book("C1", ["A1"]), _book("C2", ["A2"]))]
+    release.set()
+
+    for future in futures:
+        with pytest.raises(sqlite3.OperationalError):
+            future.result(10)
+    op, args, _ = _book("C3", ["A3"])
+    with pytest.raises(sqlite3.OperationalError):
+        writes.submit(op, *args)
+    writes.close()
@@ -1,6 +1,8 @@
 # themes.py
 
 from dataclasses import dataclass
+from typing import Dict
+
 from PyQt5.QtGui import QPalette, QColor
 
 
@@ -85,4 +87,195 @@ def apply_theme_to_palette(theme: Theme, palette: QPalette) -> None:
     palette.setColor(QPalette.BrightText, QColor("#ffffff"))
     palette.setColor(QPalette.Link, QColor(theme.accent))
     palette.setColor(QPalette.Highlight, QColor(theme.accent))
-    palette.setColor(QPalette.HighlightedText, QColor("#ffffff"))
\ No newline at end of file
+    palette.setColor(QPalette.HighlightedText, QColor("#ffffff"))
+
+
+# ----------------- STYLESHEETS -----------------
+
+_stylesheets: Dict[str, str] = {}
+
+
+def _build_stylesheet(theme: Theme) -> str:
+    return f"""
+    * {{
+        font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
+        font-size: 13px;
+        color: {theme.text};
+    }}
+    QMainWindow {{
+        background-color: {theme.window_bg};
+    }}
+    QFrame#panelFrame {{
+        background-color: {theme.panel_bg};
+        border-radius: 16px;
+        border: 1px solid {theme.border};
+    }}
+    QFrame#divider {{
+        color: {theme.border}; 
+        background-color: {theme.border};
+    }}
+
+    /* Typo */
+    QLabel#h1 {{
+        font-size: 24px;
+        font-weight: 800;
+        color: {theme.text};
+    }}
+    QLabel#subtitle {{
+        font-size: 13px;
+        color: {theme.muted_text};
+    }}
+    QLabel#fieldLabel {{
+        font-size: 12px;
+        font-weight: 600;
+        color: {theme.muted_text};
+        text-transform: uppercase;
+        letter-spacing: 0.5px;
+    }}
+    QLabel#priceLabel, QLabel#totalLabel {{
+        font-size: 14px;
+        font-weight: bold;
+        color: {theme.text};
+    }}
+
+    /* Screen Visual */
+    QFrame#screenFrame {{
+        background-color: {theme.border}; 
+        border-radius: 8px;
+    }}
+    QLabel#screenText {{
+        color: {theme.muted_text};
+        font-weight: bold;
+        letter-spacing: 8px;
+        font-size: 12px;
+    }}
+
+    /* Inputs */
+    QLineEdit, QComboBox, QTextEdit {{
+        background-color: {theme.window_bg};
+        border: 1px solid {theme.border};
+        border-radius: 8px;
+        padding: 8px 10px;
+        selection-background-color: {theme.accent};
+    }}
+    QLineEdit:focus, QComboBox:focus, QTextEdit:focus {{
+        border: 2px solid {theme.accent};
+        background-color: {theme.panel_bg};
+    }}
+    QComboBox::drop-down {{
+        border: 0;
+        width: 20px;
+    }}
+
+    /* Buttons */
+    QPushButton {{
+        background-color: {theme.window_bg};
+        border: 1px solid {theme.border};
+        border-radius: 6px;
+        padding: 6px;
+        font-weight: 600;
+    }}
+    QPushButton:checked {{
+        background-color: {theme.accent_soft};
+        color: {theme.accent};
+        border: 1px solid {theme.accent};
+    }}
+    QPushButton:hover {{
+        border-color: {theme.accent};
+    }}
+
+    QPushButton#primaryButton {{
+        background-color: {theme.accent};
+        color: white;
+        border: none;
+        font-size: 15px;
+        border-radius: 8px;
+    }}
+    QPushButton#primaryButton:hover {{
+        background-color: {theme.accent_hover};
+    }}
+    QPushButton#primaryButton:disabled {{
+        background-color: {theme.border};
+        color: {theme.muted_text};
+    }}
+
+    QPushButton#ghostButton {{
+        background-color: transparent;
+        border: 1px solid {theme.border};
+        color: {theme.muted_text};
+    }}
+    QPushButton#ghostButton:hover {{
+        background-color: {theme.window_bg};
+        color: {theme.text};
+        border-color: {theme.text};
+    }}
+
+    QPushButton#dangerButton {{
+        background-color: transparent;
+        border: 1px solid {theme.error};
+        color: {theme.error};
+    }}
+    QPushButton#dangerButton:hover {{
+        background-color: {theme.error};
+        color: white;
+    }}
+
+    /* Scrollbar */
+    QScrollBar:vertical {{
+        border: none;
+        background: {theme.window_bg};
+        width: 8px;
+        border-radius: 4px;
+    }}
+    QScrollBar::handle:vertical {{
+        background: {theme.border};
+        border-radius: 4px;
+    }}
+    QScrollBar::handle:vertical:hover {{
+        background: {theme.muted_text};
+    }}
+    QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
+        height: 0px;
+    }}
+
+    /* Seats: състоянието е dynamic property "seatState" */
+    QLabel#seatRowLabel {{
+        font-weight: bold;
+        font-size: 14px;
+        color: {theme.muted_text};
+    }}
+    QPushButton#seat {{
+        background-color: {theme.window_bg};
+        color: {theme.text};
+        border: 1px solid {theme.border};
+        border-radius: 8px 8px 12px 12px;
+        font-weight: bold;
+        font-size: 12px;
+    }}
+    QPushButton#seat[seatState="selected"] {{
+        background-color: {theme.success};
+        color: #ffffff;
+        border: 1px solid {theme.success};
+    }}
+    QPushButton#seat[seatState="taken"] {{
+        background-color: {theme.border};
+        color: {theme.muted_text};
+        border: 1px solid {theme.border};
+    }}
+    QPushButton#seat:hover {{
+        border-color: {theme.accent};
+    }}
+    """
+
+
+def stylesheet_for(theme_name: str) -> str:
+    """Готовият stylesheet на темата; строи се веднъж и се пази."""
+    style = _stylesheets.get(theme_name)
+    if style is None:
+        style = _stylesheets[theme_name] = _build_stylesheet(THEMES[theme_name])
+    return style
+
+
+def precompile_stylesheets() -> None:
+    for name in THEMES:
+        stylesheet_for(name)
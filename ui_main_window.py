@@ -1,11 +1,13 @@
 import random
 import string
-from typing import Dict, Tuple, Set
+from typing import Callable, Dict, List, Tuple, Set
 
 import os
 import sys
+import time
+import uuid
 
-from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtCore import Qt, QSize, QTimer, QDate, pyqtSignal
 from PyQt5.QtWidgets import (
     QMainWindow,
     QWidget,
@@ -26,31 +28,45 @@ from PyQt5.QtWidgets import (
     QApplication,
     QHeaderView,
     QFrame,
+    QShortcut,
+    QFormLayout,
+    QTabWidget,
+    QDateEdit,
+    QCompleter,
+    QSpinBox,
 )
-from PyQt5.QtGui import QPalette, QColor, QFont
+from PyQt5.QtGui import QPalette, QColor, QFont, QKeySequence, QStandardItemModel, QStandardItem
 
 from data import ROWS, NUM_COLUMNS
-from themes import THEMES, apply_theme_to_palette, Theme
+from themes import THEMES, apply_theme_to_palette, precompile_stylesheets, stylesheet_for, Theme
 from storage import (
     init_db,
-    save_booking,
-    get_taken_seats,
-    mark_seats_taken,
     get_stats_by_movie,
     get_all_movie_titles,
     get_halls_for_movie,
     get_show_times,
     get_movie_id_for_title,
     cancel_booking,
+    search_bookings,
+    screening_start,
 )
+from offline import JOURNAL, SYNC_INTERVAL_S, DatabaseBusy, DatabaseOffline, call_db
 from i18n import get_translations
-from ticket_pdf import generate_ticket_pdf
-from admin_window import AdminWindow
+from diagnostics import COUNTERS
+from seat_allocation import best_seats
+from pricing import get_engine, Quote
 
 SeatKey = str  # e.g. "A5"
 
+# Пробата за закъснение на event loop-а върви през цялото време на
+# прозореца, не само докато диагностиката е отворена.
+LAG_PROBE_MS = 100
+
 
 class MainWindow(QMainWindow):
+    # грешка от нишката на backup-а -> status label (сигналът минава в GUI нишката)
+    backup_failed = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
 
@@ -64,21 +80,36 @@ class MainWindow(QMainWindow):
         # Theme - CHANGED DEFAULT TO DARK
         self.current_theme: Theme = THEMES["dark"]
         self.current_theme_name: str = "dark"
+        self.applied_theme_name: str = ""
+        precompile_stylesheets()
 
-        # ticket types & prices
-        self.ticket_prices: Dict[str, float] = {
-            "Standard": 12.0,
-            "Student": 9.0,
-            "Child": 8.0,
-            "VIP": 18.0,
-        }
+        # ticket types & prices (правилата от price_rules)
+        self.pricing = get_engine()
 
         # UI references
-        self.labels: Dict[str, QLabel] = {}
+        # (setter, ключ): текстовете, които се сменят при смяна на езика
+        self._bindings: List[Tuple[Callable[[str], None], str]] = []
         self.seat_buttons: Dict[SeatKey, QPushButton] = {}
         self.selected_seats: Dict[SeatKey, bool] = {}
         self.taken_seats: Set[SeatKey] = set()
 
+        # Кешове за едно опресняване: избраните места и текущата прожекция
+        self._selection_cache: Tuple[SeatKey, ...] | None = None
+        self._show_key_cache: Tuple[str, str, str] | None = None
+        self._show_key_valid = False
+
+        # Продажбата, която се записва: (съдържание, request_key, код).
+        # Повторен опит със същото съдържание ползва същия ключ и код.
+        self._booking_attempt: Tuple[tuple, str, str] | None = None
+
+        # Отложено опресняване: частите се маркират "dirty" и се
+        # обработват заедно веднъж на завъртане на event loop-а.
+        self._dirty: Set[str] = set()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(0)
+        self.refresh_timer.timeout.connect(self._flush_refresh)
+
         # Window setup
         self.setMinimumSize(1150, 750)
         self.resize(1280, 800)
@@ -88,10 +119,41 @@ class MainWindow(QMainWindow):
         self._apply_theme("dark")
         self._update_texts()
 
+        # Скрит диагностичен прозорец (Ctrl+Shift+D)
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self._open_diagnostics_dialog)
+        self._diagnostics_dialog: DiagnosticsDialog | None = None
+
+        # Мерим закъснението като разлика между очакваното и реалното извикване на таймера.
+        self._lag_expected = time.monotonic() + LAG_PROBE_MS / 1000
+        self.lag_timer = QTimer(self)
+        self.lag_timer.timeout.connect(self._probe_loop_lag)
+        self.lag_timer.start(LAG_PROBE_MS)
+
+        # Планиран онлайн backup на базата (в отделна нишка); backup.py се
+        # зарежда след първото изрисуване - не е нужен за старта
+        self.backup_failed.connect(self._on_backup_failed)
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self._run_scheduled_backup)
+        QTimer.singleShot(0, self._start_backup_timer)
+
+        # Синхронизация на офлайн продажбите, когато базата се върне
+        self.sync_timer = QTimer(self)
+        self.sync_timer.timeout.connect(self._sync_offline_sales)
+        self.sync_timer.start(SYNC_INTERVAL_S * 1000)
+
     # ---------- helpers ----------
 
-    def _t(self, key: str) -> str:
-        return self.translations.get(key, key)
+    def _t(self, key: str, **kwargs) -> str:
+        return self.translations.text(key, **kwargs)
+
+    def _tn(self, key: str, n: int, **kwargs) -> str:
+        return self.translations.plural(key, n, **kwargs)
+
+    def _bind(self, setter: Callable[[str], None], key: str) -> None:
+        """Задава текста сега и при всяка смяна на езика."""
+        self._bindings.append((setter, key))
+        setter(self._t(key))
 
     # ---------- UI BUILD ----------
 
@@ -123,11 +185,13 @@ class MainWindow(QMainWindow):
         # -- Header --
         header_layout = QVBoxLayout()
         header_layout.setSpacing(2)
-        self.title_label = QLabel(self._t("app_title"))
+        self.title_label = QLabel()
+        self._bind(self.title_label.setText, "app_title")
         self.title_label.setObjectName("h1")
         self.title_label.setWordWrap(True)
 
-        self.subtitle_label = QLabel(self._t("subtitle"))
+        self.subtitle_label = QLabel()
+        self._bind(self.subtitle_label.setText, "subtitle")
         self.subtitle_label.setObjectName("subtitle")
 
         header_layout.addWidget(self.title_label)
@@ -141,44 +205,53 @@ class MainWindow(QMainWindow):
         # Movie
         self.movie_combo = QComboBox()
         self._load_movies()
+        self._bind(lambda text: self.movie_combo.setItemText(0, text), "select_movie")
         self.movie_combo.currentIndexChanged.connect(self._on_movie_changed)
         layout.addWidget(self._labeled_widget("movie_label", self.movie_combo))
 
-        # Hall & Time (Row)
+        # Date, Hall & Time (Row)
         row_ht = QHBoxLayout()
         row_ht.setSpacing(10)
 
+        self.date_edit = QDateEdit(QDate.currentDate())
+        self.date_edit.setCalendarPopup(True)
+        self.date_edit.setDisplayFormat("yyyy-MM-dd")
+        self.date_edit.dateChanged.connect(self._on_date_changed)
+
         self.hall_combo = QComboBox()
-        self.hall_combo.addItem("Select hall…")
+        self.hall_combo.addItem(self._t("select_hall"))
+        self._bind(lambda text: self.hall_combo.setItemText(0, text), "select_hall")
         self.hall_combo.setEnabled(False)
         self.hall_combo.currentIndexChanged.connect(self._on_hall_changed)
 
         self.time_combo = QComboBox()
-        self.time_combo.addItem("Select time…")
+        self.time_combo.addItem(self._t("select_time"))
+        self._bind(lambda text: self.time_combo.setItemText(0, text), "select_time")
         self.time_combo.setEnabled(False)
         self.time_combo.currentIndexChanged.connect(self._on_time_changed)
 
+        row_ht.addWidget(self._labeled_widget("date_label", self.date_edit))
         row_ht.addWidget(self._labeled_widget("hall_label", self.hall_combo))
         row_ht.addWidget(self._labeled_widget("time_label", self.time_combo))
         layout.addLayout(row_ht)
 
         # Client Name
         self.client_name_edit = QLineEdit()
-        self.client_name_edit.setPlaceholderText("Enter client name...")
-        self.client_name_edit.textChanged.connect(self._update_summary)
+        self._bind(self.client_name_edit.setPlaceholderText, "client_placeholder")
+        self.client_name_edit.textChanged.connect(lambda: self._schedule_refresh("summary", "confirm"))
         layout.addWidget(self._labeled_widget("client_label", self.client_name_edit))
 
         # Ticket Type
         self.ticket_type_combo = QComboBox()
-        self.ticket_type_combo.addItems(list(self.ticket_prices.keys()))
-        self.ticket_type_combo.currentIndexChanged.connect(self._update_price_display)
-        layout.addWidget(self._plain_labeled_widget("Ticket Type", self.ticket_type_combo))
+        self.ticket_type_combo.addItems(self.pricing.ticket_types)
+        self.ticket_type_combo.currentIndexChanged.connect(lambda: self._schedule_refresh("price"))
+        layout.addWidget(self._labeled_widget("ticket_type_label", self.ticket_type_combo))
 
         # -- Prices --
         price_row = QHBoxLayout()
-        self.price_label = QLabel("Price: —")
+        self.price_label = QLabel(self._t("price_empty"))
         self.price_label.setObjectName("priceLabel")
-        self.total_label = QLabel("Total: —")
+        self.total_label = QLabel(self._t("total_empty"))
         self.total_label.setObjectName("totalLabel")
 
         price_row.addWidget(self.price_label)
@@ -198,16 +271,18 @@ class MainWindow(QMainWindow):
         # Lang
         lang_v = QVBoxLayout()
         lang_v.setSpacing(5)
-        self.lang_lbl = QLabel(self._t("lang_group"))
+        self.lang_lbl = QLabel()
         self.lang_lbl.setObjectName("fieldLabel")
-        self.labels["lang_group"] = self.lang_lbl
+        self._bind(self.lang_lbl.setText, "lang_group")
 
         lang_btn_row = QHBoxLayout()
         lang_btn_row.setSpacing(5)
-        self.lang_en_btn = QPushButton("EN")
+        self.lang_en_btn = QPushButton()
         self.lang_en_btn.setCheckable(True)
-        self.lang_bg_btn = QPushButton("BG")
+        self._bind(self.lang_en_btn.setText, "lang_en")
+        self.lang_bg_btn = QPushButton()
         self.lang_bg_btn.setCheckable(True)
+        self._bind(self.lang_bg_btn.setText, "lang_bg")
         self.lang_en_btn.setFixedWidth(40)
         self.lang_bg_btn.setFixedWidth(40)
 
@@ -222,9 +297,9 @@ class MainWindow(QMainWindow):
         # Theme
         theme_v = QVBoxLayout()
         theme_v.setSpacing(5)
-        self.theme_lbl = QLabel(self._t("theme_group"))
+        self.theme_lbl = QLabel()
         self.theme_lbl.setObjectName("fieldLabel")
-        self.labels["theme_group"] = self.theme_lbl
+        self._bind(self.theme_lbl.setText, "theme_group")
 
         theme_btn_row = QHBoxLayout()
         theme_btn_row.setSpacing(5)
@@ -253,7 +328,8 @@ class MainWindow(QMainWindow):
         layout.addWidget(self._labeled_widget("summary_label", self.summary_text))
 
         # -- Actions --
-        self.confirm_btn = QPushButton(self._t("confirm_button"))
+        self.confirm_btn = QPushButton()
+        self._bind(self.confirm_btn.setText, "confirm_button")
         self.confirm_btn.setObjectName("primaryButton")
         self.confirm_btn.setCursor(Qt.PointingHandCursor)
         self.confirm_btn.setEnabled(False)
@@ -262,11 +338,13 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.confirm_btn)
 
         tools_row = QHBoxLayout()
-        self.stats_btn = QPushButton("Stats")
+        self.stats_btn = QPushButton()
+        self._bind(self.stats_btn.setText, "stats_button")
         self.stats_btn.setObjectName("ghostButton")
         self.stats_btn.clicked.connect(self._open_stats_dialog)
 
-        self.admin_btn = QPushButton("Admin")
+        self.admin_btn = QPushButton()
+        self._bind(self.admin_btn.setText, "admin_button")
         self.admin_btn.setObjectName("ghostButton")
         self.admin_btn.clicked.connect(self._open_admin_window)
 
@@ -277,8 +355,24 @@ class MainWindow(QMainWindow):
         # -- Cancel --
         cancel_row = QHBoxLayout()
         self.cancel_code_edit = QLineEdit()
-        self.cancel_code_edit.setPlaceholderText("Booking Code")
-        self.cancel_btn = QPushButton("Cancel")
+        self._bind(self.cancel_code_edit.setPlaceholderText, "cancel_placeholder")
+
+        # Търсене по име/код: резултатите се показват като completer,
+        # при избор в полето остава само кодът.
+        self.cancel_search_model = QStandardItemModel(self)
+        self.cancel_completer = QCompleter(self.cancel_search_model, self)
+        self.cancel_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.cancel_completer.setCompletionRole(Qt.UserRole)
+        self.cancel_code_edit.setCompleter(self.cancel_completer)
+
+        self.cancel_search_timer = QTimer(self)
+        self.cancel_search_timer.setSingleShot(True)
+        self.cancel_search_timer.setInterval(150)
+        self.cancel_search_timer.timeout.connect(self._search_cancel_candidates)
+        self.cancel_code_edit.textEdited.connect(self.cancel_search_timer.start)
+
+        self.cancel_btn = QPushButton()
+        self._bind(self.cancel_btn.setText, "cancel_button")
         self.cancel_btn.setObjectName("dangerButton")
         self.cancel_btn.clicked.connect(self._handle_cancel_booking)
 
@@ -304,7 +398,8 @@ class MainWindow(QMainWindow):
         layout.setContentsMargins(24, 24, 24, 24)
         container.setLayout(layout)
 
-        self.seat_subtitle_label = QLabel(self._t("seat_subtitle"))
+        self.seat_subtitle_label = QLabel()
+        self._bind(self.seat_subtitle_label.setText, "seat_subtitle")
         self.seat_subtitle_label.setObjectName("subtitle")
         self.seat_subtitle_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(self.seat_subtitle_label)
@@ -317,7 +412,8 @@ class MainWindow(QMainWindow):
         sf_layout = QVBoxLayout(screen_frame)
         sf_layout.setContentsMargins(0, 0, 0, 0)
 
-        self.screen_label = QLabel("S C R E E N")
+        self.screen_label = QLabel()
+        self._bind(self.screen_label.setText, "screen_label")
         self.screen_label.setAlignment(Qt.AlignCenter)
         self.screen_label.setObjectName("screenText")
         sf_layout.addWidget(self.screen_label)
@@ -336,7 +432,27 @@ class MainWindow(QMainWindow):
         grid_layout_outer.addStretch()
         layout.addWidget(grid_container)
 
-        self._build_seat_buttons()
+        # Автоматичен избор на места за група
+        best_row = QHBoxLayout()
+        best_row.addStretch()
+        self.party_size_label = QLabel()
+        self._bind(self.party_size_label.setText, "party_size_label")
+        self.party_size_spin = QSpinBox()
+        # по-голяма група не се събира в един ред
+        self.party_size_spin.setRange(1, NUM_COLUMNS)
+        self.party_size_spin.setValue(2)
+        self.best_seats_btn = QPushButton()
+        self._bind(self.best_seats_btn.setText, "best_seats_button")
+        self.best_seats_btn.setObjectName("ghostButton")
+        self.best_seats_btn.clicked.connect(self._handle_best_seats)
+        best_row.addWidget(self.party_size_label)
+        best_row.addWidget(self.party_size_spin)
+        best_row.addWidget(self.best_seats_btn)
+        best_row.addStretch()
+        layout.addLayout(best_row)
+
+        # Местата се създават след първото изрисуване на прозореца.
+        QTimer.singleShot(0, self._build_seat_buttons)
 
         layout.addStretch(1)
         return container
@@ -344,6 +460,7 @@ class MainWindow(QMainWindow):
     def _build_seat_buttons(self) -> None:
         self.seat_buttons.clear()
         self.selected_seats.clear()
+        self._selection_cache = None
 
         while self.seat_grid.count():
             item = self.seat_grid.takeAt(0)
@@ -352,13 +469,14 @@ class MainWindow(QMainWindow):
 
         for row_index, row_label in enumerate(ROWS):
             lbl = QLabel(row_label)
+            lbl.setObjectName("seatRowLabel")
             lbl.setAlignment(Qt.AlignCenter)
-            lbl.setStyleSheet("font-weight: bold; font-size: 14px; opacity: 0.5;")
             self.seat_grid.addWidget(lbl, row_index, 0)
 
             for col in range(1, NUM_COLUMNS + 1):
                 seat_id = f"{row_label}{col}"
                 btn = QPushButton(str(col))
+                btn.setObjectName("seat")
                 btn.setProperty("seat_id", seat_id)
                 btn.clicked.connect(self._on_seat_clicked)
 
@@ -378,25 +496,13 @@ class MainWindow(QMainWindow):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(5)
 
-        lbl = QLabel(self._t(label_key))
+        lbl = QLabel()
         lbl.setObjectName("fieldLabel")
         layout.addWidget(lbl)
         layout.addWidget(widget)
         container.setLayout(layout)
 
-        self.labels[label_key] = lbl
-        return container
-
-    def _plain_labeled_widget(self, label_text: str, widget: QWidget) -> QWidget:
-        container = QWidget()
-        layout = QVBoxLayout()
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(5)
-        lbl = QLabel(label_text)
-        lbl.setObjectName("fieldLabel")
-        layout.addWidget(lbl)
-        layout.addWidget(widget)
-        container.setLayout(layout)
+        self._bind(lbl.setText, label_key)
         return container
 
     def _apply_card_shadow(self, widget: QWidget) -> None:
@@ -407,39 +513,16 @@ class MainWindow(QMainWindow):
         widget.setGraphicsEffect(effect)
 
     def _style_seat_button(self, btn: QPushButton, selected: bool, taken: bool = False) -> None:
-        theme = self.current_theme
-
-        if taken:
-            bg = theme.border
-            color = theme.muted_text
-            border_col = theme.border
-            cursor = "not-allowed"
-        else:
-            cursor = "pointer"
-            if selected:
-                bg = theme.success
-                color = "#ffffff"
-                border_col = theme.success
-            else:
-                bg = theme.window_bg
-                color = theme.text
-                border_col = theme.border
-
-        btn.setStyleSheet(
-            f"""
-            QPushButton {{
-                background-color: {bg};
-                color: {color};
-                border: 1px solid {border_col};
-                border-radius: 8px 8px 12px 12px; 
-                font-weight: bold;
-                font-size: 12px;
-            }}
-            QPushButton:hover {{
-                border-color: {theme.accent};
-            }}
-            """
-        )
+        """Сменя dynamic property "seatState"; цветовете са в stylesheet-а на темата."""
+        state = "taken" if taken else ("selected" if selected else "free")
+        if btn.property("seatState") == state:
+            return
+        COUNTERS.add_seat_restyles()
+        btn.setProperty("seatState", state)
+        # Qt не преизчислява стила сам при смяна на property
+        style = btn.style()
+        style.unpolish(btn)
+        style.polish(btn)
         if taken:
             btn.setEnabled(False)
         else:
@@ -449,171 +532,37 @@ class MainWindow(QMainWindow):
     def _generate_booking_code(self) -> str:
         return "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
+    def _booking_request(self, *content) -> Tuple[str, str]:
+        """(request_key, код) за продажбата; същите, ако предният опит не е завършил."""
+        if self._booking_attempt is None or self._booking_attempt[0] != content:
+            self._booking_attempt = (content, uuid.uuid4().hex, self._generate_booking_code())
+        return self._booking_attempt[1], self._booking_attempt[2]
+
     # ---------- THEME & LANGUAGE ----------
 
     def _apply_theme(self, theme_name: str) -> None:
-        theme = THEMES.get(theme_name, THEMES["light"])
-        self.current_theme = theme
-        self.current_theme_name = theme_name
-
-        palette = QPalette()
-        apply_theme_to_palette(theme, palette)
-        QApplication.instance().setPalette(palette)
-
-        style = f"""
-        * {{
-            font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
-            font-size: 13px;
-            color: {theme.text};
-        }}
-        QMainWindow {{
-            background-color: {theme.window_bg};
-        }}
-        QFrame#panelFrame {{
-            background-color: {theme.panel_bg};
-            border-radius: 16px;
-            border: 1px solid {theme.border};
-        }}
-        QFrame#divider {{
-            color: {theme.border}; 
-            background-color: {theme.border};
-        }}
-
-        /* Typo */
-        QLabel#h1 {{
-            font-size: 24px;
-            font-weight: 800;
-            color: {theme.text};
-        }}
-        QLabel#subtitle {{
-            font-size: 13px;
-            color: {theme.muted_text};
-        }}
-        QLabel#fieldLabel {{
-            font-size: 12px;
-            font-weight: 600;
-            color: {theme.muted_text};
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-        QLabel#priceLabel, QLabel#totalLabel {{
-            font-size: 14px;
-            font-weight: bold;
-            color: {theme.text};
-        }}
-
-        /* Screen Visual */
-        QFrame#screenFrame {{
-            background-color: {theme.border}; 
-            border-radius: 8px;
-        }}
-        QLabel#screenText {{
-            color: {theme.muted_text};
-            font-weight: bold;
-            letter-spacing: 8px;
-            font-size: 12px;
-        }}
-
-        /* Inputs */
-        QLineEdit, QComboBox, QTextEdit {{
-            background-color: {theme.window_bg};
-            border: 1px solid {theme.border};
-            border-radius: 8px;
-            padding: 8px 10px;
-            selection-background-color: {theme.accent};
-        }}
-        QLineEdit:focus, QComboBox:focus, QTextEdit:focus {{
-            border: 2px solid {theme.accent};
-            background-color: {theme.panel_bg};
-        }}
-        QComboBox::drop-down {{
-            border: 0;
-            width: 20px;
-        }}
-
-        /* Buttons */
-        QPushButton {{
-            background-color: {theme.window_bg};
-            border: 1px solid {theme.border};
-            border-radius: 6px;
-            padding: 6px;
-            font-weight: 600;
-        }}
-        QPushButton:checked {{
-            background-color: {theme.accent_soft};
-            color: {theme.accent};
-            border: 1px solid {theme.accent};
-        }}
-        QPushButton:hover {{
-            border-color: {theme.accent};
-        }}
-
-        QPushButton#primaryButton {{
-            background-color: {theme.accent};
-            color: white;
-            border: none;
-            font-size: 15px;
-            border-radius: 8px;
-        }}
-        QPushButton#primaryButton:hover {{
-            background-color: {theme.accent_hover};
-        }}
-        QPushButton#primaryButton:disabled {{
-            background-color: {theme.border};
-            color: {theme.muted_text};
-        }}
-
-        QPushButton#ghostButton {{
-            background-color: transparent;
-            border: 1px solid {theme.border};
-            color: {theme.muted_text};
-        }}
-        QPushButton#ghostButton:hover {{
-            background-color: {theme.window_bg};
-            color: {theme.text};
-            border-color: {theme.text};
-        }}
-
-        QPushButton#dangerButton {{
-            background-color: transparent;
-            border: 1px solid {theme.error};
-            color: {theme.error};
-        }}
-        QPushButton#dangerButton:hover {{
-            background-color: {theme.error};
-            color: white;
-        }}
-
-        /* Scrollbar */
-        QScrollBar:vertical {{
-            border: none;
-            background: {theme.window_bg};
-            width: 8px;
-            border-radius: 4px;
-        }}
-        QScrollBar::handle:vertical {{
-            background: {theme.border};
-            border-radius: 4px;
-        }}
-        QScrollBar::handle:vertical:hover {{
-            background: {theme.muted_text};
-        }}
-        QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical {{
-            height: 0px;
-        }}
         """
-
-        QApplication.instance().setStyleSheet(style)
-
+        Палитра + готовия stylesheet на темата: един re-polish на всички
+        widget-и. Местата нямат собствен stylesheet, затова не се пипат.
+        """
+        if theme_name not in THEMES:
+            theme_name = "light"
         self.light_btn.setChecked(theme_name == "light")
         self.dark_btn.setChecked(theme_name == "dark")
         self.night_btn.setChecked(theme_name == "night")
+        if theme_name == self.applied_theme_name:
+            return
 
-        # Redraw seats
-        for seat_id, btn in self.seat_buttons.items():
-            selected = self.selected_seats.get(seat_id, False)
-            taken = seat_id in self.taken_seats
-            self._style_seat_button(btn, selected=selected, taken=taken)
+        theme = THEMES[theme_name]
+        self.current_theme = theme
+        self.current_theme_name = theme_name
+        self.applied_theme_name = theme_name
+
+        palette = QPalette()
+        apply_theme_to_palette(theme, palette)
+        app = QApplication.instance()
+        app.setPalette(palette)
+        app.setStyleSheet(stylesheet_for(theme_name))
 
     def _set_language(self, lang_code: str) -> None:
         self.current_lang = lang_code
@@ -621,40 +570,63 @@ class MainWindow(QMainWindow):
         self._update_texts()
 
     def _update_texts(self) -> None:
+        """Само закачените текстове + двата, които се сглобяват динамично."""
         self.setWindowTitle(self._t("app_title"))
-
-        if "lang_group" in self.labels: self.labels["lang_group"].setText(self._t("lang_group"))
-        if "theme_group" in self.labels: self.labels["theme_group"].setText(self._t("theme_group"))
-
-        self.title_label.setText(self._t("app_title"))
-        self.subtitle_label.setText(self._t("subtitle"))
-        self.seat_subtitle_label.setText(self._t("seat_subtitle"))
-
-        for key, lbl in self.labels.items():
-            lbl.setText(self._t(key))
-
-        self.confirm_btn.setText(self._t("confirm_button"))
-        if "stats_button" in self.translations:
-            self.stats_btn.setText(self._t("stats_button"))
-        self.lang_en_btn.setText(self._t("lang_en"))
-        self.lang_bg_btn.setText(self._t("lang_bg"))
+        for setter, key in self._bindings:
+            setter(self._t(key))
 
         self.lang_en_btn.setChecked(self.current_lang == "en")
         self.lang_bg_btn.setChecked(self.current_lang == "bg")
 
-        self._update_summary()
+        self._schedule_refresh("summary", "price")
+
+    # ---------- REFRESH SCHEDULER ----------
+
+    def _schedule_refresh(self, *parts: str) -> None:
+        """
+        Маркира части от UI за опресняване: "seats" (заети места),
+        "summary", "confirm", "price". Работата се прави веднъж в
+        _flush_refresh, колкото и пъти да е поискана в същия tick.
+        """
+        self._dirty.update(parts)
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+
+    def _flush_refresh(self) -> None:
+        self.refresh_timer.stop()
+        dirty, self._dirty = self._dirty, set()
+        if "seats" in dirty:
+            # може да размаркира места, които междувременно са заети
+            self._load_taken_seats_for_current_show()
+            dirty |= {"summary", "confirm", "price"}
+        if "summary" in dirty:
+            self._update_summary()
+        if "confirm" in dirty:
+            self._update_confirm_state()
+        if "price" in dirty:
+            self._update_price_display()
 
     # ---------- LOGIC ----------
 
     def _load_movies(self) -> None:
         self.movie_combo.blockSignals(True)
         self.movie_combo.clear()
-        self.movie_combo.addItem("Select movie…")
-        for title in get_all_movie_titles():
+        self.movie_combo.addItem(self._t("select_movie"))
+        for title in JOURNAL.cached("movie_titles", get_all_movie_titles) or ():
             self.movie_combo.addItem(title)
         self.movie_combo.blockSignals(False)
 
+    def _current_day(self) -> str:
+        return self.date_edit.date().toString("yyyy-MM-dd")
+
     def _get_current_show_key(self) -> Tuple[str, str, str] | None:
+        """(movie_id, hall, starts_at) за избраната прожекция (кеширано до смяна)."""
+        if not self._show_key_valid:
+            self._show_key_cache = self._compute_show_key()
+            self._show_key_valid = True
+        return self._show_key_cache
+
+    def _compute_show_key(self) -> Tuple[str, str, str] | None:
         if (
                 self.movie_combo.currentIndex() <= 0
                 or self.hall_combo.currentIndex() <= 0
@@ -664,86 +636,73 @@ class MainWindow(QMainWindow):
         movie_title = self.movie_combo.currentText()
         hall = self.hall_combo.currentText()
         time = self.time_combo.currentText()
-        movie_id = get_movie_id_for_title(movie_title)
+        movie_id = JOURNAL.cached("movie_id", get_movie_id_for_title, movie_title)
         if not movie_id:
             return None
-        return movie_id, hall, time
+        return movie_id, hall, screening_start(self._current_day(), time)
 
     def _load_taken_seats_for_current_show(self) -> None:
         key = self._get_current_show_key()
-        if key is None:
-            self.taken_seats = set()
-            for seat_id, btn in self.seat_buttons.items():
-                selected = self.selected_seats.get(seat_id, False)
-                self._style_seat_button(btn, selected=selected, taken=False)
-            return
-        movie_id, hall, time = key
-        taken = get_taken_seats(movie_id, hall, time)
-        self.taken_seats = taken
+        # Офлайн: последно видените от базата + продадените в журнала
+        self.taken_seats = JOURNAL.taken_seats(*key) if key is not None else set()
         for seat_id, btn in self.seat_buttons.items():
             selected = self.selected_seats.get(seat_id, False)
             is_taken = seat_id in self.taken_seats
             if is_taken:
-                self.selected_seats[seat_id] = False
+                self._set_seat_selected(seat_id, False)
                 selected = False
             self._style_seat_button(btn, selected=selected, taken=is_taken)
 
+    def _on_date_changed(self) -> None:
+        self._on_movie_changed(self.movie_combo.currentIndex())
+
     def _on_movie_changed(self, index: int) -> None:
+        self._show_key_valid = False
         self.hall_combo.blockSignals(True)
         self.time_combo.blockSignals(True)
         self.hall_combo.clear()
         self.time_combo.clear()
-        self.hall_combo.addItem("Select hall…")
-        self.time_combo.addItem("Select time…")
+        self.hall_combo.addItem(self._t("select_hall"))
+        self.time_combo.addItem(self._t("select_time"))
         self.hall_combo.setEnabled(False)
         self.time_combo.setEnabled(False)
         self.hall_combo.blockSignals(False)
         self.time_combo.blockSignals(False)
-        for seat in list(self.selected_seats.keys()):
-            self.selected_seats[seat] = False
-        self._load_taken_seats_for_current_show()
-        self._update_price_display()
+        for seat in self._collect_selected_seats():
+            self._set_seat_selected(seat, False)
+        self._schedule_refresh("seats")
         if index <= 0:
-            self._update_summary()
-            self._update_confirm_state()
             return
         movie_title = self.movie_combo.currentText()
-        halls = get_halls_for_movie(movie_title)
+        halls = JOURNAL.cached("halls", get_halls_for_movie, movie_title, self._current_day()) or ()
         self.hall_combo.blockSignals(True)
         for hall in halls:
             self.hall_combo.addItem(hall)
         self.hall_combo.blockSignals(False)
         self.hall_combo.setEnabled(True)
-        self._update_summary()
-        self._update_confirm_state()
 
     def _on_hall_changed(self, index: int) -> None:
+        self._show_key_valid = False
+        self._schedule_refresh("seats")
         self.time_combo.blockSignals(True)
         self.time_combo.clear()
-        self.time_combo.addItem("Select time…")
+        self.time_combo.addItem(self._t("select_time"))
         self.time_combo.blockSignals(False)
         self.time_combo.setEnabled(False)
         if index <= 0:
-            self._load_taken_seats_for_current_show()
-            self._update_summary()
-            self._update_confirm_state()
             return
         movie_title = self.movie_combo.currentText()
         hall_name = self.hall_combo.currentText()
-        times = get_show_times(movie_title, hall_name)
+        times = JOURNAL.cached("times", get_show_times, movie_title, hall_name, self._current_day()) or ()
         self.time_combo.blockSignals(True)
         for t in times:
             self.time_combo.addItem(t)
         self.time_combo.blockSignals(False)
         self.time_combo.setEnabled(True)
-        self._load_taken_seats_for_current_show()
-        self._update_summary()
-        self._update_confirm_state()
 
     def _on_time_changed(self, index: int) -> None:
-        self._load_taken_seats_for_current_show()
-        self._update_summary()
-        self._update_confirm_state()
+        self._show_key_valid = False
+        self._schedule_refresh("seats")
 
     def _on_seat_clicked(self) -> None:
         btn: QPushButton = self.sender()  # type: ignore
@@ -752,35 +711,73 @@ class MainWindow(QMainWindow):
             return
         current = self.selected_seats.get(seat_id, False)
         new_state = not current
-        self.selected_seats[seat_id] = new_state
+        self._set_seat_selected(seat_id, new_state)
         self._style_seat_button(btn, selected=new_state, taken=False)
-        self._update_summary()
-        self._update_confirm_state()
-        self._update_price_display()
+        self._schedule_refresh("summary", "confirm", "price")
+
+    def _handle_best_seats(self) -> None:
+        self._flush_refresh()  # taken_seats трябва да е за текущата прожекция
+        if self._get_current_show_key() is None:
+            self.status_label.setText(self._t("status_select_show"))
+            return
+        seats = best_seats(self.party_size_spin.value(), self.taken_seats)
+        if seats is None:
+            free = len(ROWS) * NUM_COLUMNS - len(self.taken_seats)
+            self.status_label.setText(self._tn("status_not_enough_seats", self.party_size_spin.value(), free=free))
+            return
+        chosen = set(seats)
+        for seat_id, btn in self.seat_buttons.items():
+            if seat_id in self.taken_seats:
+                continue
+            selected = seat_id in chosen
+            if self.selected_seats.get(seat_id, False) != selected:
+                self._set_seat_selected(seat_id, selected)
+                self._style_seat_button(btn, selected=selected, taken=False)
+        self.status_label.setText("")
+        self._schedule_refresh("summary", "confirm", "price")
+
+    def _set_seat_selected(self, seat_id: SeatKey, selected: bool) -> None:
+        self.selected_seats[seat_id] = selected
+        self._selection_cache = None
 
     def _collect_selected_seats(self) -> Tuple[SeatKey, ...]:
-        return tuple(sorted([s for s, sel in self.selected_seats.items() if sel]))
+        """Избраните места, подредени; смятат се веднъж до следващата промяна."""
+        if self._selection_cache is None:
+            self._selection_cache = tuple(sorted(s for s, sel in self.selected_seats.items() if sel))
+        return self._selection_cache
 
     def _get_current_ticket_type(self) -> str:
         return self.ticket_type_combo.currentText() or "Standard"
 
-    def _get_price_info(self) -> Tuple[float, float]:
+    def _get_quote(self) -> Tuple[Quote, float]:
+        """Оферта за избраните места + цената на обикновено място."""
+        movie_id, hall, starts_at = self._get_current_show_key() or ("", None, "")
         ticket_type = self._get_current_ticket_type()
-        price_per_seat = self.ticket_prices.get(ticket_type, 0.0)
-        seats_count = len(self._collect_selected_seats())
-        total_price = price_per_seat * seats_count
-        return price_per_seat, total_price
+        quote = self.pricing.quote(self._collect_selected_seats(), ticket_type, movie_id, hall, starts_at)
+        return quote, self.pricing.base_price(ticket_type, movie_id, hall, starts_at)
+
+    def _get_price_info(self) -> Tuple[float, float]:
+        """(цена на място, общо); при различни цени по места - средната."""
+        quote, base = self._get_quote()
+        if quote.seat_prices:
+            return quote.average_price, quote.total
+        return base, 0.0
 
     def _update_price_display(self) -> None:
-        price_per_seat, total_price = self._get_price_info()
+        quote, base = self._get_quote()
+        price_per_seat = quote.average_price if quote.seat_prices else base
+        total_price = quote.total
+        low, high = quote.unit_prices
         if price_per_seat == 0:
-            self.price_label.setText("Price: —")
+            self.price_label.setText(self._t("price_empty"))
+        elif low != high:
+            self.price_label.setText(self._t("price_range", low=low, high=high))
         else:
-            self.price_label.setText(f"Price: {price_per_seat:.2f} лв.")
+            self.price_label.setText(self._t("price_value", price=price_per_seat))
         if total_price == 0:
-            self.total_label.setText("Total: —")
+            self.total_label.setText(self._t("total_empty"))
         else:
-            self.total_label.setText(f"Total: {total_price:.2f} лв.")
+            self.total_label.setText(self._t("total_value", total=total_price))
 
     def _update_summary(self) -> None:
         movie_title = self.movie_combo.currentText() if self.movie_combo.currentIndex() > 0 else "—"
@@ -788,15 +785,16 @@ class MainWindow(QMainWindow):
         time = self.time_combo.currentText() if self.time_combo.currentIndex() > 0 else "—"
         client_name = self.client_name_edit.text().strip() or "—"
         seats = self._collect_selected_seats()
-        seats_str = ", ".join(seats) if seats else "—"
+        seats_str = f"{', '.join(seats)} ({self._tn('seats_count', len(seats))})" if seats else "—"
         ticket_type = self._get_current_ticket_type()
         text = (
             f"{self._t('movie_label')}: {movie_title}\n"
+            f"{self._t('date_label')}: {self._current_day()}\n"
             f"{self._t('hall_label')}: {hall}\n"
             f"{self._t('time_label')}: {time}\n"
             f"{self._t('client_summary')}: {client_name}\n"
             f"{self._t('seats_summary')}: {seats_str}\n"
-            f"Ticket Type: {ticket_type}\n"
+            f"{self._t('ticket_type_summary')}: {ticket_type}\n"
         )
         self.summary_text.setPlainText(text)
 
@@ -820,12 +818,13 @@ class MainWindow(QMainWindow):
                 subprocess.Popen(["xdg-open", path])
         except Exception as e:
             current = self.status_label.text()
-            self.status_label.setText(f"{current}\n(Could not open PDF: {e})")
+            self.status_label.setText(f"{current}\n{self._t('status_pdf_failed', error=e)}")
 
     def _handle_booking(self) -> None:
+        self._flush_refresh()
         movie_title = self.movie_combo.currentText()
         hall = self.hall_combo.currentText()
-        time = self.time_combo.currentText()
+        show_time = self.time_combo.currentText()
         client_name = self.client_name_edit.text().strip()
         seats = self._collect_selected_seats()
         if not client_name:
@@ -834,80 +833,179 @@ class MainWindow(QMainWindow):
         if not seats:
             self.status_label.setText(self._t("status_missing_seats"))
             return
-        movie_id = get_movie_id_for_title(movie_title)
-        code = self._generate_booking_code()
+        movie_id = JOURNAL.cached("movie_id", get_movie_id_for_title, movie_title)
+        starts_at = screening_start(self._current_day(), show_time)
         ticket_type = self._get_current_ticket_type()
         price_per_seat, total_price = self._get_price_info()
-        save_booking(
-            movie_id=movie_id,
-            movie_title=movie_title,
-            hall=hall,
-            show_time=time,
-            client_name=client_name,
-            seats=seats,
-            booking_code=code,
-            ticket_type=ticket_type,
-            price_per_seat=price_per_seat,
-            total_price=total_price,
+        request_key, code = self._booking_request(
+            movie_id, hall, starts_at, client_name, tuple(seats), ticket_type, total_price
         )
-        mark_seats_taken(movie_id, hall, time, seats)
+        try:
+            result = JOURNAL.book(
+                movie_id=movie_id,
+                movie_title=movie_title,
+                hall=hall,
+                starts_at=starts_at,
+                show_time=show_time,
+                client_name=client_name,
+                seats=seats,
+                booking_code=code,
+                ticket_type=ticket_type,
+                price_per_seat=price_per_seat,
+                total_price=total_price,
+                request_key=request_key,
+            )
+        except DatabaseBusy:
+            # Нищо не е записано; повторното натискане ползва същия request_key
+            self.status_label.setText(self._t("status_db_busy"))
+            return
+        # Отговорът е получен - следващото натискане е нова продажба
+        self._booking_attempt = None
+        if result == "seats_taken":
+            # Друга каса е продала някое от местата - нищо не е записано
+            self.status_label.setText(self._t("status_seats_taken"))
+            self._schedule_refresh("seats")
+            return
         self._load_taken_seats_for_current_show()
+        # ReportLab се зарежда чак при първия билет.
+        from ticket_pdf import generate_ticket_pdf
+
+        pdf_started = time.perf_counter()
         pdf_path = generate_ticket_pdf(
             booking_code=code,
             movie_title=movie_title,
             hall=hall,
-            show_time=time,
+            show_time=starts_at,
             client_name=client_name,
             seats=seats,
         )
+        COUNTERS.record_pdf_render(time.perf_counter() - pdf_started)
         self._open_pdf(str(pdf_path))
-        msg_template = self._t("status_booked")
-        base_text = msg_template.format(
+        base_text = self._t(
+            "status_booked",
             movie=movie_title,
             hall=hall,
-            time=time,
+            time=starts_at,
             client=client_name,
             seats=", ".join(seats),
             code=code,
         )
         extra_price = ""
         if price_per_seat > 0:
-            extra_price = f"\nType: {ticket_type} · Total: {total_price:.2f} лв."
+            extra_price = "\n" + self._t("status_booked_price", ticket_type=ticket_type, total=total_price)
+        if result == "offline":
+            extra_price += "\n" + self._t("status_saved_offline")
+            # Без резервирани места за терминала - друга каса може да продаде същите
+            extra_price += "\n" + self._t("status_offline_seat_risk", seats=", ".join(seats))
         self.status_label.setText(f"{base_text}{extra_price}")
         for seat in seats:
-            self.selected_seats[seat] = False
-        self._update_summary()
-        self._update_confirm_state()
-        self._update_price_display()
+            self._set_seat_selected(seat, False)
+        self._schedule_refresh("summary", "confirm", "price")
+
+    def _search_cancel_candidates(self) -> None:
+        query = self.cancel_code_edit.text().strip()
+        self.cancel_search_model.clear()
+        if len(query) < 2 or not JOURNAL.online:
+            return
+        try:
+            found = call_db(search_bookings, query)
+        except DatabaseOffline:
+            JOURNAL.go_offline()
+            return
+        except DatabaseBusy:
+            return
+        for code, client, movie, hall, show_time, is_canceled in found:
+            label = f"{code} — {client} · {movie} · {hall} {show_time}"
+            if is_canceled:
+                label += " " + self._t("canceled_suffix")
+            item = QStandardItem(label)
+            item.setData(code, Qt.UserRole)
+            self.cancel_search_model.appendRow(item)
+        if self.cancel_search_model.rowCount():
+            self.cancel_completer.complete()
 
     def _handle_cancel_booking(self) -> None:
         code = self.cancel_code_edit.text().strip()
         if not code:
-            self.status_label.setText("Enter booking code to cancel.")
+            self.status_label.setText(self._t("status_cancel_missing_code"))
+            return
+        try:
+            ok, reason = call_db(cancel_booking, code)
+        except DatabaseOffline:
+            JOURNAL.go_offline()
+            self.status_label.setText(self._t("status_db_offline"))
+            return
+        except DatabaseBusy:
+            self.status_label.setText(self._t("status_db_busy"))
             return
-        ok, reason = cancel_booking(code)
         if ok:
-            self.status_label.setText(f"Booking {code} canceled.")
-            self._load_taken_seats_for_current_show()
-            self._update_price_display()
+            self.status_label.setText(self._t("status_canceled", code=code))
+            self._schedule_refresh("seats")
         else:
             if reason == "not_found":
-                self.status_label.setText(f"No booking found with code {code}.")
+                self.status_label.setText(self._t("status_cancel_not_found", code=code))
             elif reason == "already_canceled":
-                self.status_label.setText(f"Booking {code} is already canceled.")
+                self.status_label.setText(self._t("status_cancel_already", code=code))
             else:
-                self.status_label.setText(f"Could not cancel booking {code}.")
+                self.status_label.setText(self._t("status_cancel_failed", code=code))
+
+    def _sync_offline_sales(self) -> None:
+        """По една порция на тик; ако има още - веднага следващата."""
+        if JOURNAL.online and not JOURNAL.pending_count():
+            return
+        report = JOURNAL.sync(max_batches=1)
+        if report.conflicts:
+            details = "; ".join(f"{code} {client} ({seats})" for code, client, seats in report.conflicts)
+            self.status_label.setText(self._tn("status_sync_conflicts", len(report.conflicts), details=details))
+        if report.failed:
+            details = "; ".join(f"{code} {client} ({error})" for code, client, error in report.failed)
+            self.status_label.setText(self._tn("status_sync_failed", len(report.failed), details=details))
+        if report.error:
+            self.status_label.setText(self._t("status_sync_error", error=report.error))
+            return  # следващият тик на таймера
+        if report.synced or report.conflicts or report.failed:
+            self._schedule_refresh("seats")
+        if report.remaining and JOURNAL.online:
+            QTimer.singleShot(0, self._sync_offline_sales)
 
     def _open_stats_dialog(self) -> None:
         dlg = StatsDialog(self, lang=self.current_lang)
         dlg.exec_()
 
+    def _open_diagnostics_dialog(self) -> None:
+        # немодален: броячите (и пробата) вървят, докато се работи с касата
+        if self._diagnostics_dialog is None:
+            self._diagnostics_dialog = DiagnosticsDialog(self)
+        self._diagnostics_dialog.show()
+        self._diagnostics_dialog.raise_()
+        self._diagnostics_dialog.activateWindow()
+
+    def _start_backup_timer(self) -> None:
+        from backup import BACKUP_INTERVAL_MIN
+
+        self.backup_timer.start(BACKUP_INTERVAL_MIN * 60 * 1000)
+
+    def _run_scheduled_backup(self) -> None:
+        from backup import start_background_backup
+
+        start_background_backup(on_error=lambda e: self.backup_failed.emit(str(e)))
+
+    def _on_backup_failed(self, error: str) -> None:
+        self.status_label.setText(self._t("status_backup_failed", error=error))
+
+    def _probe_loop_lag(self) -> None:
+        now = time.monotonic()
+        COUNTERS.record_loop_lag(now - self._lag_expected)
+        self._lag_expected = now + LAG_PROBE_MS / 1000
+
     def _open_admin_window(self) -> None:
+        from admin_window import AdminWindow
+
         dlg = AdminWindow(self)
         dlg.exec_()
         self._load_movies()
-        self._update_summary()
-        self._update_confirm_state()
+        self._show_key_valid = False
+        self._schedule_refresh("summary", "confirm")
 
 
 class StatsDialog(QDialog):
@@ -916,27 +1014,172 @@ class StatsDialog(QDialog):
         self.lang = lang
         self.translations = get_translations(lang)
         self.setWindowTitle(self.translations.get("stats_title", "Statistics"))
-        self.resize(500, 400)
+        self.resize(760, 480)
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
+
+        # Период за отчетите (табът по филми е за цялото време)
+        range_row = QHBoxLayout()
+        range_row.setContentsMargins(10, 10, 10, 0)
+        today = QDate.currentDate()
+        self.date_from_edit = QDateEdit(today.addDays(-30))
+        self.date_to_edit = QDateEdit(today)
+        for edit in (self.date_from_edit, self.date_to_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+        self.apply_range_btn = QPushButton(self.translations.get("stats_apply", "Apply"))
+        self.apply_range_btn.clicked.connect(self._load_current_report)
+        range_row.addWidget(QLabel(self.translations.get("stats_from", "From")))
+        range_row.addWidget(self.date_from_edit)
+        range_row.addWidget(QLabel(self.translations.get("stats_to", "To")))
+        range_row.addWidget(self.date_to_edit)
+        range_row.addWidget(self.apply_range_btn)
+        range_row.addStretch()
+        layout.addLayout(range_row)
+
+        self.tabs = QTabWidget()
         self.table = QTableWidget()
-        self.table.setColumnCount(2)
+        self.table.setColumnCount(3)
         self.table.setHorizontalHeaderLabels(
             [
                 self.translations.get("stats_movie_column", "Movie"),
                 self.translations.get("stats_tickets_column", "Tickets"),
+                self.translations.get("stats_revenue_column", "Revenue"),
             ]
         )
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.verticalHeader().setVisible(False)
         self.table.setFrameShape(QFrame.NoFrame)
-        layout.addWidget(self.table)
+        self.tabs.addTab(self.table, self.translations.get("stats_tab_movies", "Movies"))
+
+        # Отчетите се смятат при първо отваряне на таба (reporting.py се
+        # зарежда с първия StatsDialog)
+        from reporting import REPORTS
+
+        self.report_tables: Dict[int, Tuple[str, QTableWidget]] = {}
+        for name in REPORTS:
+            table = QTableWidget()
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+            table.verticalHeader().setVisible(False)
+            table.setFrameShape(QFrame.NoFrame)
+            index = self.tabs.addTab(table, self.translations.get(f"stats_tab_{name}", name))
+            self.report_tables[index] = (name, table)
+        self.tabs.currentChanged.connect(self._load_current_report)
+
+        layout.addWidget(self.tabs)
         self.setLayout(layout)
         self._load_data()
 
     def _load_data(self) -> None:
         rows = get_stats_by_movie()
         self.table.setRowCount(len(rows))
-        for i, (title, count) in enumerate(rows):
+        for i, (title, tickets, revenue) in enumerate(rows):
             self.table.setItem(i, 0, QTableWidgetItem(title))
-            self.table.setItem(i, 1, QTableWidgetItem(str(count)))K
\ No newline at end of file
+            self.table.setItem(i, 1, QTableWidgetItem(str(tickets)))
+            self.table.setItem(i, 2, QTableWidgetItem(f"{revenue:.2f} лв."))
+
+    def _load_current_report(self) -> None:
+        entry = self.report_tables.get(self.tabs.currentIndex())
+        if entry is None:
+            return
+        name, table = entry
+        from reporting import get_report
+
+        frame = get_report(
+            name,
+            self.date_from_edit.date().toPyDate(),
+            self.date_to_edit.date().toPyDate(),
+        )
+        table.setColumnCount(len(frame.columns))
+        table.setHorizontalHeaderLabels([self.translations.get(c, c) for c in frame.columns])
+        table.setRowCount(len(frame.rows))
+        for i, row in enumerate(frame.rows):
+            for j, value in enumerate(row):
+                table.setItem(i, j, QTableWidgetItem(str(value)))
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    Скрит диагностичен прозорец за живи броячи:
+    заявки/сек, най-бавни заявки, кешове, престилизирания на места,
+    време за PDF и закъснение на event loop-а.
+    """
+
+    REFRESH_MS = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.resize(620, 460)
+
+        layout = QVBoxLayout()
+
+        form = QFormLayout()
+        self.qps_label = QLabel("—")
+        self.total_label = QLabel("—")
+        self.restyles_label = QLabel("—")
+        self.pdf_label = QLabel("—")
+        self.lag_label = QLabel("—")
+        form.addRow("Queries / sec", self.qps_label)
+        form.addRow("Queries total", self.total_label)
+        form.addRow("Seat restyles", self.restyles_label)
+        form.addRow("PDF render (last / avg)", self.pdf_label)
+        form.addRow("Event-loop lag (last / max)", self.lag_label)
+        layout.addLayout(form)
+
+        layout.addWidget(QLabel("Slowest recent queries"))
+        self.slow_table = QTableWidget()
+        self.slow_table.setColumnCount(2)
+        self.slow_table.setHorizontalHeaderLabels(["ms", "SQL"])
+        self.slow_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.slow_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.slow_table)
+
+        layout.addWidget(QLabel("Caches"))
+        self.cache_table = QTableWidget()
+        self.cache_table.setColumnCount(4)
+        self.cache_table.setHorizontalHeaderLabels(["Cache", "Hits", "Misses", "Hit rate"])
+        self.cache_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.cache_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.cache_table)
+
+        self.setLayout(layout)
+
+        # опреснява се само докато е видим (прозорецът се преизползва)
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self._refresh)
+
+    def showEvent(self, event) -> None:
+        self._refresh()
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def _refresh(self) -> None:
+        self.qps_label.setText(f"{COUNTERS.queries_per_second():.1f}")
+        self.total_label.setText(str(COUNTERS.total_queries))
+        self.restyles_label.setText(str(COUNTERS.seat_restyles))
+
+        last_pdf, avg_pdf = COUNTERS.pdf_render_times()
+        self.pdf_label.setText(f"{last_pdf * 1000:.1f} ms / {avg_pdf * 1000:.1f} ms")
+
+        last_lag, max_lag = COUNTERS.loop_lag()
+        self.lag_label.setText(f"{last_lag * 1000:.1f} ms / {max_lag * 1000:.1f} ms")
+
+        slow = COUNTERS.slowest_queries()
+        self.slow_table.setRowCount(len(slow))
+        for i, (duration, sql) in enumerate(slow):
+            self.slow_table.setItem(i, 0, QTableWidgetItem(f"{duration * 1000:.2f}"))
+            self.slow_table.setItem(i, 1, QTableWidgetItem(sql))
+
+        caches = COUNTERS.cache_hit_rates()
+        self.cache_table.setRowCount(len(caches))
+        for i, (name, hits, misses, rate) in enumerate(caches):
+            self.cache_table.setItem(i, 0, QTableWidgetItem(name))
+            self.cache_table.setItem(i, 1, QTableWidgetItem(str(hits)))
+            self.cache_table.setItem(i, 2, QTableWidgetItem(str(misses)))
+            self.cache_table.setItem(i, 3, QTableWidgetItem(f"{rate * 100:.0f}%"))
@@ -0,0 +1,137 @@
+# write_queue.py
+
+"""
+Group commit за записите в cinema.db.
+
+Всеки storage.book / cancel_booking прави собствен commit (и fsync). При
+пик на продажбите това е таванът. WriteQueue събира едновременните
+записи от много нишки в една транзакция:
+
+- операциите са от storage.WRITE_OPS (book, cancel_booking, ...);
+- една нишка с една връзка взима първата чакаща операция, изчаква още
+  до `window_ms` (или докато се съберат `batch`) и записва всички с един
+  commit чрез storage.run_write_batch;
+- всяка операция е в свой SAVEPOINT, така че резултатът ("ok",
+  "seats_taken", грешка) е точно като при самостоятелен запис, а
+  операциите в партидата виждат предходните (две продажби на едно място
+  -> втората получава "seats_taken").
+
+Закъснението на един запис е най-много window_ms + времето на партидата.
+
+    writes = WriteQueue()
+    ok, reason, screening_id, seats = writes.call("book", ...)
+    writes.close()
+
+storage.use_write_queue(writes) пуска публичните storage.book и т.н. през
+опашката (за процеси с много нишки, напр. benchmarks/bench_group_commit.py);
+async_storage и booking_server я ползват винаги.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List
+
+import storage
+
+WRITE_BATCH = 256        # максимум операции в един commit
+WRITE_WINDOW_MS = 2      # колко да чакаме още записи след първия
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(self, batch: int = WRITE_BATCH, window_ms: float = WRITE_WINDOW_MS) -> None:
+        self.batch = batch
+        self.window = window_ms / 1000
+        self._items: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._error: "Exception | None" = None  # защо нишката е спряла без close()
+        self._submit_lock = threading.Lock()
+        self.commits = 0
+        self.ops_committed = 0
+        self._thread = threading.Thread(target=self._loop, name="cinema-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op: str, *args, **kwargs) -> Future:
+        """Слага операцията на опашката; Future-ът връща резултата на storage._op(cur, ...)."""
+        future: Future = Future()
+        with self._submit_lock:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise RuntimeError("WriteQueue is closed")
+            self._items.put((op, args, kwargs, future))
+        return future
+
+    def call(self, op: str, *args, **kwargs):
+        """submit + изчакване на резултата (или грешката) на операцията."""
+        return self.submit(op, *args, **kwargs).result()
+
+    def close(self) -> None:
+        """Записва чакащото и спира нишката."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._items.put(_STOP)
+        self._thread.join()
+
+    def _loop(self) -> None:
+        try:
+            conn = storage.get_connection()
+        except Exception as e:
+            self._fail_pending(e)
+            return
+        try:
+            stopping = False
+            while not stopping:
+                item = self._items.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.batch:
+                    try:
+                        # след срока взима само вече чакащото
+                        item = self._items.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _fail_pending(self, error: Exception) -> None:
+        """Без връзка опашката не може да работи: отказва чакащото и новото."""
+        with self._submit_lock:
+            self._error = error
+            self._closed = True
+        while True:
+            try:
+                item = self._items.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and not item[3].done():
+                item[3].set_exception(error)
+
+    def _commit(self, conn, batch: List[tuple]) -> None:
+        try:
+            results = storage.run_write_batch(conn, [(op, args, kwargs) for op, args, kwargs, _ in batch])
+        except Exception as e:
+            # commit-ът не мина - нищо от партидата не е записано
+            results = [(False, e)] * len(batch)
+        else:
+            self.commits += 1
+            self.ops_committed += len(batch)
+        for (_, _, _, future), (ok, value) in zip(batch, results):
+            if future.done():  # отказан от извикващия
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)